@@ -0,0 +1,147 @@
+# Pipelines de agregación de MongoDB para el modo pushdown: la limpieza que Mongo hace de forma nativa
+# (nulos críticos, duplicados, precios, fechas y booleanos) se ejecuta en el servidor y los documentos
+# llegan con las columnas *_clean/*_bin ya calculadas. Transformacion las reconoce y solo termina el trabajo.
+# Las reglas replican las de Transformacion (limpiar_precios, normalizar_fechas, es_verdadero)
+
+# Campos que no pueden ser nulos (filtrar_nulos) y clave de duplicados (drop_duplicates) por colección
+NULOS_CRITICOS = {
+    'listings': ['id', 'latitude', 'longitude'],
+    'reviews': ['id', 'listing_id'],
+    'calendar': ['listing_id', 'date']
+}
+
+CLAVES_DUPLICADOS = {
+    'listings': 'id',
+    'reviews': 'id'
+}
+
+# Columnas calculadas en el servidor: (columna destino, tipo de regla, campo origen)
+COLUMNAS_PUSHDOWN = {
+    'listings': [
+        ('price_clean', 'precio', 'price'),
+        ('host_since_clean', 'fecha', 'host_since'),
+        ('calendar_last_scraped_clean', 'fecha', 'calendar_last_scraped'),
+        ('last_scraped_clean', 'fecha', 'last_scraped'),
+        ('host_is_superhost_bin', 'booleano', 'host_is_superhost'),
+        ('host_identity_verified_bin', 'booleano', 'host_identity_verified'),
+        ('has_availability_bin', 'booleano', 'has_availability')
+    ],
+    'reviews': [
+        ('date_clean', 'fecha', 'date')
+    ],
+    'calendar': [
+        ('date_clean', 'fecha', 'date'),
+        ('price_clean', 'precio', 'price'),
+        ('available_bin', 'booleano', 'available')
+    ]
+}
+
+# Igual que VALORES_VERDADEROS de transformacion.py
+VALORES_VERDADEROS = ['t', 'true', '1', 'yes', 'si']
+
+TIPOS_NUMERICOS = ['double', 'int', 'long', 'decimal']
+
+
+def expresion_precio(campo):
+    # Números -> double; textos sin '$' ni ',' -> double; vacío, no numérico, nulo u otro tipo -> 0.0
+    texto = {'$replaceAll': {'input': {'$replaceAll': {'input': {'$trim': {'input': f'${campo}'}},
+                                                       'find': {'$literal': '$'}, 'replacement': ''}},
+                             'find': ',', 'replacement': ''}}
+    return {'$switch': {
+        'branches': [
+            {'case': {'$in': [{'$type': f'${campo}'}, TIPOS_NUMERICOS]}, 'then': {'$toDouble': f'${campo}'}},
+            {'case': {'$eq': [{'$type': f'${campo}'}, 'string']},
+             'then': {'$convert': {'input': texto, 'to': 'double', 'onError': 0.0, 'onNull': 0.0}}}
+        ],
+        'default': 0.0
+    }}
+
+
+def expresion_fecha(campo):
+    # Fechas BSON -> 'YYYY-MM-DD' (UTC, como las entrega pymongo); los textos pasan tal cual y
+    # normalizar_fechas los resuelve por su ruta rápida
+    return {'$cond': [
+        {'$eq': [{'$type': f'${campo}'}, 'date']},
+        {'$dateToString': {'date': f'${campo}', 'format': '%Y-%m-%d'}},
+        f'${campo}'
+    ]}
+
+
+def expresion_booleano(campo):
+    # bool -> 1/0; texto en VALORES_VERDADEROS (sin mayúsculas ni espacios) -> 1; cualquier otro valor -> 0
+    return {'$switch': {
+        'branches': [
+            {'case': {'$eq': [{'$type': f'${campo}'}, 'bool']}, 'then': {'$cond': [f'${campo}', 1, 0]}},
+            {'case': {'$eq': [{'$type': f'${campo}'}, 'string']},
+             'then': {'$cond': [{'$in': [{'$toLower': {'$trim': {'input': f'${campo}'}}}, VALORES_VERDADEROS]}, 1, 0]}}
+        ],
+        'default': 0
+    }}
+
+
+EXPRESIONES = {
+    'precio': expresion_precio,
+    'fecha': expresion_fecha,
+    'booleano': expresion_booleano
+}
+
+
+def orden_estable(orden=None):
+    # Orden de extracción de find() y del pipeline: el campo pedido y _id para desempatar, así ambos
+    # recorren los documentos igual y conservan el mismo duplicado
+    if orden and orden != '_id':
+        return [(orden, 1), ('_id', 1)]
+    return [('_id', 1)]
+
+
+def pipeline_seleccion(nombre_coleccion, filtro=None, proyeccion=None, limite=None, orden=None):
+    # Etapas que eligen los documentos: las mismas filas y en el mismo orden que find() ordenado por
+    # orden (o _id) seguido de filtrar_nulos y drop_duplicates(keep='first') en Transformacion
+    # filtro/proyeccion/orden: los mismos que usaría find() (watermark, rango de _id, PROYECCIONES)
+    # $nin con NaN: pandas trata NaN como nulo
+    nulos = [{campo: {'$nin': [None, float('nan')]}} for campo in NULOS_CRITICOS.get(nombre_coleccion, [])]
+
+    # Con límite, find().limit() toma N documentos y Python descarta nulos después: aquí igual
+    condiciones = ([filtro] if filtro else []) + ([] if limite else nulos)
+    pipeline = []
+    if condiciones:
+        pipeline.append({'$match': condiciones[0] if len(condiciones) == 1 else {'$and': condiciones}})
+
+    # La proyección se aplica antes de ordenar y agrupar para mover documentos más chicos
+    if proyeccion:
+        campos = {campo: 1 for campo, incluir in proyeccion.items() if incluir and campo != '_id'}
+        campos['_id'] = 1
+        pipeline.append({'$project': campos})
+
+    # Orden de extracción estable: drop_duplicates conserva la primera aparición
+    pipeline.append({'$sort': dict(orden_estable(orden))})
+    if limite:
+        pipeline.append({'$limit': limite})
+        if nulos:
+            pipeline.append({'$match': {'$and': nulos}})
+
+    clave = CLAVES_DUPLICADOS.get(nombre_coleccion)
+    if clave:
+        pipeline.extend([
+            {'$group': {'_id': f'${clave}', 'documento': {'$first': '$$ROOT'}}},
+            {'$replaceRoot': {'newRoot': '$documento'}},
+            {'$sort': dict(orden_estable(orden))}
+        ])
+    return pipeline
+
+
+def construir_pipeline(nombre_coleccion, filtro=None, proyeccion=None, limite=None, orden=None):
+    pipeline = pipeline_seleccion(nombre_coleccion, filtro, proyeccion, limite, orden)
+
+    # Sin el campo origen no se agrega la columna, igual que en Transformacion
+    calculadas = {destino: {'$cond': [{'$eq': [{'$type': f'${origen}'}, 'missing']}, '$$REMOVE',
+                                      EXPRESIONES[regla](origen)]}
+                  for destino, regla, origen in COLUMNAS_PUSHDOWN.get(nombre_coleccion, [])
+                  if not proyeccion or origen in proyeccion}
+    if calculadas:
+        pipeline.append({'$addFields': calculadas})
+
+    if proyeccion and proyeccion.get('_id') == 0:
+        pipeline.append({'$project': {'_id': 0}})
+
+    return pipeline
@@ -0,0 +1,143 @@
+import json
+import ast
+import re
+import numpy as np
+import pandas as pd
+
+# Amenities que históricamente se expanden como columnas binarias (coincidencia por subcadena)
+AMENITIES_COMUNES = ['WiFi', 'Kitchen', 'Air conditioning', 'Heating',
+                     'TV', 'Washer', 'Dryer', 'Pool', 'Gym', 'Parking']
+
+PATRON_CARACTERES_INVALIDOS = re.compile(r'[^a-zA-Z0-9\s]')
+
+
+# Parsea la columna de amenities en una sola pasada y la representa como una matriz
+# CSR (listing x amenity) sobre un vocabulario de enteros
+class MotorAmenities:
+
+    def __init__(self):
+        self.vocabulario = []      # id -> nombre limpio
+        self.ids_vocabulario = {}  # nombre limpio -> id
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.errores = 0
+
+    @property
+    def total_filas(self):
+        return len(self.indptr) - 1
+
+    def parsear_valor(self, amenities):
+        # Mismas reglas que la versión fila a fila: nulos/vacíos -> [], '[...]' -> lista, texto -> [texto]
+        if amenities is None:
+            return []
+        if isinstance(amenities, (list, tuple, np.ndarray)):
+            return list(amenities)
+        if not isinstance(amenities, str):
+            return []
+
+        amenities_str = amenities.strip()
+        if amenities_str == '' or amenities_str.lower() == 'nan':
+            return []
+
+        if amenities_str.startswith('['):
+            # Ruta rápida JSON (formato de Inside Airbnb); literal_eval para comillas simples
+            try:
+                valor = json.loads(amenities_str)
+            except ValueError:
+                try:
+                    valor = ast.literal_eval(amenities_str)
+                except Exception:
+                    self.errores += 1
+                    return []
+            return valor if isinstance(valor, list) else []
+
+        return [amenities_str]
+
+    def procesar(self, serie):
+        vocabulario = []
+        ids_vocabulario = {}
+        # Cache de valor crudo -> id limpio (-1 si el valor se descarta al limpiar)
+        cache_crudos = {}
+        indices = []
+        indptr = [0]
+        self.errores = 0
+
+        for amenities in serie.tolist():
+            for item in self.parsear_valor(amenities):
+                if not item:
+                    continue
+                clave = item if isinstance(item, str) else str(item)
+                id_amenity = cache_crudos.get(clave)
+                if id_amenity is None:
+                    id_amenity = -1
+                    if clave.strip():
+                        limpio = PATRON_CARACTERES_INVALIDOS.sub('', clave).strip()
+                        if limpio:
+                            id_amenity = ids_vocabulario.get(limpio)
+                            if id_amenity is None:
+                                id_amenity = len(vocabulario)
+                                ids_vocabulario[limpio] = id_amenity
+                                vocabulario.append(limpio)
+                    cache_crudos[clave] = id_amenity
+                if id_amenity >= 0:
+                    indices.append(id_amenity)
+            indptr.append(len(indices))
+
+        self.vocabulario = vocabulario
+        self.ids_vocabulario = ids_vocabulario
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        return self
+
+    def frecuencias(self):
+        # Número de apariciones de cada amenity del vocabulario
+        return np.bincount(self.indices, minlength=len(self.vocabulario))
+
+    def top_n(self, n):
+        frecuencias = self.frecuencias()
+        orden = np.argsort(-frecuencias, kind='stable')[:n]
+        return [self.vocabulario[i] for i in orden if frecuencias[i] > 0]
+
+    def filas_por_entrada(self):
+        return np.repeat(np.arange(self.total_filas), np.diff(self.indptr))
+
+    def bandera_por_vocabulario(self, mascara_vocabulario):
+        # 1 si alguna amenity de la fila cae en la máscara del vocabulario
+        aciertos = np.concatenate(([0], np.cumsum(mascara_vocabulario[self.indices], dtype=np.int64)))
+        return (aciertos[self.indptr[1:]] - aciertos[self.indptr[:-1]] > 0).astype(np.int8)
+
+    def banderas_subcadena(self, amenities):
+        # Coincidencia por subcadena sin distinguir mayúsculas, evaluada una vez por término del vocabulario
+        vocabulario_lower = pd.Series(self.vocabulario, dtype=object).str.lower()
+        banderas = {}
+        for amenity in amenities:
+            mascara = vocabulario_lower.str.contains(amenity.lower(), regex=False).to_numpy(dtype=bool)
+            banderas[amenity] = self.bandera_por_vocabulario(mascara)
+        return banderas
+
+    def banderas_exactas(self, amenities):
+        # Todas las columnas en una sola dispersión sobre la matriz CSR
+        columnas = {nombre: j for j, nombre in enumerate(amenities)}
+        posicion = np.full(len(self.vocabulario) + 1, -1, dtype=np.int64)
+        for nombre, j in columnas.items():
+            id_amenity = self.ids_vocabulario.get(nombre)
+            if id_amenity is not None:
+                posicion[id_amenity] = j
+
+        bloque = np.zeros((self.total_filas, len(columnas)), dtype=np.int8)
+        posiciones = posicion[self.indices]
+        validas = posiciones >= 0
+        bloque[self.filas_por_entrada()[validas], posiciones[validas]] = 1
+        return {nombre: bloque[:, j] for nombre, j in columnas.items()}
+
+    def listas(self):
+        vocabulario = np.asarray(self.vocabulario, dtype=object)
+        return [vocabulario[self.indices[inicio:fin]].tolist()
+                for inicio, fin in zip(self.indptr[:-1], self.indptr[1:])]
+
+    def matriz_csr(self):
+        # scipy es opcional: solo se necesita si se quiere la matriz como objeto sparse
+        from scipy.sparse import csr_matrix
+        datos = np.ones(len(self.indices), dtype=np.int8)
+        return csr_matrix((datos, self.indices, self.indptr),
+                          shape=(self.total_filas, len(self.vocabulario)))
@@ -0,0 +1,182 @@
+import sys
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+
+from extraccion import Logs
+from transformacion import Transformacion
+from carga import Carga
+from metricas import Metricas
+from datos_sinteticos import GeneradorDatosSinteticos, ESCALAS
+
+# Una etapa es regresión si sus filas/s bajan más de este porcentaje respecto a la línea base
+TOLERANCIA_REGRESION = 0.20
+
+# Etapas más cortas que esto (en ambas corridas) son puro ruido de medición y no se comparan
+SEGUNDOS_MINIMOS_COMPARABLES = 0.05
+
+RUTA_LINEA_BASE = 'data/benchmark_linea_base.json'
+
+
+# Mide transformación y rutas de carga sobre datos sintéticos, sin necesidad de MongoDB
+class Benchmark:
+
+    def __init__(self, escala='10k', config=None):
+        self.escala = escala
+        self.config = config or {}
+        self.logs = Logs("BENCHMARK")
+
+    def ejecutar_repeticion(self, dataframes, directorio):
+        metricas = Metricas(self.config.get('metricas', {}))
+        metricas.iniciar_tracemalloc()
+        try:
+            transformador = Transformacion(self.config.get('transformacion', {}), metricas=metricas)
+            transformados = transformador.ejecutar_transformacion_completa(dataframes)
+
+            carga_config = dict(self.config.get('carga', {}))
+            cargador = Carga(
+                ruta_sqlite=os.path.join(directorio, 'benchmark.db'),
+                ruta_excel=os.path.join(directorio, 'excel'),
+                config=carga_config,
+                metricas=metricas
+            )
+
+            cargas = self.config.get('cargas', ['sqlite'])
+            if 'sqlite' in cargas:
+                cargador.cargar_a_sqlite(transformados)
+            if 'upsert' in cargas:
+                # Segunda pasada sobre la misma base: todas las filas entran por ON CONFLICT
+                cargador.cargar_incremental_sqlite(transformados)
+            if 'excel' in cargas:
+                cargador.exportar_a_excel(transformados)
+        finally:
+            metricas.detener_tracemalloc()
+
+        return metricas.resumen()
+
+    def ejecutar(self):
+        self.logs.info(f"=== BENCHMARK escala {self.escala} ===")
+
+        generador = GeneradorDatosSinteticos(self.config.get('semilla', 42))
+        dataframes = generador.generar(self.escala, self.config.get('colecciones', ('listings', 'reviews', 'calendar')))
+        for nombre, df in dataframes.items():
+            self.logs.info(f"Datos sintéticos '{nombre}': {len(df)} filas")
+
+        # Por etapa se conserva la repetición más rápida, la menos afectada por ruido
+        etapas = {}
+        directorio = tempfile.mkdtemp(prefix='benchmark_etl_')
+        try:
+            for repeticion in range(self.config.get('repeticiones', 1)):
+                self.logs.info(f"Repetición {repeticion + 1}")
+                for medicion in self.ejecutar_repeticion(dataframes, directorio):
+                    anterior = etapas.get(medicion['etapa'])
+                    if anterior is None or medicion['segundos'] < anterior['segundos']:
+                        etapas[medicion['etapa']] = medicion
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        return {
+            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'escala': self.escala,
+            'filas': {nombre: len(df) for nombre, df in dataframes.items()},
+            'etapas': etapas
+        }
+
+    def comparar(self, resultado, linea_base, tolerancia=TOLERANCIA_REGRESION):
+        regresiones = []
+
+        if linea_base.get('escala') != resultado['escala']:
+            self.logs.warning(f"La línea base es de escala {linea_base.get('escala')}, "
+                              f"la corrida de {resultado['escala']}: las filas/s no son comparables")
+
+        for etapa, medicion in resultado['etapas'].items():
+            base = linea_base.get('etapas', {}).get(etapa)
+            if base is None:
+                self.logs.info(f"{etapa}: sin línea base")
+                continue
+
+            if max(medicion['segundos'], base.get('segundos', 0)) < SEGUNDOS_MINIMOS_COMPARABLES:
+                self.logs.info(f"{etapa}: demasiado corta para comparar ({medicion['segundos']} s)")
+                continue
+
+            actual_fps = medicion.get('filas_por_segundo')
+            base_fps = base.get('filas_por_segundo')
+            if actual_fps and base_fps:
+                cambio = actual_fps / base_fps - 1
+                self.logs.info(f"{etapa}: {actual_fps:,.0f} filas/s (línea base {base_fps:,.0f}, {cambio:+.1%})")
+                if cambio < -tolerancia:
+                    regresiones.append(f"{etapa}: {actual_fps:,.0f} filas/s vs {base_fps:,.0f} ({cambio:+.1%})")
+
+            # Solo picos exactos: una etapa que no superó el pico de la corrida reporta una cota
+            actual_mem = medicion.get('tracemalloc_pico_mb') if medicion.get('tracemalloc_pico_exacto', True) else None
+            base_mem = base.get('tracemalloc_pico_mb') if base.get('tracemalloc_pico_exacto', True) else None
+            if actual_mem and base_mem and actual_mem > base_mem * (1 + tolerancia):
+                regresiones.append(f"{etapa}: pico de memoria {actual_mem} MB vs {base_mem} MB")
+
+        return regresiones
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark de transformación y carga con datos sintéticos')
+    parser.add_argument('--escala', default='10k', help=f"Una de {list(ESCALAS)} o un número de filas")
+    parser.add_argument('--cargas', default='sqlite', help="Rutas de carga a medir: sqlite,upsert,excel")
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1, help='Procesos de transformación')
+    parser.add_argument('--tracemalloc', action='store_true', help='Medir pico de memoria Python por etapa')
+    parser.add_argument('--linea-base', default=RUTA_LINEA_BASE, help='JSON con la línea base a comparar')
+    parser.add_argument('--guardar-linea-base', action='store_true', help='Guardar esta corrida como línea base')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_REGRESION)
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el resultado')
+
+    args = parser.parse_args()
+
+    config = {
+        'repeticiones': args.repeticiones,
+        'cargas': [carga.strip() for carga in args.cargas.split(',') if carga.strip()],
+        'transformacion': {'workers': args.workers},
+        'metricas': {'tracemalloc': args.tracemalloc}
+    }
+
+    benchmark = Benchmark(args.escala, config)
+    resultado = benchmark.ejecutar()
+
+    print(f"\n{'Etapa':<45} {'Segundos':>10} {'Filas/s':>14} {'RSS pico MB':>12}")
+    for etapa, medicion in resultado['etapas'].items():
+        filas_por_segundo = medicion.get('filas_por_segundo') or 0
+        print(f"{etapa:<45} {medicion['segundos']:>10.3f} {filas_por_segundo:>14,.0f} "
+              f"{medicion.get('rss_pico_mb') or 0:>12}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    if args.guardar_linea_base:
+        os.makedirs(os.path.dirname(args.linea_base) or '.', exist_ok=True)
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {args.linea_base}")
+        return
+
+    if not os.path.exists(args.linea_base):
+        print(f"\nNo hay línea base en {args.linea_base}; usa --guardar-linea-base para crearla")
+        return
+
+    with open(args.linea_base, 'r', encoding='utf-8') as f:
+        linea_base = json.load(f)
+
+    regresiones = benchmark.comparar(resultado, linea_base, args.tolerancia)
+    if regresiones:
+        print("\nREGRESIONES DE RENDIMIENTO:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        sys.exit(1)
+
+    print("\nSin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
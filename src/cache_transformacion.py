@@ -0,0 +1,168 @@
+import os
+import json
+import hashlib
+import pickle
+import numpy as np
+import pandas as pd
+
+import transformacion
+import amenities
+import sentimiento
+import geoespacial
+from extraccion import Logs
+from metricas import Metricas
+
+# Cambiar al modificar el formato de los archivos de caché (invalida todas las entradas)
+VERSION_CACHE = '1'
+
+# Módulos cuyo código define el resultado de Transformacion
+MODULOS_TRANSFORMACION = (transformacion, amenities, sentimiento, geoespacial)
+
+CLAVE_METADATOS = b'etl_cache'
+
+
+def version_codigo_transformacion():
+    # Hash del código fuente: cualquier cambio en la transformación invalida la caché
+    digest = hashlib.blake2b(digest_size=16)
+    for modulo in MODULOS_TRANSFORMACION:
+        with open(modulo.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def hash_columna(serie):
+    # Vectorizado; las columnas con dicts/listas/ObjectId (no hasheables) se hashean por su texto
+    try:
+        return pd.util.hash_pandas_object(serie, index=False)
+    except TypeError:
+        return pd.util.hash_pandas_object(serie.astype(str), index=False)
+
+
+def hash_dataframe(df):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(len(df)).encode())
+    for col in df.columns:
+        digest.update(f'{col}:{df[col].dtype}'.encode())
+        digest.update(hash_columna(df[col]).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def preparar_para_arrow(df):
+    # Columnas object que Arrow no puede guardar tal cual (ObjectId, dicts, tipos mezclados) se guardan
+    # serializadas en una columna binaria; las de listas van como list<string>. Ambas se reconstruyen al leer
+    serializadas = {}
+    listas = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        tipo = pd.api.types.infer_dtype(df[col], skipna=True)
+        if tipo in ('string', 'empty'):
+            continue
+        no_nulos = df[col].dropna()
+        if len(no_nulos) and all(isinstance(valor, list) and all(isinstance(item, str) for item in valor)
+                                 for valor in no_nulos):
+            listas.append(col)
+            continue
+        serializadas[col] = df[col].map(pickle.dumps).astype(object)
+    return (df.assign(**serializadas) if serializadas else df), listas, list(serializadas)
+
+
+def reconstruir_columnas(df, listas, serializadas):
+    for col in listas:
+        df[col] = df[col].map(lambda valor: list(valor) if isinstance(valor, np.ndarray) else valor)
+    for col in serializadas:
+        df[col] = df[col].map(pickle.loads).astype(object)
+    return df
+
+
+# Caché en disco de los DataFrames transformados, por colección. La clave combina el contenido extraído,
+# el código de Transformacion y su configuración; los archivos son Parquet y se desalojan por tamaño (LRU)
+class CacheTransformacion:
+
+    def __init__(self, config_transformacion=None, config=None, metricas=None):
+        self.config = config or {}
+        self.logs = Logs("CACHE_TRANSFORMACION")
+        self.metricas = metricas or Metricas()
+        self.directorio = self.config.get('directorio', 'data/cache_transformacion/')
+        self.limite_bytes = self.config.get('limite_mb', 2048) * 1024 * 1024
+
+        configuracion = json.dumps(config_transformacion or {}, sort_keys=True, default=str)
+        self.version = hashlib.blake2b(
+            f'{VERSION_CACHE}|{pd.__version__}|{version_codigo_transformacion()}|{configuracion}'.encode(),
+            digest_size=16
+        ).hexdigest()
+
+    def clave(self, nombre, df):
+        with self.metricas.medir(f'transformacion.cache.hash.{nombre}', len(df)):
+            contenido = hash_dataframe(df)
+        return f'{nombre}_{hashlib.blake2b(f"{self.version}|{contenido}".encode(), digest_size=16).hexdigest()}'
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, f'{clave}.parquet')
+
+    def leer(self, nombre, clave):
+        import pyarrow.parquet as pq
+
+        ruta = self.ruta(clave)
+        if not os.path.exists(ruta):
+            return None
+
+        try:
+            with self.metricas.medir(f'transformacion.cache.lectura.{nombre}') as medicion:
+                tabla = pq.read_table(ruta)
+                metadatos = json.loads(tabla.schema.metadata[CLAVE_METADATOS])
+                df = reconstruir_columnas(tabla.to_pandas(), metadatos['listas'], metadatos['serializadas'])
+                medicion['filas'] = len(df)
+        except Exception as e:
+            # Archivo corrupto o de otra versión de pyarrow: se trata como fallo de caché
+            self.logs.warning(f"Entrada de caché ilegible '{ruta}', se descarta: {str(e)}")
+            os.remove(ruta)
+            return None
+
+        # LRU: la fecha de modificación marca el último uso
+        os.utime(ruta)
+        return df, metadatos.get('memoria')
+
+    def guardar(self, nombre, clave, df, memoria=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(clave)
+        temporal = f'{ruta}.tmp'
+
+        try:
+            with self.metricas.medir(f'transformacion.cache.escritura.{nombre}', len(df)):
+                preparado, listas, serializadas = preparar_para_arrow(df)
+                tabla = pa.Table.from_pandas(preparado)
+                metadatos = {CLAVE_METADATOS: json.dumps(
+                    {'listas': listas, 'serializadas': serializadas, 'memoria': memoria}).encode()}
+                tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), **metadatos})
+                # Compresión ligera: la caché se lee más de lo que se escribe
+                pq.write_table(tabla, temporal, compression='lz4')
+                os.replace(temporal, ruta)
+        except Exception as e:
+            self.logs.warning(f"No se pudo guardar '{nombre}' en caché: {str(e)}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            return False
+
+        self.desalojar()
+        return True
+
+    def desalojar(self):
+        # Borra las entradas usadas hace más tiempo hasta quedar bajo el límite
+        entradas = []
+        for archivo in os.listdir(self.directorio):
+            if archivo.endswith('.parquet'):
+                ruta = os.path.join(self.directorio, archivo)
+                estado = os.stat(ruta)
+                entradas.append((estado.st_mtime, estado.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            os.remove(ruta)
+            total -= tamano
+            self.logs.info(f"Entrada de caché desalojada: {os.path.basename(ruta)}")
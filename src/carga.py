@@ -1,18 +1,127 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
 from datetime import datetime
 import openpyxl
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from concurrent.futures import ProcessPoolExecutor
 from extraccion import Logs
+from metricas import Metricas
+from salida_parquet import escribir_parquet
+from modelo_dimensional import ModeloDimensional
+from checksums_carga import ChecksumsCarga
+from geoespacial import IndiceEspacial
+
+# Índices que se crean después de la carga masiva, por colección
+INDICES_SQLITE = {
+    'listings': ['id'],
+    'reviews': ['id', 'listing_id', 'date_clean'],
+    'calendar': ['listing_id', 'date_clean']
+}
+
+# Límite de filas de una hoja de Excel (1,048,576) menos la fila de encabezado
+MAX_FILAS_EXCEL = 1048575
+
+
+def valores_excel(serie):
+    # Convierte un tramo de columna a valores que openpyxl escribe directamente (nulos -> celda vacía)
+    if pd.api.types.is_datetime64_any_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+        if pd.api.types.is_bool_dtype(serie):
+            serie = serie.astype('Int8')
+        return serie.astype(object).where(serie.notna(), None).tolist()
+    
+    valores = []
+    for valor in serie.astype(object).tolist():
+        if isinstance(valor, str):
+            # openpyxl rechaza caracteres de control que a veces traen los comentarios
+            valores.append(ILLEGAL_CHARACTERS_RE.sub('', valor))
+        elif isinstance(valor, (int, float)):
+            valores.append(None if isinstance(valor, float) and np.isnan(valor) else valor)
+        elif valor is None or (not isinstance(valor, (list, dict, tuple, np.ndarray)) and pd.isna(valor)):
+            valores.append(None)
+        else:
+            valores.append(ILLEGAL_CHARACTERS_RE.sub('', str(valor)))
+    return valores
+
+
+def escribir_hoja_datos(libro, titulo, df, tamano_lote):
+    hoja = libro.create_sheet(titulo)
+    encabezado = []
+    for col in df.columns:
+        celda = WriteOnlyCell(hoja, value=str(col))
+        celda.font = Font(bold=True)
+        encabezado.append(celda)
+    hoja.append(encabezado)
+    
+    for inicio in range(0, len(df), tamano_lote):
+        lote = df.iloc[inicio:inicio + tamano_lote]
+        for fila in zip(*[valores_excel(lote[col]) for col in df.columns]):
+            hoja.append(fila)
+
+
+def escribir_excel_streaming(nombre, df, ruta_excel, timestamp, config):
+    # Función de módulo para poder ejecutarla en un pool de procesos; devuelve los archivos escritos
+    filas_por_hoja = min(config.get('excel_filas_por_hoja', MAX_FILAS_EXCEL), MAX_FILAS_EXCEL)
+    tamano_lote = config.get('tamano_lote_excel', 10000)
+    division = config.get('excel_division', 'hojas')
+    
+    tramos = [df.iloc[inicio:inicio + filas_por_hoja] for inicio in range(0, len(df), filas_por_hoja)] or [df]
+    
+    # 'hojas': un libro con Datos, Datos_2, ...; 'archivos': un libro por tramo
+    if division == 'archivos' and len(tramos) > 1:
+        grupos = [[tramo] for tramo in tramos]
+    else:
+        grupos = [tramos]
+    
+    archivos = []
+    for numero_grupo, grupo in enumerate(grupos, start=1):
+        sufijo = f"_parte{numero_grupo}" if len(grupos) > 1 else ""
+        archivo_excel = os.path.join(ruta_excel, f"{nombre}_transformado_{timestamp}{sufijo}.xlsx")
+        
+        # Modo write-only: las filas se vuelcan a disco a medida que se agregan
+        libro = openpyxl.Workbook(write_only=True)
+        for numero_hoja, tramo in enumerate(grupo, start=1):
+            titulo = 'Datos' if numero_hoja == 1 else f'Datos_{numero_hoja}'
+            escribir_hoja_datos(libro, titulo, tramo, tamano_lote)
+        
+        # Crear hoja de resumen
+        resumen = libro.create_sheet('Resumen')
+        resumen.append(['Métrica', 'Valor'])
+        resumen.append(['Total de registros', len(df)])
+        resumen.append(['Registros en este archivo', sum(len(tramo) for tramo in grupo)])
+        resumen.append(['Total de columnas', len(df.columns)])
+        resumen.append(['Hojas de datos', len(grupo)])
+        resumen.append(['Fecha de exportación', datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+        
+        libro.save(archivo_excel)
+        archivos.append(archivo_excel)
+    
+    return archivos
+
+
+# Claves naturales para el upsert incremental (INSERT ... ON CONFLICT DO UPDATE)
+CLAVES_UPSERT = {
+    'listings': ['id'],
+    'reviews': ['id'],
+    'calendar': ['listing_id', 'date_clean']
+}
+
+# Tabla de estado del ETL con el watermark de cada colección
+TABLA_ESTADO = 'etl_estado'
 
 class Carga:
     
-    def __init__(self, ruta_sqlite='data/airbnb_dw.db', ruta_excel='output/'):
+    def __init__(self, ruta_sqlite='data/airbnb_dw.db', ruta_excel='output/', config=None, metricas=None):
         self.ruta_sqlite = ruta_sqlite
         self.ruta_excel = ruta_excel
+        self.config = config or {}
+        self.ruta_parquet = self.config.get('parquet_path', 'data/parquet/')
         self.logs = Logs("CARGA")
+        self.metricas = metricas or Metricas()
         
         # Crear directorios si no existen
         os.makedirs(os.path.dirname(self.ruta_sqlite), exist_ok=True)
@@ -20,38 +129,180 @@ class Carga:
         
         self.logs.info(f"Carga inicializada - SQLite: {self.ruta_sqlite}, Excel: {self.ruta_excel}")
     
+    def tipo_sqlite(self, serie):
+        if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+            return 'INTEGER'
+        if pd.api.types.is_float_dtype(serie):
+            return 'REAL'
+        return 'TEXT'
+    
+    def formato_fecha_sqlite(self, serie):
+        # Fechas truncadas al día se guardan como 'YYYY-MM-DD', igual que cuando eran texto
+        fechas = serie.dropna()
+        return '%Y-%m-%d' if (fechas.dt.normalize() == fechas).all() else '%Y-%m-%d %H:%M:%S'
+    
+    def valores_sqlite(self, serie, formato_fecha='%Y-%m-%d %H:%M:%S'):
+        # Convierte un tramo de columna a valores Python aceptados por sqlite3 (nulos -> None)
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.dt.strftime(formato_fecha).astype(object).where(serie.notna(), None).tolist()
+        
+        if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+            if pd.api.types.is_bool_dtype(serie):
+                serie = serie.astype('Int8')
+            return serie.astype(object).where(serie.notna(), None).tolist()
+        
+        # Texto, categorías y objetos de MongoDB (ObjectId, listas): todo lo que no es escalar pasa a str
+        valores = []
+        for valor in serie.astype(object).tolist():
+            if isinstance(valor, (str, int, float)):
+                valores.append(None if isinstance(valor, float) and np.isnan(valor) else valor)
+            elif valor is None or (not isinstance(valor, (list, dict, tuple, np.ndarray)) and pd.isna(valor)):
+                valores.append(None)
+            else:
+                valores.append(str(valor))
+        return valores
+    
+    def journal_mode_carga(self):
+        # Con journal_mode=OFF el ROLLBACK de una carga fallida deja la base en estado indefinido
+        journal_mode = str(self.config.get('sqlite_journal_mode', 'MEMORY')).upper()
+        if journal_mode == 'OFF':
+            self.logs.warning("sqlite_journal_mode=OFF no permite ROLLBACK seguro, se usa MEMORY")
+            return 'MEMORY'
+        return journal_mode
+    
+    def configurar_pragmas_carga(self, conn):
+        journal_mode = self.journal_mode_carga()
+        cache_mb = self.config.get('sqlite_cache_mb', 512)
+        
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(f"PRAGMA cache_size=-{int(cache_mb) * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    
+    def restaurar_pragmas(self, conn):
+        conn.execute("PRAGMA synchronous=FULL")
+        if str(self.config.get('sqlite_journal_mode', 'MEMORY')).upper() != 'WAL':
+            conn.execute("PRAGMA journal_mode=DELETE")
+    
+    def ejecutar_en_lotes(self, conn, sql, df, columnas=None, tabla_checksums=None, preparar=None):
+        # columnas: subconjunto a escribir; se lee del DataFrame original en vez de copiar df[columnas]
+        # tabla_checksums: tabla donde se agregan filas; se registra el checksum de cada lote
+        # preparar: DDL previo (DROP/CREATE, ALTER) que se confirma o revierte junto con los datos
+        tamano_lote = self.config.get('tamano_lote_sqlite', 50000)
+        columnas = list(df.columns) if columnas is None else columnas
+        formatos_fecha = {col: self.formato_fecha_sqlite(df[col]) for col in columnas
+                          if pd.api.types.is_datetime64_any_dtype(df[col])}
+        
+        checksums = None
+        if tabla_checksums and self.config.get('checksums', True):
+            checksums = ChecksumsCarga(conn, self.logs)
+        
+        # Una sola transacción, executemany por lotes para acotar la memoria de conversión. Dentro de la
+        # transacción de una carga por chunks (abrir_carga_streaming) el lote es un SAVEPOINT de esa transacción
+        anidada = conn.in_transaction
+        conn.execute("SAVEPOINT lote" if anidada else "BEGIN")
+        try:
+            if preparar is not None:
+                preparar()
+            if checksums is not None:
+                afinidades = checksums.afinidades_tabla(tabla_checksums)
+            
+            for inicio in range(0, len(df), tamano_lote):
+                lote = df.iloc[inicio:inicio + tamano_lote]
+                valores = [self.valores_sqlite(lote[col], formatos_fecha.get(col)) for col in columnas]
+                if checksums is None:
+                    conn.executemany(sql, zip(*valores))
+                    continue
+                
+                # Filas nuevas al final de la tabla: el lote ocupa el rango de rowid siguiente al último
+                rowid_inicio = checksums.ultimo_rowid(tabla_checksums) + 1
+                conn.executemany(sql, zip(*valores))
+                checksums.registrar(tabla_checksums, dict(zip(columnas, valores)), afinidades,
+                                    rowid_inicio, checksums.ultimo_rowid(tabla_checksums))
+            conn.execute("RELEASE lote" if anidada else "COMMIT")
+        except Exception:
+            if anidada:
+                conn.execute("ROLLBACK TO lote")
+                conn.execute("RELEASE lote")
+            else:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            if checksums is not None:
+                checksums.cerrar()
+    
+    def sql_insert(self, tabla_nombre, columnas):
+        columnas_sql = ', '.join(f'"{col}"' for col in columnas)
+        marcadores = ', '.join('?' for _ in columnas)
+        return f'INSERT INTO "{tabla_nombre}" ({columnas_sql}) VALUES ({marcadores})'
+    
+    def crear_tabla_sqlite(self, conn, tabla_nombre, df, columnas=None):
+        # Esquema explícito a partir de los dtypes
+        columnas = list(df.columns) if columnas is None else columnas
+        definicion = ', '.join(f'"{col}" {self.tipo_sqlite(df[col])}' for col in columnas)
+        conn.execute(f'DROP TABLE IF EXISTS "{tabla_nombre}"')
+        self.invalidar_checksums(conn, tabla_nombre)
+        conn.execute(f'CREATE TABLE "{tabla_nombre}" ({definicion})')
+    
+    def agregar_columnas_faltantes(self, conn, tabla_nombre, df, columnas=None):
+        columnas_tabla = {fila[1] for fila in conn.execute(f'PRAGMA table_info("{tabla_nombre}")')}
+        for col in (df.columns if columnas is None else columnas):
+            if col not in columnas_tabla:
+                conn.execute(f'ALTER TABLE "{tabla_nombre}" ADD COLUMN "{col}" {self.tipo_sqlite(df[col])}')
+                self.logs.info(f"Columna '{col}' agregada a '{tabla_nombre}'")
+    
+    def crear_indices_sqlite(self, conn, tabla_nombre, columnas_indice):
+        # Índices después de los datos: construirlos al final es mucho más barato que mantenerlos fila a fila
+        columnas_tabla = {fila[1] for fila in conn.execute(f'PRAGMA table_info("{tabla_nombre}")')}
+        for col in columnas_indice or []:
+            if col in columnas_tabla:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabla_nombre}_{col}" ON "{tabla_nombre}" ("{col}")')
+                self.logs.info(f"Índice creado en '{tabla_nombre}'.{col}")
+    
+    def cargar_tabla_sqlite(self, conn, tabla_nombre, df, columnas_indice=None, columnas=None):
+        columnas = list(df.columns) if columnas is None else columnas
+        # DROP/CREATE dentro de la transacción de los datos: si la carga falla se conserva la tabla anterior
+        self.ejecutar_en_lotes(conn, self.sql_insert(tabla_nombre, columnas), df, columnas, tabla_nombre,
+                               preparar=lambda: self.crear_tabla_sqlite(conn, tabla_nombre, df, columnas))
+        self.crear_indices_sqlite(conn, tabla_nombre, columnas_indice)
+    
+    def invalidar_checksums(self, conn, tabla_nombre):
+        checksums = ChecksumsCarga(conn, self.logs)
+        try:
+            checksums.invalidar(tabla_nombre)
+        finally:
+            checksums.cerrar()
+    
     def cargar_a_sqlite(self, dataframes_transformados):
         self.logs.info("=== INICIANDO CARGA A SQLITE ===")
         
         try:
-            with sqlite3.connect(self.ruta_sqlite) as conn:
+            conn = sqlite3.connect(self.ruta_sqlite, isolation_level=None)
+            try:
+                self.configurar_pragmas_carga(conn)
+                
                 for nombre, df in dataframes_transformados.items():
                     if not df.empty:
-                        # Crear una copia del DataFrame para no modificar el original
-                        df_limpio = df.copy()
-                        
-                        # Eliminar columnas problemáticas de MongoDB
+                        # Eliminar columnas problemáticas de MongoDB (sin copiar el DataFrame)
                         columnas_a_eliminar = ['_id']
                         for col in columnas_a_eliminar:
-                            if col in df_limpio.columns:
-                                df_limpio = df_limpio.drop(columns=[col])
+                            if col in df.columns:
                                 self.logs.info(f"Columna '{col}' eliminada para compatibilidad con SQLite")
-                        
-                        # Convertir cualquier ObjectId restante a string
-                        for col in df_limpio.columns:
-                            if df_limpio[col].dtype == 'object':
-                                try:
-                                    # Convertir posibles ObjectIds a string
-                                    df_limpio[col] = df_limpio[col].astype(str)
-                                except:
-                                    pass
+                        columnas = [col for col in df.columns if col not in columnas_a_eliminar]
                         
                         # Cargar DataFrame a SQLite
                         tabla_nombre = f"raw_{nombre}_transformado"
-                        df_limpio.to_sql(tabla_nombre, conn, if_exists='replace', index=False)
-                        self.logs.info(f"Tabla '{tabla_nombre}' cargada: {len(df_limpio)} registros, {len(df_limpio.columns)} columnas")
+                        with self.metricas.medir(f'carga.sqlite.{tabla_nombre}', len(df)):
+                            self.cargar_tabla_sqlite(conn, tabla_nombre, df, INDICES_SQLITE.get(nombre), columnas)
+                        self.logs.info(f"Tabla '{tabla_nombre}' cargada: {len(df)} registros, {len(columnas)} columnas")
                     else:
                         self.logs.warning(f"DataFrame '{nombre}' está vacío, saltando carga")
+                
+                self.construir_modelo_dimensional(conn)
+                self.construir_indice_espacial(conn)
+                self.restaurar_pragmas(conn)
+            finally:
+                conn.close()
             
             self.logs.info("Carga a SQLite completada exitosamente")
             
@@ -59,60 +310,279 @@ class Carga:
             self.logs.error(f"Error en carga a SQLite: {str(e)}")
             raise
     
+    def abrir_carga_streaming(self):
+        # La conexión se abre en el hilo que la usa: sqlite3 no comparte conexiones entre hilos
+        # Todos los chunks van en una transacción: si una etapa falla a mitad de camino, revertir_carga_streaming
+        # deja las tablas como estaban antes de la corrida en vez de a medio cargar
+        conn = sqlite3.connect(self.ruta_sqlite, isolation_level=None)
+        self.configurar_pragmas_carga(conn)
+        conn.execute("BEGIN")
+        return conn
+    
+    def revertir_carga_streaming(self, conn):
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+            self.logs.warning("Carga por chunks revertida: las tablas quedan como antes de la corrida")
+    
+    def finalizar_carga_streaming(self, conn, nombres):
+        conn.execute("COMMIT")
+        # Índices una sola vez, cuando ya llegaron todos los chunks
+        for nombre in nombres:
+            self.crear_indices_sqlite(conn, f"raw_{nombre}_transformado", INDICES_SQLITE.get(nombre))
+        if nombres:
+            self.construir_modelo_dimensional(conn)
+            self.construir_indice_espacial(conn)
+        self.restaurar_pragmas(conn)
+    
+    def construir_modelo_dimensional(self, conn):
+        # Esquema estrella (dim_*, fact_*, agg_*) reconstruido desde las tablas raw_*_transformado
+        if not self.config.get('modelo_dimensional', True):
+            return []
+        
+        self.logs.info("Construyendo modelo dimensional")
+        with self.metricas.medir('carga.modelo_dimensional'):
+            tablas = ModeloDimensional(conn, self.logs).construir()
+        for tabla in tablas:
+            cantidad = conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+            self.logs.info(f"Tabla '{tabla}': {cantidad} registros")
+        return tablas
+    
+    def construir_indice_espacial(self, conn):
+        # R*Tree de listings por id para consultas por caja y radio (ver geoespacial.IndiceEspacial)
+        if not self.config.get('indice_espacial', True):
+            return 0
+        
+        try:
+            with self.metricas.medir('carga.indice_espacial'):
+                cantidad = IndiceEspacial(conn, self.logs).construir()
+            self.logs.info(f"Índice espacial R*Tree: {cantidad} listings")
+            return cantidad
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sin el módulo rtree
+            self.logs.warning(f"No se pudo construir el índice espacial: {str(e)}")
+            return 0
+    
+    def leer_watermarks(self):
+        if not os.path.exists(self.ruta_sqlite):
+            return {}
+        
+        with sqlite3.connect(self.ruta_sqlite) as conn:
+            existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLA_ESTADO,)).fetchone()
+            if not existe:
+                return {}
+            filas = conn.execute(f'SELECT coleccion, campo, tipo, valor FROM "{TABLA_ESTADO}"').fetchall()
+        
+        return {coleccion: {'campo': campo, 'tipo': tipo, 'valor': valor} for coleccion, campo, tipo, valor in filas}
+    
+    def guardar_watermarks(self, watermarks):
+        if not watermarks:
+            return
+        
+        with sqlite3.connect(self.ruta_sqlite) as conn:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS "{TABLA_ESTADO}" (
+                coleccion TEXT PRIMARY KEY, campo TEXT, tipo TEXT, valor TEXT, actualizado TEXT)''')
+            actualizado = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            conn.executemany(
+                f'''INSERT INTO "{TABLA_ESTADO}" (coleccion, campo, tipo, valor, actualizado) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(coleccion) DO UPDATE SET campo=excluded.campo, tipo=excluded.tipo,
+                valor=excluded.valor, actualizado=excluded.actualizado''',
+                [(nombre, w['campo'], w['tipo'], w['valor'], actualizado) for nombre, w in watermarks.items()]
+            )
+        
+        for nombre, w in watermarks.items():
+            self.logs.info(f"Watermark guardado para '{nombre}': {w['campo']} = {w['valor']}")
+    
+    def asegurar_clave_unica(self, conn, tabla_nombre, claves):
+        nombre_indice = f"uq_{tabla_nombre}"
+        columnas_sql = ', '.join(f'"{col}"' for col in claves)
+        try:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{nombre_indice}" ON "{tabla_nombre}" ({columnas_sql})')
+        except sqlite3.IntegrityError:
+            # Tabla cargada en modo completo con claves repetidas: se conserva la última fila de cada clave
+            self.logs.warning(f"Claves repetidas en '{tabla_nombre}', depurando antes de crear el índice único")
+            conn.execute(f'''DELETE FROM "{tabla_nombre}" WHERE rowid NOT IN
+                (SELECT MAX(rowid) FROM "{tabla_nombre}" GROUP BY {columnas_sql})''')
+            self.invalidar_checksums(conn, tabla_nombre)
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{nombre_indice}" ON "{tabla_nombre}" ({columnas_sql})')
+    
+    def upsert_tabla_sqlite(self, conn, tabla_nombre, df, claves, columnas=None):
+        columnas = list(df.columns) if columnas is None else columnas
+        existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla_nombre,)).fetchone()
+        if not existe:
+            self.cargar_tabla_sqlite(conn, tabla_nombre, df, columnas=columnas)
+            self.asegurar_clave_unica(conn, tabla_nombre, claves)
+            return
+        
+        def preparar():
+            # Columnas nuevas en el delta se agregan a la tabla existente
+            self.agregar_columnas_faltantes(conn, tabla_nombre, df, columnas)
+            self.asegurar_clave_unica(conn, tabla_nombre, claves)
+            
+            # El upsert modifica filas en su lugar: la tabla queda sin checksums y se verifica por conteo
+            self.invalidar_checksums(conn, tabla_nombre)
+        
+        actualizaciones = ', '.join(f'"{col}"=excluded."{col}"' for col in columnas if col not in claves)
+        conflicto = ', '.join(f'"{col}"' for col in claves)
+        upsert_sql = (self.sql_insert(tabla_nombre, columnas) + f' ON CONFLICT({conflicto}) DO ' +
+                      (f'UPDATE SET {actualizaciones}' if actualizaciones else 'NOTHING'))
+        self.ejecutar_en_lotes(conn, upsert_sql, df, columnas, preparar=preparar)
+    
+    def cargar_lote_sqlite(self, conn, nombre, df, primer_lote, incremental=False):
+        # Carga de un chunk del modo pipeline: el primero crea la tabla, los siguientes agregan filas
+        columnas = [col for col in df.columns if col != '_id']
+        tabla_nombre = f"raw_{nombre}_transformado"
+        
+        if incremental:
+            self.upsert_tabla_sqlite(conn, tabla_nombre, df, CLAVES_UPSERT[nombre], columnas)
+        elif primer_lote:
+            self.cargar_tabla_sqlite(conn, tabla_nombre, df, columnas=columnas)
+        else:
+            self.agregar_columnas_faltantes(conn, tabla_nombre, df, columnas)
+            self.ejecutar_en_lotes(conn, self.sql_insert(tabla_nombre, columnas), df, columnas, tabla_nombre)
+        
+        return tabla_nombre
+    
+    def cargar_incremental_sqlite(self, dataframes_transformados):
+        self.logs.info("=== INICIANDO CARGA INCREMENTAL A SQLITE ===")
+        
+        try:
+            conn = sqlite3.connect(self.ruta_sqlite, isolation_level=None)
+            try:
+                self.configurar_pragmas_carga(conn)
+                
+                actualizadas = []
+                for nombre, df in dataframes_transformados.items():
+                    if df.empty:
+                        self.logs.info(f"Sin cambios en '{nombre}'")
+                        continue
+                    
+                    claves = CLAVES_UPSERT.get(nombre)
+                    columnas = [col for col in df.columns if col != '_id']
+                    if not claves or not all(col in columnas for col in claves):
+                        self.logs.warning(f"'{nombre}' no tiene las columnas clave {claves}, saltando upsert")
+                        continue
+                    
+                    tabla_nombre = f"raw_{nombre}_transformado"
+                    with self.metricas.medir(f'carga.upsert.{tabla_nombre}', len(df)):
+                        self.upsert_tabla_sqlite(conn, tabla_nombre, df, claves, columnas)
+                    actualizadas.append(tabla_nombre)
+                    self.logs.info(f"Tabla '{tabla_nombre}' actualizada: {len(df)} registros insertados/actualizados")
+                
+                # El modelo dimensional y el R*Tree se reconstruyen completos: sin filas nuevas no hace falta
+                if actualizadas:
+                    self.construir_modelo_dimensional(conn)
+                    self.construir_indice_espacial(conn)
+                else:
+                    self.logs.info("Sin registros nuevos, se conservan el modelo dimensional y el índice espacial")
+                self.restaurar_pragmas(conn)
+            finally:
+                conn.close()
+            
+            self.logs.info("Carga incremental a SQLite completada exitosamente")
+            
+        except Exception as e:
+            self.logs.error(f"Error en carga incremental a SQLite: {str(e)}")
+            raise
+    
     def exportar_a_excel(self, dataframes_transformados):
         self.logs.info("=== INICIANDO EXPORTACIÓN A EXCEL ===")
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M")
         
         try:
+            tablas = {}
             for nombre, df in dataframes_transformados.items():
                 if df.empty:
                     self.logs.warning(f"DataFrame '{nombre}' está vacío, saltando exportación")
                     continue
+                tablas[nombre] = df
+            
+            if self.config.get('excel_paralelo', False) and len(tablas) > 1:
+                # Un libro por colección en procesos separados (openpyxl es CPU-bound); se mide el conjunto
+                filas = sum(len(df) for df in tablas.values())
+                with self.metricas.medir('carga.excel.paralelo', filas):
+                    with ProcessPoolExecutor(max_workers=len(tablas)) as pool:
+                        futuros = {nombre: pool.submit(escribir_excel_streaming, nombre, df, self.ruta_excel, timestamp, self.config)
+                                   for nombre, df in tablas.items()}
+                        resultados = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+            else:
+                resultados = {}
+                for nombre, df in tablas.items():
+                    with self.metricas.medir(f'carga.excel.{nombre}', len(df)):
+                        resultados[nombre] = escribir_excel_streaming(nombre, df, self.ruta_excel, timestamp, self.config)
+            
+            for nombre, archivos in resultados.items():
+                for archivo_excel in archivos:
+                    self.logs.info(f"Archivo Excel creado: {archivo_excel}")
                 
-                archivo_excel = os.path.join(self.ruta_excel, f"{nombre}_transformado_{timestamp}.xlsx")
-                
-                # Exportar de manera simple usando pandas
-                with pd.ExcelWriter(archivo_excel, engine='openpyxl') as writer:
-                    # Escribir datos principales
-                    df.to_excel(writer, sheet_name='Datos', index=False)
-                    
-                    # Crear hoja de resumen
-                    resumen_data = {
-                        'Métrica': ['Total de registros', 'Total de columnas', 'Fecha de exportación'],
-                        'Valor': [len(df), len(df.columns), datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                    }
-                    
-                    df_resumen = pd.DataFrame(resumen_data)
-                    df_resumen.to_excel(writer, sheet_name='Resumen', index=False)
+        except Exception as e:
+            self.logs.error(f"Error en exportación a Excel: {str(e)}")
+            raise
+    
+    def exportar_a_parquet(self, dataframes_transformados, incremental=False):
+        self.logs.info("=== INICIANDO EXPORTACIÓN A PARQUET ===")
+        
+        # En modo incremental el delta se agrega como archivos nuevos junto a los existentes
+        sufijo = datetime.now().strftime("%Y%m%d_%H%M%S") if incremental else None
+        
+        try:
+            for nombre, df in dataframes_transformados.items():
+                if df.empty:
+                    self.logs.warning(f"DataFrame '{nombre}' está vacío, saltando exportación")
+                    continue
                 
-                self.logs.info(f"Archivo Excel creado: {archivo_excel}")
+                with self.metricas.medir(f'carga.parquet.{nombre}', len(df)):
+                    directorio = escribir_parquet(nombre, df, self.ruta_parquet, self.config, sufijo)
+                self.logs.info(f"Dataset Parquet escrito: {directorio} ({len(df)} registros)")
                 
+        except ImportError:
+            self.logs.error("La salida Parquet requiere pyarrow (pip install pyarrow)")
+            raise
         except Exception as e:
-            self.logs.error(f"Error en exportación a Excel: {str(e)}")
+            self.logs.error(f"Error en exportación a Parquet: {str(e)}")
             raise
     
     def verificar_carga(self):
         self.logs.info("=== VERIFICANDO INTEGRIDAD DE CARGA ===")
         
         verificacion = {}
+        muestra = self.config.get('verificacion_muestra', 0.05)
+        semilla = self.config.get('verificacion_semilla', 0)
         
         try:
             with sqlite3.connect(self.ruta_sqlite) as conn:
-                # Obtener lista de tablas
-                cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                tablas = [row[0] for row in cursor.fetchall()]
-                
-                for tabla in tablas:
-                    # Contar registros
-                    cursor = conn.execute(f"SELECT COUNT(*) FROM [{tabla}]")
-                    count = cursor.fetchone()[0]
-                    
-                    verificacion[tabla] = {
-                        'registros': count
-                    }
-                    
-                    self.logs.info(f"Tabla '{tabla}': {count} registros")
+                checksums = ChecksumsCarga(conn, self.logs)
+                try:
+                    # Solo las tablas que escribe la carga, no todo sqlite_master
+                    for nombre in CLAVES_UPSERT:
+                        tabla = f"raw_{nombre}_transformado"
+                        if not checksums.existe_tabla(tabla):
+                            continue
+                        
+                        with self.metricas.medir(f'carga.verificacion.{tabla}'):
+                            if checksums.chunks(tabla):
+                                verificacion[tabla] = checksums.verificar(tabla, muestra, semilla)
+                            else:
+                                # Cargada con upserts: solo se puede contar
+                                count = conn.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+                                verificacion[tabla] = {'registros': count, 'estado': 'SIN_CHECKSUM'}
+                        
+                        resultado = verificacion[tabla]
+                        if resultado['estado'] == 'ERROR':
+                            for error in resultado['chunks_con_error']:
+                                self.logs.error(f"Tabla '{tabla}', chunk {error['chunk']} (rowid {error['rowid_inicio']}-"
+                                                f"{error['rowid_fin']}): {error['filas_encontradas']} filas de "
+                                                f"{error['filas_esperadas']}, hash {error['hash_encontrado']} "
+                                                f"(esperado {error['hash_esperado']})")
+                            if resultado['filas_sin_checksum']:
+                                self.logs.error(f"Tabla '{tabla}': {resultado['filas_sin_checksum']} filas fuera de los chunks registrados")
+                        elif 'chunks' in resultado:
+                            self.logs.info(f"Tabla '{tabla}': {resultado['registros']} registros, "
+                                           f"{resultado['chunks_verificados']}/{resultado['chunks']} chunks verificados")
+                        else:
+                            self.logs.info(f"Tabla '{tabla}': {resultado['registros']} registros (sin checksum)")
+                finally:
+                    checksums.cerrar()
             
             return verificacion
             
@@ -120,15 +590,74 @@ class Carga:
             self.logs.error(f"Error en verificación: {str(e)}")
             return {}
     
-    def ejecutar_carga_completa(self, dataframes_transformados):
+    def recargar_chunk(self, tabla_nombre, chunk, df):
+        # Reescribe un chunk que la verificación marcó con error: df trae las filas de ese chunk (las mismas
+        # que se cargaron en él, en el mismo orden) y ocupan de nuevo su rango de rowid
+        try:
+            conn = sqlite3.connect(self.ruta_sqlite, isolation_level=None)
+            checksums = ChecksumsCarga(conn, self.logs)
+            try:
+                registro = checksums.chunk(tabla_nombre, chunk)
+                if registro is None:
+                    raise ValueError(f"'{tabla_nombre}' no tiene checksum para el chunk {chunk}")
+                _, rowid_inicio, rowid_fin, _, _ = registro
+                if len(df) != rowid_fin - rowid_inicio + 1:
+                    raise ValueError(f"El chunk {chunk} de '{tabla_nombre}' ocupa {rowid_fin - rowid_inicio + 1} "
+                                     f"filas, se recibieron {len(df)}")
+                
+                columnas = [col for col in df.columns if col != '_id']
+                columnas_tabla = checksums.afinidades_tabla(tabla_nombre)
+                faltantes = [col for col in columnas if col not in columnas_tabla]
+                if faltantes:
+                    raise ValueError(f"Columnas que no existen en '{tabla_nombre}': {faltantes}")
+                
+                valores = [self.valores_sqlite(df[col], self.formato_fecha_sqlite(df[col])
+                                               if pd.api.types.is_datetime64_any_dtype(df[col]) else None)
+                           for col in columnas]
+                columnas_sql = ', '.join(['rowid'] + [f'"{col}"' for col in columnas])
+                marcadores = ', '.join('?' for _ in range(len(columnas) + 1))
+                
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(f'DELETE FROM "{tabla_nombre}" WHERE rowid BETWEEN ? AND ?', (rowid_inicio, rowid_fin))
+                    conn.executemany(f'INSERT INTO "{tabla_nombre}" ({columnas_sql}) VALUES ({marcadores})',
+                                     zip(range(rowid_inicio, rowid_fin + 1), *valores))
+                    checksums.reemplazar(tabla_nombre, chunk, dict(zip(columnas, valores)),
+                                         {col: columnas_tabla[col] for col in columnas})
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                
+                resultado = checksums.verificar(tabla_nombre, solo_chunks=[chunk])
+            finally:
+                checksums.cerrar()
+                conn.close()
+            
+            self.logs.info(f"Chunk {chunk} de '{tabla_nombre}' recargado (rowid {rowid_inicio}-{rowid_fin}): "
+                           f"{resultado['estado']}")
+            return resultado
+            
+        except Exception as e:
+            self.logs.error(f"Error recargando chunk {chunk} de '{tabla_nombre}': {str(e)}")
+            raise
+    
+    def ejecutar_carga_completa(self, dataframes_transformados, incremental=False):
         self.logs.info("=== INICIANDO CARGA COMPLETA ===")
         
         try:
-            # Cargar a SQLite
-            self.cargar_a_sqlite(dataframes_transformados)
+            # Cargar a SQLite (upsert del delta en modo incremental)
+            if incremental:
+                self.cargar_incremental_sqlite(dataframes_transformados)
+            else:
+                self.cargar_a_sqlite(dataframes_transformados)
             
-            # Exportar a Excel
-            self.exportar_a_excel(dataframes_transformados)
+            # Salidas adicionales; SQLite siempre se carga porque guarda los watermarks
+            salidas = self.config.get('salidas', ['excel'])
+            if 'excel' in salidas:
+                self.exportar_a_excel(dataframes_transformados)
+            if 'parquet' in salidas:
+                self.exportar_a_parquet(dataframes_transformados, incremental)
             
             # Verificar carga
             reporte_verificacion = self.verificar_carga()
@@ -0,0 +1,248 @@
+import math
+import functools
+import random
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+# Checksums por chunk de las tablas raw_*_transformado: al cargar cada lote se guarda su rango de rowid,
+# la cantidad de filas y un hash de su contenido independiente del orden. La verificación vuelve a
+# calcularlo leyendo solo ese rango de rowid (sin COUNT(*) sobre la tabla completa)
+TABLA_CHECKSUMS = 'etl_checksums'
+
+MASCARA_64 = (1 << 64) - 1
+
+# Sal por tipo de valor almacenado: 5, 5.0 y '5' no deben hashear igual
+SAL_TIPO = {
+    int: np.uint64(0x9E3779B97F4A7C15),
+    float: np.uint64(0xC2B2AE3D27D4EB4F),
+    str: np.uint64(0x165667B19E3779F9)
+}
+
+# Tipo de valor que produce cada afinidad de columna cuando no hay conversiones
+TIPO_AFINIDAD = {
+    'INTEGER': ('integer', 'empty'),
+    'REAL': ('floating', 'empty'),
+    'TEXT': ('string', 'empty')
+}
+
+# Tipos inferidos que se hashean sin recorrer celda por celda: (tipo Python, dtype de numpy)
+TIPOS_VECTORIZADOS = {
+    'integer': (int, np.int64),
+    'floating': (float, np.float64),
+    'string': (str, object)
+}
+
+
+def mezclar(valores):
+    # Finalizador de splitmix64 (aritmética uint64 con desborde)
+    valores = valores ^ (valores >> np.uint64(30))
+    valores = valores * np.uint64(0xBF58476D1CE4E5B9)
+    valores = valores ^ (valores >> np.uint64(27))
+    valores = valores * np.uint64(0x94D049BB133111EB)
+    return valores ^ (valores >> np.uint64(31))
+
+
+@functools.lru_cache(maxsize=None)
+def sal_columna(columna):
+    return hash_array(np.array([columna], dtype=object))[0]
+
+
+# Convierte valores como lo hace SQLite al guardarlos en una columna de esa afinidad (5 -> '5' en TEXT,
+# 2.0 -> 2 en INTEGER, '3' -> 3.0 en REAL). Se delega en SQLite para no reimplementar sus reglas
+class AfinidadSQLite:
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('CREATE TABLE afinidad ("INTEGER" INTEGER, "REAL" REAL, "TEXT" TEXT)')
+
+    def convertir(self, valores, afinidad):
+        if afinidad not in TIPO_AFINIDAD:
+            return valores
+        self.conn.execute('DELETE FROM afinidad')
+        self.conn.executemany(f'INSERT INTO afinidad ("{afinidad}") VALUES (?)', ((valor,) for valor in valores))
+        return [fila[0] for fila in self.conn.execute(f'SELECT "{afinidad}" FROM afinidad ORDER BY rowid')]
+
+    def cerrar(self):
+        self.conn.close()
+
+
+def hash_tipo(arreglo, tipo):
+    # | 1: una celda no nula nunca hashea 0, que queda reservado para los nulos
+    return mezclar(hash_array(arreglo, categorize=False) ^ SAL_TIPO[tipo]) | np.uint64(1)
+
+
+def hash_celdas(valores, afinidad, afinidades):
+    # Hash por celda (0 para nulos) del valor tal como queda guardado en SQLite. Los valores son escalares
+    # (salida de valores_sqlite o filas leídas de SQLite): np.array no los anida
+    arreglo = np.array(valores, dtype=object)
+    tipo_inferido = pd.api.types.infer_dtype(arreglo, skipna=True)
+    if tipo_inferido not in TIPO_AFINIDAD.get(afinidad, ()):
+        valores = afinidades.convertir(valores, afinidad)
+        arreglo = np.array(valores, dtype=object)
+        tipo_inferido = pd.api.types.infer_dtype(arreglo, skipna=True)
+
+    resultado = np.zeros(len(valores), dtype=np.uint64)
+    if tipo_inferido == 'empty':
+        return resultado
+
+    # Caso común: todas las celdas del mismo tipo, sin recorrerlas en Python
+    if tipo_inferido in TIPOS_VECTORIZADOS:
+        tipo, dtype = TIPOS_VECTORIZADOS[tipo_inferido]
+        no_nulos = ~pd.isna(arreglo)
+        resultado[no_nulos] = hash_tipo(arreglo[no_nulos].astype(dtype), tipo)
+        return resultado
+
+    # Tipos mezclados tras la conversión (p. ej. REAL no entero en una columna INTEGER)
+    posiciones = {}
+    for i, valor in enumerate(valores):
+        if valor is not None:
+            posiciones.setdefault(type(valor), []).append(i)
+
+    for tipo, indices in posiciones.items():
+        grupo = [valores[i] for i in indices]
+        if tipo is int:
+            arreglo = np.array(grupo, dtype=np.int64)
+        elif tipo is float:
+            arreglo = np.array(grupo, dtype=np.float64)
+        else:
+            tipo = str
+            arreglo = np.array([valor if isinstance(valor, str) else str(valor) for valor in grupo], dtype=object)
+        resultado[indices] = hash_tipo(arreglo, tipo)
+    return resultado
+
+
+def hash_filas(columnas_valores, afinidades_columnas, afinidades):
+    # Hash de cada fila: suma de sus celdas no nulas (una columna agregada después con ALTER TABLE
+    # no cambia el hash de las filas anteriores). Hash del chunk: suma de las filas mezcladas
+    filas = np.zeros(len(next(iter(columnas_valores.values()), [])), dtype=np.uint64)
+    for columna, valores in columnas_valores.items():
+        celdas = hash_celdas(valores, afinidades_columnas.get(columna, 'TEXT'), afinidades)
+        filas += np.where(celdas != 0, mezclar(celdas ^ sal_columna(columna)), np.uint64(0))
+    return int(mezclar(filas).sum(dtype=np.uint64))
+
+
+class ChecksumsCarga:
+
+    def __init__(self, conn, logs):
+        self.conn = conn
+        self.logs = logs
+        self.afinidades = AfinidadSQLite()
+
+    def crear_tabla(self):
+        self.conn.execute(f'''CREATE TABLE IF NOT EXISTS "{TABLA_CHECKSUMS}" (
+            tabla TEXT, chunk INTEGER, rowid_inicio INTEGER, rowid_fin INTEGER, filas INTEGER,
+            hash TEXT, cargado TEXT, PRIMARY KEY (tabla, chunk))''')
+
+    def existe_tabla(self, tabla):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone() is not None
+
+    def afinidades_tabla(self, tabla):
+        return {fila[1]: fila[2].upper() for fila in self.conn.execute(f'PRAGMA table_info("{tabla}")')}
+
+    def invalidar(self, tabla):
+        # Tabla recreada, depurada o con upserts: los rangos de rowid guardados ya no describen su contenido
+        if self.existe_tabla(TABLA_CHECKSUMS):
+            self.conn.execute(f'DELETE FROM "{TABLA_CHECKSUMS}" WHERE tabla = ?', (tabla,))
+
+    def ultimo_rowid(self, tabla):
+        return self.conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{tabla}"').fetchone()[0]
+
+    def registrar(self, tabla, columnas_valores, afinidades_columnas, rowid_inicio, rowid_fin):
+        # Se llama dentro de la transacción del lote: datos y checksum se confirman juntos
+        self.crear_tabla()
+        chunk = self.conn.execute(f'SELECT COALESCE(MAX(chunk) + 1, 0) FROM "{TABLA_CHECKSUMS}" WHERE tabla = ?',
+                                  (tabla,)).fetchone()[0]
+        filas = len(next(iter(columnas_valores.values()), []))
+        valor_hash = hash_filas(columnas_valores, afinidades_columnas, self.afinidades)
+        self.conn.execute(
+            f'INSERT INTO "{TABLA_CHECKSUMS}" (tabla, chunk, rowid_inicio, rowid_fin, filas, hash, cargado) '
+            f'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (tabla, chunk, rowid_inicio, rowid_fin, filas, f'{valor_hash:016x}',
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+    def chunks(self, tabla):
+        if not self.existe_tabla(TABLA_CHECKSUMS):
+            return []
+        return self.conn.execute(
+            f'SELECT chunk, rowid_inicio, rowid_fin, filas, hash FROM "{TABLA_CHECKSUMS}" WHERE tabla = ? ORDER BY chunk',
+            (tabla,)
+        ).fetchall()
+
+    def chunk(self, tabla, chunk):
+        if not self.existe_tabla(TABLA_CHECKSUMS):
+            return None
+        return self.conn.execute(
+            f'SELECT chunk, rowid_inicio, rowid_fin, filas, hash FROM "{TABLA_CHECKSUMS}" WHERE tabla = ? AND chunk = ?',
+            (tabla, chunk)
+        ).fetchone()
+
+    def reemplazar(self, tabla, chunk, columnas_valores, afinidades_columnas):
+        # Chunk recargado sobre su mismo rango de rowid: solo cambian su hash y su conteo
+        filas = len(next(iter(columnas_valores.values()), []))
+        valor_hash = hash_filas(columnas_valores, afinidades_columnas, self.afinidades)
+        self.conn.execute(
+            f'UPDATE "{TABLA_CHECKSUMS}" SET filas = ?, hash = ?, cargado = ? WHERE tabla = ? AND chunk = ?',
+            (filas, f'{valor_hash:016x}', datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tabla, chunk)
+        )
+
+    def recalcular(self, tabla, afinidades_columnas, rowid_inicio, rowid_fin):
+        columnas = list(afinidades_columnas)
+        columnas_sql = ', '.join(f'"{col}"' for col in columnas)
+        filas = self.conn.execute(f'SELECT {columnas_sql} FROM "{tabla}" WHERE rowid BETWEEN ? AND ?',
+                                  (rowid_inicio, rowid_fin)).fetchall()
+        if not filas:
+            return 0, 0
+        columnas_valores = dict(zip(columnas, (list(valores) for valores in zip(*filas))))
+        return len(filas), hash_filas(columnas_valores, afinidades_columnas, self.afinidades)
+
+    def verificar(self, tabla, muestra=None, semilla=0, solo_chunks=None):
+        chunks = self.chunks(tabla)
+        afinidades_columnas = self.afinidades_tabla(tabla)
+
+        # muestra: fracción de chunks a recalcular (None = todos); el conteo total siempre se verifica.
+        # La muestra sale de la semilla: dos verificaciones con la misma semilla revisan los mismos chunks
+        # solo_chunks: números de chunk a recalcular, p. ej. los que fallaron y se recargaron
+        seleccion = chunks
+        if solo_chunks is not None:
+            solo_chunks = set(solo_chunks)
+            seleccion = [fila for fila in chunks if fila[0] in solo_chunks]
+        elif muestra is not None and chunks:
+            seleccion = sorted(random.Random(semilla).sample(chunks, max(1, math.ceil(len(chunks) * muestra))))
+
+        errores = []
+        for chunk, rowid_inicio, rowid_fin, filas, valor_hash in seleccion:
+            filas_encontradas, hash_encontrado = self.recalcular(tabla, afinidades_columnas, rowid_inicio, rowid_fin)
+            if filas_encontradas != filas or f'{hash_encontrado:016x}' != valor_hash:
+                errores.append({
+                    'chunk': chunk,
+                    'rowid_inicio': rowid_inicio,
+                    'rowid_fin': rowid_fin,
+                    'filas_esperadas': filas,
+                    'filas_encontradas': filas_encontradas,
+                    'hash_esperado': valor_hash,
+                    'hash_encontrado': f'{hash_encontrado:016x}'
+                })
+
+        # El conteo sale de etl_checksums. Filas fuera de los rangos registrados solo pueden estar después
+        # del último rowid_fin: MAX(rowid) lo revela sin recorrer la tabla y solo entonces se cuentan
+        ultimo = chunks[-1][2] if chunks else 0
+        filas_extra = 0
+        if self.ultimo_rowid(tabla) > ultimo:
+            filas_extra = self.conn.execute(f'SELECT COUNT(*) FROM "{tabla}" WHERE rowid > ?', (ultimo,)).fetchone()[0]
+
+        return {
+            'registros': sum(chunk[3] for chunk in chunks),
+            'hash': f'{sum(int(chunk[4], 16) for chunk in chunks) & MASCARA_64:016x}',
+            'chunks': len(chunks),
+            'chunks_verificados': len(seleccion),
+            'chunks_con_error': errores,
+            'filas_sin_checksum': filas_extra,
+            'estado': 'OK' if not errores and not filas_extra else 'ERROR'
+        }
+
+    def cerrar(self):
+        self.afinidades.cerrar()
@@ -0,0 +1,197 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Escalas de referencia: número de reviews y de filas de calendar a generar.
+# 1.4M es el tamaño del dump real de CDMX
+ESCALAS = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1.4M': 1_400_000,
+    '10M': 10_000_000
+}
+
+# Un listing por cada ~50 reviews, proporción similar a la del dump de Inside Airbnb
+REVIEWS_POR_LISTING = 50
+
+AMENITIES_VOCABULARIO = [
+    'Wifi', 'Kitchen', 'Air conditioning', 'Heating', 'TV', 'Washer', 'Dryer', 'Pool', 'Gym',
+    'Free parking on premises', 'Paid parking off premises', 'Hot water', 'Hair dryer', 'Iron',
+    'Essentials', 'Shampoo', 'Hangers', 'Dedicated workspace', 'Smoke alarm', 'Carbon monoxide alarm',
+    'Fire extinguisher', 'First aid kit', 'Microwave', 'Refrigerator', 'Dishes and silverware',
+    'Cooking basics', 'Coffee maker', 'Elevator', 'Long term stays allowed', 'Self check-in',
+    'Lockbox', 'Bed linens', 'Extra pillows and blankets', 'Patio or balcony', 'Private entrance',
+    'Hot tub', 'Security cameras on property', 'Luggage dropoff allowed', 'Room-darkening shades',
+    'Cable TV', 'Crib', 'High chair', 'BBQ grill', 'Outdoor furniture', 'Pets allowed',
+    'Smart lock', 'Building staff', 'Ethernet connection', 'Stove', 'Oven'
+]
+
+ROOM_TYPES = ['Entire home/apt', 'Private room', 'Shared room', 'Hotel room']
+PESOS_ROOM_TYPES = [0.62, 0.34, 0.02, 0.02]
+
+PROPERTY_TYPES = ['Apartment', 'House', 'Condominium', 'Loft', 'Other',
+                  'Entire rental unit', 'Private room in home', 'Entire condo']
+
+BARRIOS = ['Cuauhtémoc', 'Miguel Hidalgo', 'Benito Juárez', 'Coyoacán', 'Álvaro Obregón',
+           'Tlalpan', 'Venustiano Carranza', 'Iztapalapa', 'Gustavo A. Madero', 'Azcapotzalco',
+           'Xochimilco', 'La Magdalena Contreras', 'Cuajimalpa de Morelos', 'Iztacalco',
+           'Tláhuac', 'Milpa Alta']
+PESOS_BARRIOS = [0.40, 0.18, 0.165, 0.07, 0.04, 0.03, 0.025, 0.015, 0.015, 0.01,
+                 0.008, 0.005, 0.005, 0.005, 0.004, 0.003]
+
+# Fragmentos de comentarios en los idiomas más comunes del dump (con palabras de los léxicos)
+FRAGMENTOS_COMENTARIOS = {
+    'es': ['Excelente ubicación', 'el departamento es muy bueno', 'anfitrión perfecto',
+           'todo estaba limpio', 'la cama era mala', 'pésimo ruido en la noche', 'volvería sin duda',
+           'lugar maravilloso', 'la zona es segura'],
+    'en': ['Great place', 'the host was amazing', 'perfect location', 'everything was clean',
+           'the bed was terrible', 'awful noise at night', 'would stay again', 'wonderful stay',
+           'poor wifi'],
+    'fr': ['Appartement très propre', "l'hôte était charmant", 'emplacement idéal',
+           'un peu bruyant la nuit', 'je recommande'],
+    'pt': ['Ótima localização', 'o anfitrião foi muito atencioso', 'apartamento limpo',
+           'recomendo muito'],
+    'de': ['Tolle Lage', 'sehr sauber', 'der Gastgeber war sehr freundlich']
+}
+PESOS_IDIOMAS = {'es': 0.45, 'en': 0.40, 'fr': 0.06, 'pt': 0.05, 'de': 0.04}
+
+NOMBRES = ['Ana', 'Carlos', 'María', 'José', 'Laura', 'John', 'Emily', 'Pierre', 'João', 'Hans',
+           'Lucía', 'Miguel', 'Sofía', 'David', 'Sarah', 'Camille']
+
+
+# Genera DataFrames con la misma forma que entrega Extraccion desde MongoDB (columnas object con
+# textos crudos): precios '$1,234.00', fechas en texto o {'$date': ...}, booleanos 't'/'f',
+# amenities como lista serializada y comentarios multilingües. Los valores se muestrean de
+# un conjunto de valores distintos, así 10M de filas se generan en segundos
+class GeneradorDatosSinteticos:
+
+    def __init__(self, semilla=42):
+        self.rng = np.random.default_rng(semilla)
+
+    def muestrear(self, valores, n, pesos=None, nulos=0.0):
+        valores = np.asarray(valores, dtype=object)
+        if pesos is not None:
+            pesos = np.asarray(pesos, dtype=float)
+            pesos = pesos / pesos.sum()
+        resultado = valores[self.rng.choice(len(valores), size=n, p=pesos)]
+        if nulos:
+            resultado[self.rng.random(n) < nulos] = None
+        return resultado
+
+    def precios(self, distintos=5000):
+        # Log-normal alrededor de ~1,000 MXN por noche, formateado como en Inside Airbnb
+        montos = np.round(self.rng.lognormal(mean=7.0, sigma=0.8, size=distintos))
+        return [f"${monto:,.2f}" for monto in montos]
+
+    def fechas(self, inicio, fin, distintas=2000, fraccion_mongo=0.1):
+        # Fechas en texto 'YYYY-MM-DD'; una fracción viene como {'$date': ...} de mongoexport
+        dias = pd.date_range(inicio, fin, freq='D')
+        dias = dias[self.rng.choice(len(dias), size=min(distintas, len(dias)), replace=False)]
+        textos = [dia.strftime('%Y-%m-%d') for dia in dias]
+        mongo = [{'$date': dia.strftime('%Y-%m-%dT00:00:00Z')}
+                 for dia in dias[:int(len(dias) * fraccion_mongo)]]
+        return textos + mongo
+
+    def listas_amenities(self, distintas=3000):
+        listas = []
+        for _ in range(distintas):
+            cantidad = self.rng.integers(3, 35)
+            elegidas = self.rng.choice(len(AMENITIES_VOCABULARIO), size=cantidad, replace=False)
+            listas.append(json.dumps([AMENITIES_VOCABULARIO[i] for i in elegidas]))
+        return listas
+
+    def comentarios(self, distintos=10000):
+        idiomas = list(PESOS_IDIOMAS)
+        pesos = np.array([PESOS_IDIOMAS[idioma] for idioma in idiomas])
+        comentarios = []
+        for idioma in self.rng.choice(idiomas, size=distintos, p=pesos / pesos.sum()):
+            fragmentos = FRAGMENTOS_COMENTARIOS[idioma]
+            cantidad = self.rng.integers(1, min(5, len(fragmentos)) + 1)
+            elegidos = self.rng.choice(len(fragmentos), size=cantidad, replace=False)
+            comentarios.append(', '.join(fragmentos[i] for i in elegidos) + '.')
+        return comentarios
+
+    def listings(self, n):
+        ids = np.arange(1, n + 1, dtype=np.int64) * 1000 + self.rng.integers(0, 1000, size=n)
+        # ~0.5% de IDs duplicados y ~0.2% sin coordenadas, como en el dump
+        duplicados = self.rng.random(n) < 0.005
+        ids[duplicados] = ids[self.rng.integers(0, n, size=duplicados.sum())]
+        latitudes = self.rng.normal(19.42, 0.05, size=n)
+        latitudes[self.rng.random(n) < 0.002] = np.nan
+
+        fechas_host = self.fechas('2009-01-01', '2024-06-01')
+        fechas_scrape = self.fechas('2024-06-01', '2024-06-30')
+        booleanos = ['t', 'f']
+
+        # Un host por cada ~3 listings, como en el dump (hay anfitriones con decenas de listings)
+        hosts = self.rng.integers(1, max(2, n // 3), size=n) * 13
+
+        return pd.DataFrame({
+            'id': ids,
+            'host_id': hosts,
+            'host_name': np.asarray(NOMBRES, dtype=object)[hosts % len(NOMBRES)],
+            'latitude': latitudes,
+            'longitude': self.rng.normal(-99.16, 0.05, size=n),
+            'price': self.muestrear(self.precios(), n, nulos=0.03),
+            'host_since': self.muestrear(fechas_host, n, nulos=0.01),
+            'calendar_last_scraped': self.muestrear(fechas_scrape, n),
+            'last_scraped': self.muestrear(fechas_scrape, n),
+            'amenities': self.muestrear(self.listas_amenities(), n, nulos=0.01),
+            'room_type': self.muestrear(ROOM_TYPES, n, PESOS_ROOM_TYPES),
+            'property_type': self.muestrear(PROPERTY_TYPES, n, nulos=0.01),
+            'host_is_superhost': self.muestrear(booleanos, n, [0.3, 0.7], nulos=0.02),
+            'host_identity_verified': self.muestrear(booleanos, n, [0.9, 0.1]),
+            'has_availability': self.muestrear(booleanos, n, [0.95, 0.05]),
+            'accommodates': self.rng.integers(1, 16, size=n),
+            'bedrooms': self.muestrear([1.0, 2.0, 3.0, 4.0, None], n),
+            'beds': self.muestrear([1.0, 2.0, 3.0, 4.0, 5.0, None], n),
+            'minimum_nights': self.rng.integers(1, 30, size=n),
+            'maximum_nights': self.muestrear([30, 90, 365, 1125], n),
+            'availability_30': self.rng.integers(0, 31, size=n),
+            'availability_60': self.rng.integers(0, 61, size=n),
+            'availability_90': self.rng.integers(0, 91, size=n),
+            'availability_365': self.rng.integers(0, 366, size=n),
+            'neighbourhood_cleansed': self.muestrear(BARRIOS, n, PESOS_BARRIOS),
+            'name': self.muestrear([f"Depa {i} en {barrio}" for i, barrio in enumerate(BARRIOS * 50)], n),
+            'description': self.muestrear(self.comentarios(2000), n, nulos=0.05)
+        })
+
+    def reviews(self, n, ids_listings):
+        return pd.DataFrame({
+            'id': np.arange(1, n + 1, dtype=np.int64) * 7,
+            'listing_id': self.rng.choice(ids_listings, size=n),
+            'date': self.muestrear(self.fechas('2012-01-01', '2024-06-30', distintas=4500), n),
+            'reviewer_name': self.muestrear(NOMBRES, n, nulos=0.001),
+            'comments': self.muestrear(self.comentarios(), n, nulos=0.002)
+        })
+
+    def calendar(self, n, ids_listings):
+        # Cada listing tiene días consecutivos, igual que el calendar de Inside Airbnb
+        dias = pd.date_range('2024-06-30', periods=365, freq='D').strftime('%Y-%m-%d').to_numpy(dtype=object)
+        posiciones = np.arange(n)
+        return pd.DataFrame({
+            'listing_id': np.asarray(ids_listings)[(posiciones // len(dias)) % len(ids_listings)],
+            'date': dias[posiciones % len(dias)],
+            'available': self.muestrear(['t', 'f'], n, [0.6, 0.4]),
+            'price': self.muestrear(self.precios(), n)
+        })
+
+    def generar(self, escala, colecciones=('listings', 'reviews', 'calendar')):
+        # escala: clave de ESCALAS o número de filas de reviews/calendar
+        n = ESCALAS[escala] if escala in ESCALAS else int(escala)
+        n_listings = max(100, n // REVIEWS_POR_LISTING)
+
+        dataframes = {'listings': self.listings(n_listings)}
+        ids_listings = dataframes['listings']['id'].to_numpy()
+        if 'reviews' in colecciones:
+            dataframes['reviews'] = self.reviews(n, ids_listings)
+        if 'calendar' in colecciones:
+            dataframes['calendar'] = self.calendar(n, ids_listings)
+        if 'listings' not in colecciones:
+            del dataframes['listings']
+        return dataframes
+
+    def documentos(self, escala, colecciones=('listings', 'reviews', 'calendar')):
+        # Mismos datos como documentos para poblar un MongoDB local (mongoimport / insert_many)
+        for nombre, df in self.generar(escala, colecciones).items():
+            yield nombre, df.astype(object).where(df.notna(), None).to_dict('records')
@@ -1,9 +1,68 @@
 import pandas as pd
+import numpy as np
 import pymongo
 from pymongo import MongoClient
+from bson import ObjectId
 import logging
 from datetime import datetime
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from metricas import Metricas
+from agregacion import construir_pipeline, orden_estable
+
+# Campos que Transformacion lee realmente de cada colección; se envían como proyección a find()
+PROYECCIONES = {
+    'listings': [
+        'id', 'host_id', 'host_name', 'latitude', 'longitude', 'price', 'host_since', 'calendar_last_scraped',
+        'last_scraped', 'amenities', 'room_type', 'property_type', 'host_is_superhost',
+        'host_identity_verified', 'has_availability', 'accommodates', 'bedrooms', 'beds',
+        'minimum_nights', 'maximum_nights', 'availability_30', 'availability_60',
+        'availability_90', 'availability_365', 'neighbourhood_cleansed', 'name', 'description'
+    ],
+    'reviews': ['id', 'listing_id', 'date', 'reviewer_name', 'comments'],
+    'calendar': ['listing_id', 'date', 'available', 'price']
+}
+
+# Campo de watermark por colección en MongoDB (extraccion.campos_watermark = None)
+CAMPOS_WATERMARK_MONGODB = {'listings': '_id', 'reviews': '_id', 'calendar': '_id'}
+
+# _id muestreados por partición para calcular los límites de los rangos de la extracción paralela
+MUESTRA_RANGOS_POR_PARTICION = 100
+
+# Tipos con los que se construyen las columnas extraídas (evita columnas object innecesarias)
+TIPOS_COLUMNAS = {
+    'listings': {
+        'id': 'Int64',
+        'host_id': 'Int64',
+        'latitude': 'float64',
+        'longitude': 'float64',
+        'host_since': 'datetime64[ns]',
+        'calendar_last_scraped': 'datetime64[ns]',
+        'last_scraped': 'datetime64[ns]',
+        'room_type': 'category',
+        'property_type': 'category',
+        'neighbourhood_cleansed': 'category',
+        'accommodates': 'Int64',
+        'bedrooms': 'float64',
+        'beds': 'float64',
+        'minimum_nights': 'Int64',
+        'maximum_nights': 'Int64',
+        'availability_30': 'Int64',
+        'availability_60': 'Int64',
+        'availability_90': 'Int64',
+        'availability_365': 'Int64'
+    },
+    'reviews': {
+        'id': 'Int64',
+        'listing_id': 'Int64',
+        'date': 'datetime64[ns]'
+    },
+    'calendar': {
+        'listing_id': 'Int64',
+        'date': 'datetime64[ns]'
+    }
+}
 
 class Logs:
     def __init__(self, proceso_nombre="ETL"):
@@ -43,13 +102,23 @@ class Logs:
 
 
 class Extraccion:
-    def __init__(self, host='localhost', puerto=27017, nombre_bd='local'):
+    def __init__(self, host='localhost', puerto=27017, nombre_bd='local', usar_proyeccion=False,
+                 campos_watermark=None, metricas=None, pushdown=False):
         self.host = host
         self.puerto = puerto
         self.nombre_bd = nombre_bd
+        self.usar_proyeccion = usar_proyeccion
+        # Limpieza en un pipeline de agregación en el servidor (ver agregacion.py)
+        self.pushdown = pushdown
+        # Campo por colección que marca hasta dónde se extrajo (p. ej. _id, last_scraped, date)
+        self.campos_watermark = campos_watermark or {}
+        self.watermarks = {}
+        self.watermarks_nuevos = {}
+        self.lock_watermarks = threading.Lock()
         self.client = None
         self.db = None
         self.logs = Logs("EXTRACCION")
+        self.metricas = metricas or Metricas()
         
     def conectar(self):
         try:
@@ -69,7 +138,244 @@ class Extraccion:
             self.logs.error(f"Error al conectar a MongoDB: {str(e)}")
             return False
     
-    def extraer_coleccion(self, nombre_coleccion, limite=None):
+    def construir_proyeccion(self, nombre_coleccion):
+        if not self.usar_proyeccion or nombre_coleccion not in PROYECCIONES:
+            return None
+        
+        proyeccion = {campo: 1 for campo in PROYECCIONES[nombre_coleccion]}
+        campo_watermark = self.campos_watermark.get(nombre_coleccion)
+        if campo_watermark:
+            proyeccion[campo_watermark] = 1
+        if campo_watermark != '_id':
+            proyeccion['_id'] = 0
+        return proyeccion
+    
+    def construir_filtro(self, nombre_coleccion):
+        # Modo incremental: solo documentos posteriores al watermark guardado
+        campo = self.campos_watermark.get(nombre_coleccion)
+        valor = self.watermarks.get(nombre_coleccion)
+        if not campo or valor is None:
+            return {}
+        
+        # Fechas/textos con granularidad gruesa usan $gte; el upsert de la carga absorbe los repetidos
+        operador = '$gt' if isinstance(valor, (ObjectId, int, float)) else '$gte'
+        return {campo: {operador: valor}}
+    
+    def abrir_cursor(self, nombre_coleccion, limite=None, batch_size=None, rango_id=None):
+        filtro = self.construir_filtro(nombre_coleccion)
+        orden = self.campos_watermark[nombre_coleccion] if filtro else None
+        
+        # Partición por rango de _id [inferior, superior) para la extracción paralela
+        if rango_id is not None:
+            inferior, superior = rango_id
+            condicion = {}
+            if inferior is not None:
+                condicion['$gte'] = inferior
+            if superior is not None:
+                condicion['$lt'] = superior
+            if condicion:
+                filtro = {'$and': [filtro, {'_id': condicion}]} if filtro else {'_id': condicion}
+            orden = '_id'
+        
+        if self.pushdown:
+            pipeline = construir_pipeline(nombre_coleccion, filtro, self.construir_proyeccion(nombre_coleccion),
+                                          limite, orden)
+            opciones = {'batchSize': batch_size} if batch_size else {}
+            # allowDiskUse: el $sort/$group de colecciones grandes supera el límite de memoria de 100 MB
+            return self.db[nombre_coleccion].aggregate(pipeline, allowDiskUse=True, **opciones)
+        
+        # Siempre ordenado (por _id si no hay watermark): con límite, el orden garantiza que el nuevo
+        # watermark no salte documentos, y el límite y los duplicados que se conservan son los mismos
+        # que elige el pipeline de pushdown
+        cursor = self.db[nombre_coleccion].find(filtro, self.construir_proyeccion(nombre_coleccion))
+        cursor = cursor.sort(orden_estable(orden))
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        if limite:
+            cursor = cursor.limit(limite)
+        return cursor
+    
+    def registrar_watermark(self, nombre_coleccion, documentos):
+        campo = self.campos_watermark.get(nombre_coleccion)
+        if not campo:
+            return
+        
+        valores = [doc[campo] for doc in documentos if doc.get(campo) is not None]
+        if not valores:
+            return
+        
+        try:
+            maximo = max(valores)
+            # Puede llamarse desde varios hilos en la extracción paralela
+            with self.lock_watermarks:
+                actual = self.watermarks_nuevos.get(nombre_coleccion)
+                if actual is None or maximo > actual:
+                    self.watermarks_nuevos[nombre_coleccion] = maximo
+        except TypeError:
+            self.logs.warning(f"Valores no comparables en '{nombre_coleccion}.{campo}', no se actualiza el watermark")
+    
+    def serializar_watermark(self, valor):
+        if isinstance(valor, ObjectId):
+            return 'objectid', str(valor)
+        if isinstance(valor, datetime):
+            return 'datetime', valor.isoformat()
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            return 'numero', repr(valor)
+        return 'texto', str(valor)
+    
+    def deserializar_watermark(self, tipo, valor):
+        if tipo == 'objectid':
+            return ObjectId(valor)
+        if tipo == 'datetime':
+            return datetime.fromisoformat(valor)
+        if tipo == 'numero':
+            return float(valor) if any(c in valor for c in '.eEn') else int(valor)
+        return valor
+    
+    def establecer_watermarks(self, estado):
+        # estado: {coleccion: {'campo', 'tipo', 'valor'}} tal como lo guarda Carga
+        self.watermarks = {}
+        for nombre, registro in (estado or {}).items():
+            if registro.get('campo') != self.campos_watermark.get(nombre):
+                self.logs.warning(f"El watermark de '{nombre}' usa otro campo ({registro.get('campo')}), se ignora")
+                continue
+            self.watermarks[nombre] = self.deserializar_watermark(registro['tipo'], registro['valor'])
+            self.logs.info(f"Watermark de '{nombre}': {registro['campo']} > {registro['valor']}")
+    
+    def watermarks_serializados(self):
+        estado = {}
+        for nombre, valor in self.watermarks_nuevos.items():
+            tipo, valor_str = self.serializar_watermark(valor)
+            estado[nombre] = {'campo': self.campos_watermark[nombre], 'tipo': tipo, 'valor': valor_str}
+        return estado
+    
+    def resolver_fecha(self, valor):
+        # Un valor distinto con la regla de Transformacion.resolver_fecha, sin truncar al día
+        try:
+            if isinstance(valor, dict):
+                valor = valor.get('$date')
+            if isinstance(valor, str):
+                fecha = pd.Timestamp(pd.to_datetime(valor))
+            elif isinstance(valor, np.datetime64) or hasattr(valor, 'strftime'):
+                fecha = pd.Timestamp(valor)
+            else:
+                return pd.NaT
+            
+            if fecha.tzinfo is not None:
+                fecha = fecha.tz_localize(None)
+            return fecha
+        except Exception:
+            return pd.NaT
+    
+    def convertir_fechas(self, serie):
+        # pd.to_datetime(errors='coerce') deduce un solo formato de la primera fecha y deja en NaT las de otro
+        # formato; aquí se sigue la misma ruta que normalizar_fechas: formato ISO para los textos y el resto
+        # (otros formatos, datetime con zona, {'$date': ...}) valor por valor, una vez por valor distinto
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.dt.tz_localize(None) if getattr(serie.dt, 'tz', None) is not None else serie
+        
+        try:
+            codigos, unicos = pd.factorize(serie)
+        except TypeError:
+            serie = serie.map(lambda valor: valor.get('$date') if isinstance(valor, dict) else valor)
+            codigos, unicos = pd.factorize(serie)
+        
+        unicos = pd.Series(unicos, dtype=object)
+        fechas = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+        es_texto = unicos.map(lambda v: isinstance(v, str))
+        if es_texto.any():
+            fechas[es_texto] = pd.to_datetime(unicos[es_texto], format='%Y-%m-%d', errors='coerce')
+        
+        pendientes = fechas.isna()
+        if pendientes.any():
+            fechas[pendientes] = unicos[pendientes].map(self.resolver_fecha).astype('datetime64[ns]')
+        
+        tabla = np.append(fechas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+        return pd.Series(tabla[codigos], index=serie.index, dtype='datetime64[ns]')
+    
+    def aplicar_tipos(self, df, nombre_coleccion):
+        if not self.usar_proyeccion or df.empty:
+            return df
+        
+        for col, tipo in TIPOS_COLUMNAS.get(nombre_coleccion, {}).items():
+            if col not in df.columns:
+                continue
+            try:
+                if tipo.startswith('datetime64'):
+                    df[col] = self.convertir_fechas(df[col])
+                elif tipo in ('float64', 'Int64'):
+                    numerico = pd.to_numeric(df[col], errors='coerce')
+                    try:
+                        df[col] = numerico.astype(tipo)
+                    except (TypeError, ValueError):
+                        # Valores no enteros: conservar como float64
+                        df[col] = numerico.astype('float64')
+                else:
+                    df[col] = df[col].astype(tipo)
+            except Exception as e:
+                self.logs.warning(f"No se pudo tipar la columna '{col}' de '{nombre_coleccion}' como {tipo}: {str(e)}")
+        
+        return df
+    
+    def iterar_coleccion(self, nombre_coleccion, limite=None, batch_size=10000):
+        # Generador: recorre el cursor por lotes y entrega un DataFrame por lote
+        if self.db is None:
+            self.logs.error("No hay conexión a la base de datos")
+            return
+        
+        if nombre_coleccion not in self.db.list_collection_names():
+            self.logs.warning(f"La colección '{nombre_coleccion}' no existe")
+            return
+        
+        cursor = self.abrir_cursor(nombre_coleccion, limite, batch_size)
+        
+        lote = []
+        numero_lote = 0
+        for documento in cursor:
+            lote.append(documento)
+            if len(lote) >= batch_size:
+                numero_lote += 1
+                self.logs.info(f"Lote {numero_lote} de '{nombre_coleccion}': {len(lote)} documentos")
+                self.registrar_watermark(nombre_coleccion, lote)
+                yield self.aplicar_tipos(pd.DataFrame(lote), nombre_coleccion)
+                lote = []
+        
+        if lote:
+            numero_lote += 1
+            self.logs.info(f"Lote {numero_lote} de '{nombre_coleccion}': {len(lote)} documentos")
+            self.registrar_watermark(nombre_coleccion, lote)
+            yield self.aplicar_tipos(pd.DataFrame(lote), nombre_coleccion)
+    
+    def concatenar_lotes(self, lotes):
+        # Consume el generador lote a lote: cada columna del lote se copia a su propio arreglo (sin retener
+        # el bloque 2D del lote) y al final se une columna por columna liberando sus partes. El pico es el
+        # resultado más una columna, no la lista de lotes más la copia completa de pd.concat
+        partes = {}
+        filas = 0
+        for lote in lotes:
+            for col in lote.columns:
+                if col not in partes:
+                    # Columna que aparece en un lote posterior: NaN para las filas anteriores, como pd.concat
+                    partes[col] = [pd.Series(np.nan, index=pd.RangeIndex(filas))] if filas else []
+                partes[col].append(lote[col].copy())
+            for col, piezas in partes.items():
+                if col not in lote.columns:
+                    piezas.append(pd.Series(np.nan, index=pd.RangeIndex(len(lote))))
+            filas += len(lote)
+            del lote
+        
+        columnas = {}
+        for col in list(partes):
+            columnas[col] = pd.concat(partes.pop(col), ignore_index=True)
+        return pd.DataFrame(columnas, copy=False)
+    
+    def extraer_coleccion(self, nombre_coleccion, limite=None, batch_size=None):
+        with self.metricas.medir(f'extraccion.{nombre_coleccion}') as medicion:
+            df = self.leer_coleccion(nombre_coleccion, limite, batch_size)
+            medicion['filas'] = len(df)
+        return df
+    
+    def leer_coleccion(self, nombre_coleccion, limite=None, batch_size=None):
         try:
             if self.db is None:
                 self.logs.error("No hay conexión a la base de datos")
@@ -82,21 +388,43 @@ class Extraccion:
             
             coleccion = self.db[nombre_coleccion]
             
-            # Contar total de documentos
-            total_docs = coleccion.count_documents({})
-            self.logs.info(f"Total de documentos en '{nombre_coleccion}': {total_docs}")
+            # Contar total de documentos (solo los nuevos en modo incremental)
+            filtro = self.construir_filtro(nombre_coleccion)
+            total_docs = coleccion.count_documents(filtro)
+            if filtro:
+                self.logs.info(f"Documentos nuevos en '{nombre_coleccion}' desde el watermark: {total_docs}")
+            else:
+                self.logs.info(f"Total de documentos en '{nombre_coleccion}': {total_docs}")
+            
+            # Modo streaming: construir el DataFrame lote a lote sin materializar la lista completa
+            if batch_size:
+                self.logs.info(f"Extrayendo '{nombre_coleccion}' por lotes de {batch_size} documentos")
+                df = self.concatenar_lotes(self.iterar_coleccion(nombre_coleccion, limite, batch_size))
+                if df.empty:
+                    self.logs.warning(f"No se encontraron documentos en '{nombre_coleccion}'")
+                    return pd.DataFrame()
+                
+                # Las categorías pueden diferir entre lotes, se retipa el resultado
+                df = self.aplicar_tipos(df, nombre_coleccion)
+                self.logs.info(f"DataFrame creado: {len(df)} filas, {len(df.columns)} columnas")
+                self.logs.info(f"Columnas en '{nombre_coleccion}': {list(df.columns)}")
+                return df
+            
+            # Extraer documentos (solo los campos proyectados si está activa la proyección)
+            proyeccion = self.construir_proyeccion(nombre_coleccion)
+            if proyeccion:
+                self.logs.info(f"Proyección de '{nombre_coleccion}': {len(proyeccion) - 1} campos")
             
-            # Extraer documentos
+            documentos = list(self.abrir_cursor(nombre_coleccion, limite))
             if limite:
-                documentos = list(coleccion.find().limit(limite))
                 self.logs.info(f"Extrayendo {limite} documentos de '{nombre_coleccion}'")
             else:
-                documentos = list(coleccion.find())
                 self.logs.info(f"Extrayendo todos los documentos de '{nombre_coleccion}'")
+            self.registrar_watermark(nombre_coleccion, documentos)
             
             # Convertir a DataFrame
             if documentos:
-                df = pd.DataFrame(documentos)
+                df = self.aplicar_tipos(pd.DataFrame(documentos), nombre_coleccion)
                 self.logs.info(f"DataFrame creado: {len(df)} filas, {len(df.columns)} columnas")
                 
                 # Información básica del DataFrame
@@ -111,7 +439,76 @@ class Extraccion:
             self.logs.error(f"Error al extraer colección '{nombre_coleccion}': {str(e)}")
             return pd.DataFrame()
     
-    def extraer_todas_colecciones(self, limite_por_coleccion=None):
+    def calcular_rangos_id(self, nombre_coleccion, particiones):
+        # Límites de _id en los cuantiles de una muestra ordenada ($sample): una sola consulta en vez de un
+        # skip por límite (O(n·p)). Las particiones quedan aproximadamente parejas y, como los rangos son
+        # contiguos y los extremos abiertos, cubren cada documento exactamente una vez
+        coleccion = self.db[nombre_coleccion]
+        filtro = self.construir_filtro(nombre_coleccion)
+        if particiones <= 1:
+            return [(None, None)]
+        
+        total = coleccion.count_documents(filtro)
+        if total == 0:
+            return [(None, None)]
+        
+        pipeline = [{'$match': filtro}] if filtro else []
+        pipeline += [
+            {'$sample': {'size': min(total, MUESTRA_RANGOS_POR_PARTICION * particiones)}},
+            {'$project': {'_id': 1}},
+            {'$sort': {'_id': 1}}
+        ]
+        muestra = [documento['_id'] for documento in coleccion.aggregate(pipeline, allowDiskUse=True)]
+        limites = [muestra[len(muestra) * k // particiones] for k in range(1, particiones)
+                   if len(muestra) * k // particiones > 0]
+        
+        bordes = [None] + sorted(set(limites)) + [None]
+        return list(zip(bordes[:-1], bordes[1:]))
+    
+    def extraer_rango(self, nombre_coleccion, rango_id, batch_size=None):
+        with self.metricas.medir(f'extraccion.{nombre_coleccion}.rango') as medicion:
+            documentos = list(self.abrir_cursor(nombre_coleccion, batch_size=batch_size, rango_id=rango_id))
+            self.registrar_watermark(nombre_coleccion, documentos)
+            medicion['filas'] = len(documentos)
+        return pd.DataFrame(documentos)
+    
+    def extraer_colecciones_paralelo(self, colecciones, limite_por_coleccion, batch_size, workers, particiones):
+        # MongoClient es thread-safe y mantiene su propio pool de conexiones
+        tareas = []
+        dataframes = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for coleccion in colecciones:
+                if limite_por_coleccion:
+                    # Con límite no se parte: se extrae en un solo hilo, igual que en modo secuencial
+                    futuros = [pool.submit(self.extraer_coleccion, coleccion, limite_por_coleccion, batch_size)]
+                    tareas.append((coleccion, futuros, False))
+                    continue
+                
+                rangos = self.calcular_rangos_id(coleccion, particiones)
+                self.logs.info(f"'{coleccion}': {len(rangos)} particiones por rango de _id")
+                futuros = [pool.submit(self.extraer_rango, coleccion, rango, batch_size) for rango in rangos]
+                tareas.append((coleccion, futuros, True))
+            
+            # Se reensambla en el orden de los rangos para que el resultado sea determinista
+            for coleccion, futuros, particionada in tareas:
+                partes = [futuro.result() for futuro in futuros]
+                if not particionada:
+                    dataframes[coleccion] = partes[0]
+                    continue
+                
+                partes = [parte for parte in partes if not parte.empty]
+                df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+                dataframes[coleccion] = self.aplicar_tipos(df, coleccion)
+                self.logs.info(f"DataFrame creado para '{coleccion}': {len(df)} filas, {len(df.columns)} columnas")
+        
+        return dataframes
+    
+    def extraer_todas_colecciones(self, limite_por_coleccion=None, batch_size=None, watermarks=None,
+                                  workers=1, particiones=4):
+        # Watermarks guardados de la corrida anterior (modo incremental)
+        if watermarks is not None:
+            self.establecer_watermarks(watermarks)
+        
         # Obtener colecciones disponibles en la base de datos
         colecciones_disponibles = self.db.list_collection_names()
         self.logs.info(f"Colecciones disponibles en la BD: {colecciones_disponibles}")
@@ -126,10 +523,19 @@ class Extraccion:
         
         self.logs.info("=== Iniciando extracción de colecciones disponibles ===")
         
+        if workers and workers > 1:
+            self.logs.info(f"Extracción paralela: {workers} hilos, {particiones} particiones por colección")
+            dataframes = self.extraer_colecciones_paralelo(
+                colecciones_a_extraer, limite_por_coleccion, batch_size, workers, particiones
+            )
+        
         for coleccion in colecciones_a_extraer:
-            self.logs.info(f"Procesando colección: {coleccion}")
-            df = self.extraer_coleccion(coleccion, limite_por_coleccion)
-            dataframes[coleccion] = df
+            if coleccion in dataframes:
+                df = dataframes[coleccion]
+            else:
+                self.logs.info(f"Procesando colección: {coleccion}")
+                df = self.extraer_coleccion(coleccion, limite_por_coleccion, batch_size)
+                dataframes[coleccion] = df
             
             if not df.empty:
                 self.logs.info(f"✓ {coleccion}: {len(df)} registros extraídos")
@@ -0,0 +1,319 @@
+import io
+import os
+import gzip
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from bson import ObjectId, json_util
+from concurrent.futures import ThreadPoolExecutor
+
+from extraccion import Extraccion, PROYECCIONES, TIPOS_COLUMNAS
+
+# Extensiones que se buscan por colección, en orden de preferencia (dumps de Inside Airbnb y mongoexport)
+EXTENSIONES_ARCHIVOS = {
+    '.csv.gz': 'csv',
+    '.csv': 'csv',
+    '.json.gz': 'json',
+    '.ndjson.gz': 'json',
+    '.json': 'json',
+    '.ndjson': 'json'
+}
+
+TAMANO_BLOQUE_DESCOMPRESION = 1 << 20
+
+# Los CSV de Inside Airbnb no traen _id: campos de watermark que sí existen en cada dump
+CAMPOS_WATERMARK_ARCHIVOS = {'listings': 'last_scraped', 'reviews': 'date', 'calendar': 'date'}
+
+
+# Archivo .gz descomprimido en un hilo aparte: el hilo lector solo parsea. zlib libera el GIL mientras
+# descomprime, así que ambas cosas avanzan a la vez. La cola acotada limita la memoria en vuelo
+class FlujoDescomprimido(io.RawIOBase):
+
+    def __init__(self, ruta, tamano_bloque=TAMANO_BLOQUE_DESCOMPRESION, profundidad=8):
+        self.cola = queue.Queue(maxsize=profundidad)
+        self.parada = threading.Event()
+        self.pendiente = memoryview(b'')
+        self.terminado = False
+        self.hilo = threading.Thread(target=self.descomprimir, args=(ruta, tamano_bloque), daemon=True)
+        self.hilo.start()
+
+    def encolar(self, elemento):
+        while not self.parada.is_set():
+            try:
+                self.cola.put(elemento, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def descomprimir(self, ruta, tamano_bloque):
+        try:
+            with gzip.open(ruta, 'rb') as archivo:
+                while True:
+                    bloque = archivo.read(tamano_bloque)
+                    if not bloque or not self.encolar(bloque):
+                        break
+        except Exception as e:
+            # El error se relanza en el hilo lector
+            self.encolar(e)
+        finally:
+            self.encolar(None)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not len(self.pendiente):
+            if self.terminado:
+                return 0
+            bloque = self.cola.get()
+            if bloque is None:
+                self.terminado = True
+                return 0
+            if isinstance(bloque, Exception):
+                self.terminado = True
+                raise bloque
+            self.pendiente = memoryview(bloque)
+
+        cantidad = min(len(buffer), len(self.pendiente))
+        buffer[:cantidad] = self.pendiente[:cantidad]
+        self.pendiente = self.pendiente[cantidad:]
+        return cantidad
+
+    def close(self):
+        # Si el lector termina antes (límite de filas), el hilo se detiene en su próximo put
+        self.parada.set()
+        super().close()
+
+
+def abrir_texto(ruta):
+    if ruta.endswith('.gz'):
+        return io.TextIOWrapper(io.BufferedReader(FlujoDescomprimido(ruta)), encoding='utf-8', newline='')
+    return open(ruta, 'r', encoding='utf-8', newline='')
+
+
+# Misma interfaz que Extraccion (extraer_todas_colecciones, iterar_coleccion, watermarks), pero leyendo
+# los dumps de Inside Airbnb (.csv.gz) o exportaciones de mongoexport (JSON por línea) sin pasar por MongoDB
+class ExtraccionArchivos(Extraccion):
+
+    def __init__(self, directorio='data/insideairbnb/', rutas=None, usar_proyeccion=False,
+                 campos_watermark=None, metricas=None):
+        # Sin campos explícitos se usan los que existen en los dumps (los CSV no traen _id)
+        super().__init__(usar_proyeccion=usar_proyeccion, campos_watermark=campos_watermark or CAMPOS_WATERMARK_ARCHIVOS,
+                         metricas=metricas)
+        self.directorio = directorio
+        # rutas: {coleccion: archivo} explícitos; el resto se busca en el directorio por extensión
+        self.rutas = rutas or {}
+        self.incremental = False
+        self.avisos_watermark = set()
+
+    def conectar(self):
+        if not os.path.isdir(self.directorio) and not self.rutas:
+            self.logs.error(f"No existe el directorio de archivos: {self.directorio}")
+            return False
+
+        self.logs.info(f"Fuente de archivos: {self.directorio}")
+        return True
+
+    def ruta_coleccion(self, nombre_coleccion):
+        if nombre_coleccion in self.rutas:
+            return self.rutas[nombre_coleccion] if os.path.exists(self.rutas[nombre_coleccion]) else None
+
+        for extension in EXTENSIONES_ARCHIVOS:
+            ruta = os.path.join(self.directorio, f"{nombre_coleccion}{extension}")
+            if os.path.exists(ruta):
+                return ruta
+        return None
+
+    def formato_archivo(self, ruta):
+        for extension, formato in EXTENSIONES_ARCHIVOS.items():
+            if ruta.endswith(extension):
+                return formato
+        return 'csv'
+
+    def columnas_a_leer(self, nombre_coleccion):
+        if not self.usar_proyeccion or nombre_coleccion not in PROYECCIONES:
+            return None
+
+        columnas = set(PROYECCIONES[nombre_coleccion])
+        if self.campos_watermark.get(nombre_coleccion):
+            columnas.add(self.campos_watermark[nombre_coleccion])
+        return columnas
+
+    def leer_chunks_csv(self, ruta, nombre_coleccion, limite, batch_size):
+        columnas = self.columnas_a_leer(nombre_coleccion)
+        # Se declaran los tipos que no pueden fallar al parsear: texto y categorías. Números y fechas se
+        # infieren y aplicar_tipos los convierte con errors='coerce', igual que los documentos de MongoDB
+        # (un valor sucio en una columna Int64 declarada haría fallar toda la lectura)
+        tipos = None
+        if columnas is not None:
+            declarados = TIPOS_COLUMNAS.get(nombre_coleccion, {})
+            tipos = {col: 'category' if declarados.get(col) == 'category' else str
+                     for col in columnas if col not in declarados or declarados[col] == 'category'}
+
+        with abrir_texto(ruta) as archivo:
+            lector = pd.read_csv(
+                archivo,
+                usecols=(lambda col: col in columnas) if columnas else None,
+                dtype=tipos,
+                nrows=limite,
+                chunksize=batch_size,
+                low_memory=False
+            )
+            for chunk in lector:
+                yield chunk
+
+    def leer_chunks_json(self, ruta, nombre_coleccion, limite, batch_size):
+        # JSON extendido de mongoexport ($oid, $date, $numberLong) -> mismos tipos que entrega pymongo
+        columnas = self.columnas_a_leer(nombre_coleccion)
+        if columnas is not None and self.campos_watermark.get(nombre_coleccion) != '_id':
+            columnas.discard('_id')
+
+        leidos = 0
+        lote = []
+        with abrir_texto(ruta) as archivo:
+            for linea in archivo:
+                if not linea.strip():
+                    continue
+                documento = json_util.loads(linea)
+                if columnas is not None:
+                    documento = {campo: valor for campo, valor in documento.items() if campo in columnas}
+                lote.append(documento)
+                leidos += 1
+                if len(lote) >= batch_size:
+                    yield pd.DataFrame(lote)
+                    lote = []
+                if limite and leidos >= limite:
+                    break
+
+        if lote:
+            yield pd.DataFrame(lote)
+
+    def establecer_watermarks(self, estado):
+        # Solo se llama en modo incremental
+        self.incremental = True
+        super().establecer_watermarks(estado)
+
+    def advertir_sin_watermark(self, nombre_coleccion, campo):
+        # Sin el campo no hay filtro ni watermark nuevo: el modo incremental recargaría todo en cada corrida
+        if not self.incremental or nombre_coleccion in self.avisos_watermark:
+            return
+        self.avisos_watermark.add(nombre_coleccion)
+        sugerido = CAMPOS_WATERMARK_ARCHIVOS.get(nombre_coleccion)
+        self.logs.warning(f"El archivo de '{nombre_coleccion}' no tiene el campo de watermark '{campo}', se cargará "
+                          f"completo" + (f" (usa '{sugerido}' en extraccion.campos_watermark)" if sugerido else ""))
+
+    def filtrar_watermark(self, nombre_coleccion, df):
+        # Equivalente del filtro de MongoDB: filas posteriores al watermark y registro del nuevo máximo
+        campo = self.campos_watermark.get(nombre_coleccion)
+        if not campo or df.empty:
+            return df
+        if campo not in df.columns:
+            self.advertir_sin_watermark(nombre_coleccion, campo)
+            return df
+
+        try:
+            valor = self.watermarks.get(nombre_coleccion)
+            if valor is not None:
+                # Mismo criterio que construir_filtro: $gt para _id/números, $gte para fechas y textos. Los
+                # nulos (None, NaN, NaT) quedan fuera, como en MongoDB, sin compararlos con el watermark
+                columna = df[campo]
+                validos = columna.notna().to_numpy()
+                mascara = np.zeros(len(df), dtype=bool)
+                if isinstance(valor, (ObjectId, int, float)):
+                    mascara[validos] = [actual > valor for actual in columna[validos]]
+                else:
+                    mascara[validos] = [actual >= valor for actual in columna[validos]]
+                df = df[mascara].reset_index(drop=True)
+            if not df.empty:
+                self.registrar_watermark(nombre_coleccion, [{campo: df[campo].dropna().max()}])
+        except TypeError:
+            self.logs.warning(f"Valores no comparables en '{nombre_coleccion}.{campo}', no se aplica el watermark")
+        return df
+
+    def iterar_coleccion(self, nombre_coleccion, limite=None, batch_size=10000):
+        ruta = self.ruta_coleccion(nombre_coleccion)
+        if ruta is None:
+            self.logs.warning(f"No hay archivo para la colección '{nombre_coleccion}'")
+            return
+
+        lector = self.leer_chunks_json if self.formato_archivo(ruta) == 'json' else self.leer_chunks_csv
+        numero_lote = 0
+        for chunk in lector(ruta, nombre_coleccion, limite, batch_size or 10000):
+            chunk = self.filtrar_watermark(nombre_coleccion, chunk)
+            if chunk.empty:
+                continue
+            numero_lote += 1
+            self.logs.info(f"Lote {numero_lote} de '{nombre_coleccion}': {len(chunk)} filas")
+            yield self.aplicar_tipos(chunk, nombre_coleccion)
+
+    def leer_coleccion(self, nombre_coleccion, limite=None, batch_size=None):
+        try:
+            ruta = self.ruta_coleccion(nombre_coleccion)
+            if ruta is None:
+                self.logs.warning(f"No hay archivo para la colección '{nombre_coleccion}'")
+                return pd.DataFrame()
+
+            self.logs.info(f"Leyendo '{nombre_coleccion}' desde {ruta}")
+            lotes = list(self.iterar_coleccion(nombre_coleccion, limite, batch_size or 100000))
+            if not lotes:
+                self.logs.warning(f"No se encontraron filas en '{nombre_coleccion}'")
+                return pd.DataFrame()
+
+            # Las categorías pueden diferir entre chunks, se retipa el resultado
+            df = self.aplicar_tipos(pd.concat(lotes, ignore_index=True), nombre_coleccion)
+            self.logs.info(f"DataFrame creado: {len(df)} filas, {len(df.columns)} columnas")
+            self.logs.info(f"Columnas en '{nombre_coleccion}': {list(df.columns)}")
+            return df
+
+        except Exception as e:
+            self.logs.error(f"Error al leer archivo de '{nombre_coleccion}': {str(e)}")
+            return pd.DataFrame()
+
+    def extraer_todas_colecciones(self, limite_por_coleccion=None, batch_size=None, watermarks=None,
+                                  workers=1, particiones=4):
+        if watermarks is not None:
+            self.establecer_watermarks(watermarks)
+
+        colecciones_objetivo = ['listings', 'reviews', 'calendar']
+        colecciones_a_extraer = [col for col in colecciones_objetivo if self.ruta_coleccion(col)]
+        self.logs.info(f"Colecciones a extraer desde archivos: {colecciones_a_extraer}")
+
+        dataframes = {}
+        if workers and workers > 1:
+            # Un hilo por archivo (cada uno con su propio hilo de descompresión); particiones no aplica
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futuros = {col: pool.submit(self.extraer_coleccion, col, limite_por_coleccion, batch_size)
+                           for col in colecciones_a_extraer}
+                dataframes = {col: futuro.result() for col, futuro in futuros.items()}
+
+        for coleccion in colecciones_a_extraer:
+            if coleccion not in dataframes:
+                dataframes[coleccion] = self.extraer_coleccion(coleccion, limite_por_coleccion, batch_size)
+
+            if not dataframes[coleccion].empty:
+                self.logs.info(f"✓ {coleccion}: {len(dataframes[coleccion])} registros extraídos")
+            else:
+                self.logs.warning(f"✗ {coleccion}: Sin datos extraídos")
+
+        for coleccion in colecciones_objetivo:
+            if coleccion not in dataframes:
+                dataframes[coleccion] = pd.DataFrame()
+                self.logs.info(f"○ {coleccion}: No disponible, agregando DataFrame vacío")
+
+        self.logs.info("=== Extracción completada ===")
+        return dataframes
+
+    def obtener_estadisticas_bd(self):
+        estadisticas = {}
+        self.logs.info("=== Archivos de origen ===")
+        for coleccion in ['listings', 'reviews', 'calendar']:
+            ruta = self.ruta_coleccion(coleccion)
+            if ruta is not None:
+                estadisticas[coleccion] = os.path.getsize(ruta)
+                self.logs.info(f"{coleccion}: {ruta} ({estadisticas[coleccion] / 1024 / 1024:,.1f} MB)")
+        return estadisticas
+
+    def cerrar_conexion(self):
+        pass
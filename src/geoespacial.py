@@ -0,0 +1,146 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# Alfabeto base32 de geohash (sin a, i, l, o)
+ALFABETO_GEOHASH = np.frombuffer(b'0123456789bcdefghjkmnpqrstuvwxyz', dtype=np.uint8)
+
+# Precisión 7: celdas de ~153 m x 153 m, suficiente para agrupar listings por cuadra
+PRECISION_GEOHASH = 7
+
+# 12 caracteres = 60 bits, lo máximo que cabe en el código uint64 (y ~3.7 cm, más que las coordenadas)
+PRECISION_MAXIMA_GEOHASH = 12
+
+# Celda de la cuadrícula en grados (~1.1 km de latitud)
+TAMANO_CELDA_GRADOS = 0.01
+
+# Tabla virtual R*Tree con la caja (un punto) de cada listing, clave = id del listing
+TABLA_RTREE = 'rtree_listings'
+TABLA_LISTINGS = 'raw_listings_transformado'
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def coordenadas_validas(latitudes, longitudes):
+    latitudes = pd.to_numeric(latitudes, errors='coerce').to_numpy(dtype=np.float64)
+    longitudes = pd.to_numeric(longitudes, errors='coerce').to_numpy(dtype=np.float64)
+    validas = (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180)
+    return latitudes, longitudes, validas
+
+
+def cuantizar(valores, minimo, maximo, bits):
+    # Índice de la celda en una división del rango en 2^bits partes (equivale a la bisección de geohash)
+    celdas = np.floor((valores - minimo) / (maximo - minimo) * (1 << bits))
+    return np.clip(celdas, 0, (1 << bits) - 1).astype(np.uint64)
+
+
+def geohash_vectorizado(latitudes, longitudes, precision=PRECISION_GEOHASH):
+    # Bits de longitud y latitud intercalados (longitud primero) y agrupados de a 5 en caracteres base32
+    latitudes, longitudes, validas = coordenadas_validas(latitudes, longitudes)
+    precision = min(max(int(precision), 1), PRECISION_MAXIMA_GEOHASH)
+    total_bits = 5 * precision
+    bits_longitud = (total_bits + 1) // 2
+    bits_latitud = total_bits // 2
+
+    lat = cuantizar(np.where(validas, latitudes, 0), -90, 90, bits_latitud)
+    lon = cuantizar(np.where(validas, longitudes, 0), -180, 180, bits_longitud)
+
+    codigo = np.zeros(len(lat), dtype=np.uint64)
+    for i in range(total_bits):
+        # Bits pares del código (desde el más significativo) son de longitud, impares de latitud
+        if i % 2 == 0:
+            bit = (lon >> np.uint64(bits_longitud - 1 - i // 2)) & np.uint64(1)
+        else:
+            bit = (lat >> np.uint64(bits_latitud - 1 - i // 2)) & np.uint64(1)
+        codigo = (codigo << np.uint64(1)) | bit
+
+    desplazamientos = np.uint64(5) * np.arange(precision - 1, -1, -1, dtype=np.uint64)
+    caracteres = ALFABETO_GEOHASH[((codigo[:, None] >> desplazamientos) & np.uint64(31)).astype(np.intp)]
+    geohashes = np.ascontiguousarray(caracteres).view(f'S{precision}').ravel().astype(str).astype(object)
+    geohashes[~validas] = None
+    return geohashes
+
+
+def celda_grid(latitudes, longitudes, tamano=TAMANO_CELDA_GRADOS):
+    # Clave entera fila * columnas + columna de una cuadrícula regular en grados
+    latitudes, longitudes, validas = coordenadas_validas(latitudes, longitudes)
+    columnas = int(np.ceil(360 / tamano))
+    fila = np.floor((np.where(validas, latitudes, 0) + 90) / tamano).astype(np.int64)
+    columna = np.minimum(np.floor((np.where(validas, longitudes, 0) + 180) / tamano).astype(np.int64), columnas - 1)
+    celdas = pd.array(np.where(validas, fila * columnas + columna, 0), dtype='Int64')
+    celdas[~validas] = pd.NA
+    return celdas
+
+
+def distancia_km(latitud, longitud, latitudes, longitudes):
+    # Haversine desde un punto a un arreglo de puntos
+    lat1, lon1 = np.radians(latitud), np.radians(longitud)
+    lat2, lon2 = np.radians(np.asarray(latitudes, dtype=np.float64)), np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# Índice espacial en SQLite: la tabla R*Tree guarda la caja de cada listing y las consultas por caja o
+# radio la recorren en lugar de escanear raw_listings_transformado. El R*Tree guarda coordenadas en
+# float32 redondeadas hacia afuera, así que las coordenadas exactas se vuelven a filtrar en la tabla cruda
+class IndiceEspacial:
+
+    def __init__(self, conn, logs=None):
+        self.conn = conn
+        self.logs = logs
+
+    def existe_tabla(self, tabla):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (tabla,)).fetchone() is not None
+
+    def construir(self, tabla_listings=TABLA_LISTINGS):
+        # Se reconstruye completo en cada carga: son decenas de miles de puntos y toma milisegundos
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(f'DROP TABLE IF EXISTS "{TABLA_RTREE}"')
+            if not self.existe_tabla(tabla_listings):
+                self.conn.execute("COMMIT")
+                return 0
+
+            self.conn.execute(f'CREATE VIRTUAL TABLE "{TABLA_RTREE}" USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+            self.conn.execute(f'''INSERT INTO "{TABLA_RTREE}" (id, min_lat, max_lat, min_lon, max_lon)
+                SELECT id, latitude, latitude, longitude, longitude FROM "{tabla_listings}"
+                WHERE id IS NOT NULL AND latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180
+                GROUP BY id''')
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return self.conn.execute(f'SELECT COUNT(*) FROM "{TABLA_RTREE}"').fetchone()[0]
+
+    def buscar_bbox(self, lat_min, lat_max, lon_min, lon_max, columnas=None, tabla_listings=TABLA_LISTINGS):
+        # CROSS JOIN fija el orden: primero el R*Tree, luego la tabla cruda por su índice de id
+        columnas_sql = ', '.join(f'l."{col}"' for col in columnas) if columnas else 'l.*'
+        return pd.read_sql_query(
+            f'''SELECT {columnas_sql} FROM "{TABLA_RTREE}" AS r CROSS JOIN "{tabla_listings}" AS l ON l.id = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+            AND l.latitude BETWEEN ? AND ? AND l.longitude BETWEEN ? AND ?''',
+            self.conn,
+            params=(lat_min, lat_max, lon_min, lon_max, lat_min, lat_max, lon_min, lon_max)
+        )
+
+    def buscar_radio(self, latitud, longitud, radio_km, columnas=None, tabla_listings=TABLA_LISTINGS):
+        # Caja que contiene el círculo (extensión exacta en longitud sobre la esfera) y luego distancia
+        # exacta; resultado ordenado por cercanía
+        angulo = radio_km / RADIO_TIERRA_KM
+        delta_lat = np.degrees(angulo)
+        seno_lon = np.sin(angulo) / max(np.cos(np.radians(latitud)), 1e-12)
+        delta_lon = np.degrees(np.arcsin(seno_lon)) if seno_lon < 1 else 180.0
+        if columnas:
+            columnas = list(dict.fromkeys(list(columnas) + ['latitude', 'longitude']))
+
+        df = self.buscar_bbox(latitud - delta_lat, latitud + delta_lat, longitud - delta_lon, longitud + delta_lon,
+                              columnas, tabla_listings)
+        df['distancia_km'] = distancia_km(latitud, longitud, df['latitude'], df['longitude'])
+        df = df[df['distancia_km'] <= radio_km]
+        return df.sort_values('distancia_km', kind='stable').reset_index(drop=True)
+
+
+def abrir_indice_espacial(ruta_sqlite):
+    # Para el notebook: IndiceEspacial de solo lectura sobre la base ya cargada
+    return IndiceEspacial(sqlite3.connect(f'file:{ruta_sqlite}?mode=ro', uri=True))
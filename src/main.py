@@ -2,26 +2,36 @@ import sys
 import os
 from datetime import datetime
 import json
+import queue
+import pandas as pd
+import threading
 
 # Importar nuestras clases ETL
-from extraccion import Extraccion, Logs
-from transformacion import Transformacion
+from extraccion import Extraccion, Logs, CAMPOS_WATERMARK_MONGODB
+from extraccion_archivos import ExtraccionArchivos
+from transformacion import Transformacion, METODOS_TRANSFORMACION
 from carga import Carga
+from metricas import Metricas
+from cache_transformacion import CacheTransformacion
 
 class ETLManager:
     def __init__(self, config=None):
         self.config = config or self.get_default_config()
         self.logs = Logs("ETL_MANAGER")
+        self.metricas = Metricas(self.config.get('metricas', {}))
         
         # Componentes ETL
         self.extractor = None
         self.transformador = None
         self.cargador = None
+        self.cache = None
         
         # Datos del proceso
         self.dataframes_extraidos = {}
         self.dataframes_transformados = {}
         self.reporte_verificacion = {}
+        self.registros_pipeline = {}
+        self.reporte_calidad = {}
         
     def get_default_config(self):
         return {
@@ -31,12 +41,70 @@ class ETLManager:
                 'nombre_bd': 'local'  # Cambiado a 'local' que es donde están las colecciones
             },
             'extraccion': {
+                'fuente': 'mongodb',  # 'mongodb' o 'archivos' (dumps .csv.gz de Inside Airbnb o mongoexport)
+                'archivos': {
+                    'directorio': 'data/insideairbnb/',  # Busca listings.csv.gz, reviews.json, etc.
+                    'rutas': None  # {coleccion: ruta} para nombres de archivo distintos
+                },
                 'limite_registros': None,  # None para todos los registros
+                'modo': 'completo',  # 'completo', 'streaming' (cursor por lotes) o 'pipeline'
+                'batch_size': 10000,
+                'profundidad_cola': 4,  # Modo pipeline: chunks en espera entre etapas (acota la memoria)
+                'proyeccion': False,  # True: solo los campos que usa la transformación (las tablas raw_* pierden ~80 columnas)
+                'pushdown': False,  # Limpieza en un pipeline de agregación de MongoDB; con proyeccion=True da los mismos tipos (--verificar-pushdown)
+                'incremental': False,  # Solo documentos posteriores al watermark guardado en SQLite
+                'campos_watermark': None,  # None: _id en MongoDB, last_scraped/date en archivos; o {coleccion: campo}
+                'workers': 1,  # >1: colecciones y rangos de _id extraídos en paralelo con hilos
+                'particiones_por_coleccion': 4,
                 'colecciones': ['listings', 'reviews']  # Solo las que tienes disponibles
             },
+            'transformacion': {
+                'top_amenities': None,  # None: lista fija de amenities comunes; N: las N más frecuentes
+                'limites_precio': [500, 1000, 2000, 5000],
+                'etiquetas_precio': ['Económico', 'Medio', 'Medio-Alto', 'Alto', 'Premium'],
+                'backend_sentimiento': 'regex',  # 'regex' o 'aho_corasick' (requiere pyahocorasick)
+                'lexico_positivo': None,  # None: léxico por defecto de sentimiento.py
+                'lexico_negativo': None,
+                'workers': 1,  # >1: transforma colecciones y particiones en un pool de procesos
+                'filas_por_particion': 250000,
+                'eliminar_columnas_crudas': False,  # Quitar price, date, etc. cuando existe su versión _clean/_bin
+                'precision_geohash': 7,  # Caracteres del geohash de cada listing (7: ~150 m, máximo 12)
+                'tamano_celda_grados': 0.01,  # Lado de la celda de cuadrícula (celda_grid)
+                'perfil_calidad': {
+                    'precision_hll': 12,  # 2^12 registros: ~1.6% de error en distintos aproximados
+                    'k_cuantiles': 200,  # Tamaño del sketch KLL de cuantiles (mayor = más preciso)
+                    'top_k': 10,  # Valores más frecuentes reportados por columna
+                    'filas_por_chunk': 250000
+                }
+            },
             'carga': {
                 'sqlite_path': 'data/airbnb_dw.db',
-                'excel_path': 'output/'
+                'excel_path': 'output/',
+                'parquet_path': 'data/parquet/',
+                'salidas': ['excel'],  # Además de SQLite: 'excel' y/o 'parquet' (requiere pyarrow)
+                'parquet_compresion': 'zstd',  # 'snappy', 'zstd', 'gzip' o 'none'
+                'parquet_filas_por_grupo': 100000,
+                'modelo_dimensional': True,  # Construir dim_*/fact_*/agg_* en SQLite después de la carga (completo, también en incremental si hubo cambios)
+                'indice_espacial': True,  # Tabla R*Tree rtree_listings para consultas por caja/radio
+                'sqlite_journal_mode': 'MEMORY',  # Solo durante la ventana de carga; 'MEMORY' o 'WAL' ('OFF' no permite ROLLBACK)
+                'sqlite_cache_mb': 512,
+                'tamano_lote_sqlite': 50000,
+                'checksums': True,  # Conteo y hash de contenido por lote, guardados en etl_checksums al cargar
+                'verificacion_muestra': 0.05,  # Fracción de lotes a recalcular al verificar (None = todos, más lento)
+                'verificacion_semilla': 0,  # Semilla de la muestra de lotes: la misma semilla revisa los mismos lotes
+                'excel_filas_por_hoja': 1048575,  # Límite de Excel; se parte en varias hojas o archivos
+                'excel_division': 'hojas',  # 'hojas' o 'archivos'
+                'excel_paralelo': False,  # Un proceso por libro de cada colección
+                'tamano_lote_excel': 10000
+            },
+            'cache_transformacion': {
+                'habilitado': True,  # Reutilizar la transformación si los datos extraídos no cambiaron (no aplica a 'pipeline')
+                'directorio': 'data/cache_transformacion/',
+                'limite_mb': 2048  # Tamaño máximo en disco; se desalojan las entradas menos usadas
+            },
+            'metricas': {
+                'tracemalloc': False,  # Pico de memoria Python por etapa (agrega overhead)
+                'directorio_perfiles': None  # Carpeta para un volcado cProfile (.prof) por etapa
             },
             'logs': {
                 'nivel': 'INFO'
@@ -45,12 +113,24 @@ class ETLManager:
     
     def validar_configuracion(self):
         try:
+            # Validar fuente de extracción
+            extraccion_config = self.config.get('extraccion', {})
+            fuente = extraccion_config.get('fuente', 'mongodb')
+            if fuente not in ('mongodb', 'archivos'):
+                self.logs.error(f"Fuente de extracción no soportada: {fuente}")
+                return False
+            
             # Validar configuración de MongoDB
             mongodb_config = self.config.get('mongodb', {})
-            if not all(key in mongodb_config for key in ['host', 'puerto', 'nombre_bd']):
+            if fuente == 'mongodb' and not all(key in mongodb_config for key in ['host', 'puerto', 'nombre_bd']):
                 self.logs.error("Configuración de MongoDB incompleta")
                 return False
             
+            # Validar modo de extracción
+            if extraccion_config.get('modo', 'completo') not in ('completo', 'streaming', 'pipeline'):
+                self.logs.error(f"Modo de extracción no soportado: {extraccion_config.get('modo')}")
+                return False
+            
             # Validar rutas de salida
             carga_config = self.config.get('carga', {})
             if 'sqlite_path' in carga_config:
@@ -67,23 +147,49 @@ class ETLManager:
     
     def inicializar_componentes(self):
         try:
-            mongodb_config = self.config['mongodb']
+            extraccion_config = self.config.get('extraccion', {})
             carga_config = self.config['carga']
             
-            # Inicializar extractor
-            self.extractor = Extraccion(
-                host=mongodb_config['host'],
-                puerto=mongodb_config['puerto'],
-                nombre_bd=mongodb_config['nombre_bd']
-            )
+            # Inicializar extractor (MongoDB o archivos, misma interfaz)
+            if extraccion_config.get('fuente', 'mongodb') == 'archivos':
+                archivos_config = extraccion_config.get('archivos', {})
+                self.extractor = ExtraccionArchivos(
+                    directorio=archivos_config.get('directorio', 'data/insideairbnb/'),
+                    rutas=archivos_config.get('rutas'),
+                    usar_proyeccion=extraccion_config.get('proyeccion', False),
+                    campos_watermark=extraccion_config.get('campos_watermark'),
+                    metricas=self.metricas
+                )
+            else:
+                mongodb_config = self.config['mongodb']
+                self.extractor = Extraccion(
+                    host=mongodb_config['host'],
+                    puerto=mongodb_config['puerto'],
+                    nombre_bd=mongodb_config['nombre_bd'],
+                    usar_proyeccion=extraccion_config.get('proyeccion', False),
+                    campos_watermark=extraccion_config.get('campos_watermark') or CAMPOS_WATERMARK_MONGODB,
+                    metricas=self.metricas,
+                    pushdown=extraccion_config.get('pushdown', False)
+                )
             
             # Inicializar transformador
-            self.transformador = Transformacion()
+            self.transformador = Transformacion(self.config.get('transformacion', {}), metricas=self.metricas)
+            
+            # Caché de transformación (requiere pyarrow; sin él se transforma siempre)
+            cache_config = self.config.get('cache_transformacion', {})
+            if cache_config.get('habilitado', False):
+                try:
+                    import pyarrow
+                    self.cache = CacheTransformacion(self.config.get('transformacion', {}), cache_config, self.metricas)
+                except ImportError:
+                    self.logs.warning("pyarrow no está instalado, caché de transformación deshabilitada")
             
             # Inicializar cargador
             self.cargador = Carga(
                 ruta_sqlite=carga_config['sqlite_path'],
-                ruta_excel=carga_config['excel_path']
+                ruta_excel=carga_config['excel_path'],
+                config=carga_config,
+                metricas=self.metricas
             )
             
             self.logs.info("Componentes ETL inicializados correctamente")
@@ -99,20 +205,40 @@ class ETLManager:
         try:
             # Conectar a MongoDB
             if not self.extractor.conectar():
-                self.logs.error("No se pudo conectar a MongoDB")
+                self.logs.error("No se pudo conectar a la fuente de datos")
                 return False
             
             # Obtener estadísticas de la base de datos
             self.extractor.obtener_estadisticas_bd()
             
             # Extraer datos
-            limite = self.config['extraccion'].get('limite_registros')
-            self.dataframes_extraidos = self.extractor.extraer_todas_colecciones(limite)
+            extraccion_config = self.config['extraccion']
+            limite = extraccion_config.get('limite_registros')
+            batch_size = None
+            if extraccion_config.get('modo', 'completo') == 'streaming':
+                batch_size = extraccion_config.get('batch_size', 10000)
+                self.logs.info(f"Extracción en modo streaming con lotes de {batch_size} documentos")
+            
+            # Modo incremental: partir del watermark guardado en la bodega
+            watermarks = None
+            if extraccion_config.get('incremental', False):
+                watermarks = self.cargador.leer_watermarks()
+                self.logs.info(f"Extracción incremental, watermarks previos: {list(watermarks.keys()) or 'ninguno'}")
+            
+            self.dataframes_extraidos = self.extractor.extraer_todas_colecciones(
+                limite, batch_size, watermarks,
+                workers=extraccion_config.get('workers', 1),
+                particiones=extraccion_config.get('particiones_por_coleccion', 4)
+            )
             
             # Verificar que se extrajeron algunos datos (al menos una colección con datos)
             datos_extraidos = any(not df.empty for df in self.dataframes_extraidos.values())
             
             if not datos_extraidos:
+                if extraccion_config.get('incremental', False):
+                    self.logs.info("No hay documentos nuevos desde la última ejecución")
+                    self.extractor.cerrar_conexion()
+                    return True
                 self.logs.error("No se extrajeron datos de ninguna colección")
                 return False
             
@@ -137,16 +263,41 @@ class ETLManager:
         self.logs.info("=== FASE 2: TRANSFORMACIÓN ===")
         
         try:
+            # Colecciones con el mismo contenido, código y configuración se leen de la caché
+            pendientes = self.dataframes_extraidos
+            claves = {}
+            if self.cache is not None:
+                pendientes = {}
+                for nombre, df in self.dataframes_extraidos.items():
+                    if df.empty:
+                        pendientes[nombre] = df
+                        continue
+                    claves[nombre] = self.cache.clave(nombre, df)
+                    resultado = self.cache.leer(nombre, claves[nombre])
+                    if resultado is None:
+                        pendientes[nombre] = df
+                    else:
+                        self.logs.info(f"'{nombre}' sin cambios, transformación leída de la caché")
+                        self.transformador.dataframes_transformados[nombre], memoria = resultado
+                        if memoria:
+                            self.transformador.optimizacion_memoria[nombre] = memoria
+            
             # Ejecutar transformaciones
-            self.dataframes_transformados = self.transformador.ejecutar_transformacion_completa(
-                self.dataframes_extraidos
-            )
+            transformados = self.transformador.ejecutar_transformacion_completa(pendientes)
+            self.dataframes_transformados = {
+                nombre: transformados[nombre] for nombre in self.dataframes_extraidos if nombre in transformados
+            }
+            
+            for nombre in pendientes:
+                if nombre in claves and nombre in self.dataframes_transformados:
+                    self.cache.guardar(nombre, claves[nombre], self.dataframes_transformados[nombre],
+                                       self.transformador.optimizacion_memoria.get(nombre))
             
             # Generar reporte de calidad
-            reporte_calidad = self.transformador.generar_reporte_calidad()
+            self.reporte_calidad = self.transformador.generar_reporte_calidad()
             
             # Log del reporte de calidad
-            for tabla, stats in reporte_calidad.items():
+            for tabla, stats in self.reporte_calidad.items():
                 self.logs.info(f"Calidad {tabla}: {stats['total_registros']} registros")
             
             self.logs.info("Fase de transformación completada exitosamente")
@@ -160,11 +311,18 @@ class ETLManager:
         self.logs.info("=== FASE 3: CARGA ===")
         
         try:
-            # Ejecutar carga completa
+            extraccion_config = self.config['extraccion']
+            incremental = extraccion_config.get('incremental', False)
+            
+            # Ejecutar carga completa (upsert del delta en modo incremental)
             self.reporte_verificacion = self.cargador.ejecutar_carga_completa(
-                self.dataframes_transformados
+                self.dataframes_transformados, incremental=incremental
             )
             
+            # El watermark solo avanza cuando la carga terminó bien; con límite sin orden no es fiable
+            if incremental or not extraccion_config.get('limite_registros'):
+                self.cargador.guardar_watermarks(self.extractor.watermarks_serializados())
+            
             self.logs.info("Fase de carga completada exitosamente")
             return True
             
@@ -172,6 +330,216 @@ class ETLManager:
             self.logs.error(f"Error en fase de carga: {str(e)}")
             return False
     
+    def verificar_pushdown(self, limite=None):
+        # Extrae y transforma cada colección con y sin pushdown sobre los mismos documentos y compara
+        self.logs.info("=== VERIFICANDO PUSHDOWN CONTRA LA RUTA PYTHON ===")
+        
+        if not self.inicializar_componentes() or not self.extractor.conectar():
+            return None
+        
+        claves_orden = {'listings': ['id'], 'reviews': ['id'], 'calendar': ['listing_id', 'date_clean']}
+        diferencias = {}
+        try:
+            for nombre in self.config['extraccion'].get('colecciones', ['listings', 'reviews']):
+                resultados = []
+                for pushdown in (False, True):
+                    self.extractor.pushdown = pushdown
+                    df = self.extractor.leer_coleccion(nombre, limite)
+                    if not df.empty:
+                        transformador = Transformacion(self.config.get('transformacion', {}))
+                        df = getattr(transformador, METODOS_TRANSFORMACION[nombre])(df)
+                        # El pipeline entrega por _id; el orden de find() puede ser otro
+                        df = df.sort_values(claves_orden[nombre], kind='stable').reset_index(drop=True)
+                    resultados.append(df)
+                
+                python, agregado = resultados
+                problemas = []
+                if len(python) != len(agregado):
+                    problemas.append(f"filas: {len(python)} sin pushdown vs {len(agregado)} con pushdown")
+                elif list(python.columns) != list(agregado.columns):
+                    problemas.append(f"columnas: {list(python.columns)} vs {list(agregado.columns)}")
+                else:
+                    for col in python.columns:
+                        if str(python[col].dtype) != str(agregado[col].dtype):
+                            problemas.append(f"{col}: tipo {python[col].dtype} vs {agregado[col].dtype}")
+                        elif not python[col].astype(object).equals(agregado[col].astype(object)):
+                            distintas = int((python[col].astype(object) != agregado[col].astype(object)).sum())
+                            problemas.append(f"{col}: {distintas} valores distintos")
+                
+                diferencias[nombre] = problemas
+                if problemas:
+                    self.logs.warning(f"'{nombre}' difiere con pushdown: {problemas}")
+                else:
+                    self.logs.info(f"'{nombre}': mismo resultado con y sin pushdown ({len(python)} filas)")
+        finally:
+            self.extractor.pushdown = self.config['extraccion'].get('pushdown', False)
+            self.extractor.cerrar_conexion()
+        
+        return diferencias
+    
+    def encolar(self, cola, elemento, parada):
+        # put con timeout para que un productor no quede bloqueado si otra etapa falló
+        while not parada.is_set():
+            try:
+                cola.put(elemento, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def desencolar(self, cola, parada):
+        while not parada.is_set():
+            try:
+                return cola.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+    
+    def ejecutar_pipeline(self):
+        self.logs.info("=== PIPELINE: EXTRACCIÓN -> TRANSFORMACIÓN -> CARGA POR CHUNKS ===")
+        
+        extraccion_config = self.config['extraccion']
+        limite = extraccion_config.get('limite_registros')
+        batch_size = extraccion_config.get('batch_size', 10000)
+        profundidad = extraccion_config.get('profundidad_cola', 4)
+        incremental = extraccion_config.get('incremental', False)
+        colecciones = extraccion_config.get('colecciones', ['listings', 'reviews'])
+        
+        try:
+            if not self.extractor.conectar():
+                self.logs.error("No se pudo conectar a la fuente de datos")
+                return False
+            
+            self.extractor.obtener_estadisticas_bd()
+            
+            if incremental:
+                self.extractor.establecer_watermarks(self.cargador.leer_watermarks())
+            
+            # Colas acotadas: la memoria máxima es ~ tamaño de chunk x profundidad de cola por etapa
+            cola_extraidos = queue.Queue(maxsize=profundidad)
+            cola_transformados = queue.Queue(maxsize=profundidad)
+            parada = threading.Event()
+            errores = []
+            registros = {nombre: {'extraidos': 0, 'transformados': 0, 'cargados': 0} for nombre in colecciones}
+            
+            def etapa_extraccion():
+                try:
+                    for nombre in colecciones:
+                        for lote in self.extractor.iterar_coleccion(nombre, limite, batch_size):
+                            registros[nombre]['extraidos'] += len(lote)
+                            if not self.encolar(cola_extraidos, (nombre, lote), parada):
+                                return
+                        # Marca de fin de colección (listings se transforma completo al recibirla)
+                        if not self.encolar(cola_extraidos, (nombre, None), parada):
+                            return
+                except Exception as e:
+                    errores.append(('extraccion', e))
+                    parada.set()
+                finally:
+                    self.encolar(cola_extraidos, None, parada)
+            
+            def etapa_transformacion():
+                try:
+                    vistos = {nombre: set() for nombre in colecciones}
+                    pendientes_listings = []
+                    while True:
+                        elemento = self.desencolar(cola_extraidos, parada)
+                        if elemento is None:
+                            break
+                        nombre, lote = elemento
+                        
+                        # Listings es pequeño y su transformación necesita todas las filas
+                        if nombre == 'listings':
+                            if lote is not None:
+                                pendientes_listings.append(lote)
+                                continue
+                            if not pendientes_listings:
+                                continue
+                            lote = pd.concat(pendientes_listings, ignore_index=True)
+                            pendientes_listings = []
+                        elif lote is None:
+                            continue
+                        
+                        lote = self.transformador.deduplicar_streaming(nombre, lote, vistos[nombre])
+                        if lote.empty:
+                            continue
+                        
+                        metodo = getattr(self.transformador, METODOS_TRANSFORMACION[nombre])
+                        transformado = metodo(lote)
+                        registros[nombre]['transformados'] += len(transformado)
+                        self.transformador.perfilar(nombre, transformado)
+                        if not self.encolar(cola_transformados, (nombre, transformado), parada):
+                            return
+                except Exception as e:
+                    errores.append(('transformacion', e))
+                    parada.set()
+                finally:
+                    self.encolar(cola_transformados, None, parada)
+            
+            def etapa_carga():
+                conn = None
+                try:
+                    conn = self.cargador.abrir_carga_streaming()
+                    cargadas = []
+                    while True:
+                        elemento = self.desencolar(cola_transformados, parada)
+                        if elemento is None:
+                            break
+                        nombre, df = elemento
+                        self.cargador.cargar_lote_sqlite(conn, nombre, df, nombre not in cargadas, incremental)
+                        if nombre not in cargadas:
+                            cargadas.append(nombre)
+                        registros[nombre]['cargados'] += len(df)
+                    
+                    if not parada.is_set():
+                        self.cargador.finalizar_carga_streaming(conn, cargadas)
+                except Exception as e:
+                    errores.append(('carga', e))
+                    parada.set()
+                finally:
+                    if conn is not None:
+                        # Otra etapa falló (o la carga misma): no se confirma ningún chunk
+                        self.cargador.revertir_carga_streaming(conn)
+                        conn.close()
+            
+            hilos = [threading.Thread(target=etapa, name=f"pipeline_{etapa.__name__}")
+                     for etapa in (etapa_extraccion, etapa_transformacion, etapa_carga)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            
+            self.extractor.cerrar_conexion()
+            self.registros_pipeline = registros
+            
+            if errores:
+                for etapa, error in errores:
+                    self.logs.error(f"Error en etapa de {etapa} del pipeline: {str(error)}")
+                return False
+            
+            for nombre, conteos in registros.items():
+                self.logs.info(f"{nombre}: {conteos['extraidos']} extraídos, "
+                               f"{conteos['transformados']} transformados, {conteos['cargados']} cargados")
+            
+            # Excel y Parquet se escriben desde los DataFrames completos; en modo pipeline solo se carga SQLite
+            salidas = self.config['carga'].get('salidas', ['excel'])
+            for salida, nombre_salida in (('excel', 'Excel'), ('parquet', 'Parquet')):
+                if salida in salidas:
+                    self.logs.info(f"Modo pipeline: se omite la exportación a {nombre_salida}")
+            
+            self.reporte_verificacion = self.cargador.verificar_carga()
+            self.reporte_calidad = self.transformador.generar_reporte_calidad()
+            
+            if incremental or not limite:
+                self.cargador.guardar_watermarks(self.extractor.watermarks_serializados())
+            
+            self.logs.info("Pipeline completado exitosamente")
+            return True
+            
+        except Exception as e:
+            self.logs.error(f"Error en pipeline ETL: {str(e)}")
+            return False
+    
     def generar_reporte_final(self):
         self.logs.info("=== GENERANDO REPORTE FINAL ===")
         
@@ -193,13 +561,24 @@ class ETLManager:
                 'colecciones_transformadas': list(self.dataframes_transformados.keys()),
                 'registros_transformados': {
                     nombre: len(df) for nombre, df in self.dataframes_transformados.items()
-                }
+                },
+                'calidad': self.reporte_calidad
             },
             'carga': {
                 'verificacion': self.reporte_verificacion
             }
         }
         
+        if self.registros_pipeline:
+            reporte['pipeline'] = self.registros_pipeline
+        
+        reporte['metricas'] = {
+            'etapas': self.metricas.resumen(),
+            'totales_segundos': {
+                fase: self.metricas.total_por_prefijo(fase) for fase in ('extraccion', 'transformacion', 'carga')
+            }
+        }
+        
         # Guardar reporte en archivo JSON
         reporte_path = f"output/reporte_etl_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
         os.makedirs(os.path.dirname(reporte_path), exist_ok=True)
@@ -212,6 +591,9 @@ class ETLManager:
         # Log resumen del proceso
         total_extraidos = sum(len(df) for df in self.dataframes_extraidos.values())
         total_transformados = sum(len(df) for df in self.dataframes_transformados.values())
+        if self.registros_pipeline:
+            total_extraidos = sum(c['extraidos'] for c in self.registros_pipeline.values())
+            total_transformados = sum(c['transformados'] for c in self.registros_pipeline.values())
         
         self.logs.info("=== RESUMEN FINAL ===")
         self.logs.info(f"Total registros extraídos: {total_extraidos:,}")
@@ -231,19 +613,27 @@ class ETLManager:
             if not self.validar_configuracion():
                 return False
             
+            # tracemalloc (si está habilitado) se inicia una sola vez para toda la corrida
+            self.metricas.iniciar_tracemalloc()
+            
             # Inicializar componentes
             if not self.inicializar_componentes():
                 return False
             
-            # Ejecutar fases del ETL
-            if not self.ejecutar_extraccion():
-                return False
-            
-            if not self.ejecutar_transformacion():
-                return False
-            
-            if not self.ejecutar_carga():
-                return False
+            # Modo pipeline: las tres fases corren a la vez sobre chunks
+            if self.config['extraccion'].get('modo', 'completo') == 'pipeline':
+                if not self.ejecutar_pipeline():
+                    return False
+            else:
+                # Ejecutar fases del ETL
+                if not self.ejecutar_extraccion():
+                    return False
+                
+                if not self.ejecutar_transformacion():
+                    return False
+                
+                if not self.ejecutar_carga():
+                    return False
             
             # Generar reporte final
             self.generar_reporte_final()
@@ -261,6 +651,8 @@ class ETLManager:
         except Exception as e:
             self.logs.error(f"Error crítico en proceso ETL: {str(e)}")
             return False
+        finally:
+            self.metricas.detener_tracemalloc()
 
 
 def cargar_configuracion_desde_archivo(ruta_config):
@@ -285,6 +677,8 @@ Uso:
 Opciones:
     --config <archivo>    Usar archivo de configuración personalizado
     --limite <numero>     Limitar número de registros a extraer (para testing)
+    --no-cache            No reutilizar transformaciones guardadas en data/cache_transformacion/
+    --verificar-pushdown  Comparar la limpieza en MongoDB (extraccion.pushdown) con la ruta Python
     --help               Mostrar esta ayuda
 
 Ejemplos:
@@ -293,13 +687,15 @@ Ejemplos:
     python main.py --config mi_config.json  # Usar configuración personalizada
 
 Requisitos:
-    - MongoDB corriendo en localhost:27017
+    - MongoDB corriendo en localhost:27017 (o extraccion.fuente = 'archivos' con los
+      .csv.gz de Inside Airbnb / JSON de mongoexport en data/insideairbnb/)
     - Base de datos 'airbnb_mexico' con colecciones: listings, reviews, calendar
     - Librerías: pandas, pymongo, sqlite3, openpyxl
 
 Salidas:
     - Base de datos SQLite: data/airbnb_dw.db
     - Archivos Excel: output/
+    - Parquet (carga.salidas con 'parquet'): data/parquet/
     - Logs: logs/
     - Reporte: output/reporte_etl_*.json
 """)
@@ -312,6 +708,9 @@ def main():
     parser = argparse.ArgumentParser(description='Proceso ETL para Airbnb Ciudad de México')
     parser.add_argument('--config', help='Archivo de configuración JSON')
     parser.add_argument('--limite', type=int, help='Límite de registros a extraer')
+    parser.add_argument('--no-cache', action='store_true', help='Transformar siempre, sin usar la caché')
+    parser.add_argument('--verificar-pushdown', action='store_true',
+                        help='Comparar la transformación con y sin pushdown de MongoDB y salir')
     parser.add_argument('--help-etl', action='store_true', help='Mostrar ayuda detallada')
     
     args = parser.parse_args()
@@ -337,6 +736,18 @@ def main():
             etl_manager.config['extraccion']['limite_registros'] = args.limite
             print(f"Limitando extracción a {args.limite} registros por colección")
         
+        if args.no_cache:
+            etl_manager.config.setdefault('cache_transformacion', {})['habilitado'] = False
+        
+        if args.verificar_pushdown:
+            diferencias = etl_manager.verificar_pushdown(args.limite)
+            if diferencias is None:
+                print("\nNo se pudo conectar a MongoDB")
+                sys.exit(1)
+            for nombre, problemas in diferencias.items():
+                print(f"   - {nombre}: {'OK' if not problemas else '; '.join(problemas)}")
+            sys.exit(1 if any(diferencias.values()) else 0)
+        
         # Ejecutar proceso ETL
         exito = etl_manager.ejecutar_etl_completo()
         
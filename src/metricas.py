@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+import tracemalloc
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage, el RSS se omite
+    resource = None
+
+
+def rss_pico_mb():
+    # Pico de memoria residente del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname().sysname == 'Darwin':
+        pico = pico / 1024
+    return round(pico / 1024, 2)
+
+
+# Registro de tiempos y memoria por etapa del ETL. Cada medición queda como un dict
+# que después se vuelca en la sección 'metricas' del reporte final
+class Metricas:
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.registros = []
+        self.lock = threading.Lock()
+        # tracemalloc agrega overhead en cada asignación, por eso es opcional
+        self.usar_tracemalloc = self.config.get('tracemalloc', False)
+        self.tracemalloc_propio = False
+        self.directorio_perfiles = self.config.get('directorio_perfiles')
+        self.hilo = threading.local()
+
+    def iniciar_tracemalloc(self):
+        # Una vez por corrida: tracemalloc es global al proceso, así que medir nunca lo reinicia ni lo
+        # detiene (una etapa anidada o de otro hilo borraría el pico de la que la contiene)
+        if self.usar_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracemalloc_propio = True
+
+    def detener_tracemalloc(self):
+        if self.tracemalloc_propio:
+            tracemalloc.stop()
+            self.tracemalloc_propio = False
+
+    @contextmanager
+    def medir(self, etapa, filas=None):
+        # El bloque puede actualizar medicion['filas'] cuando el número de filas se conoce al final
+        medicion = {'etapa': etapa, 'filas': filas}
+
+        # Un solo cProfile activo por hilo: las etapas anidadas quedan dentro del perfil externo
+        perfil = None
+        if self.directorio_perfiles and not getattr(self.hilo, 'perfilando', False):
+            perfil = cProfile.Profile()
+            self.hilo.perfilando = True
+
+        if self.usar_tracemalloc:
+            self.iniciar_tracemalloc()
+            memoria_inicial, pico_inicial = tracemalloc.get_traced_memory()
+
+        rss_inicial = rss_pico_mb()
+        inicio = time.perf_counter()
+        inicio_cpu = time.process_time()
+        if perfil is not None:
+            perfil.enable()
+
+        try:
+            yield medicion
+        finally:
+            if perfil is not None:
+                perfil.disable()
+                self.hilo.perfilando = False
+            segundos = time.perf_counter() - inicio
+            medicion['segundos'] = round(segundos, 4)
+            # process_time es del proceso completo: con hilos en paralelo incluye el CPU de los demás
+            medicion['cpu_segundos'] = round(time.process_time() - inicio_cpu, 4)
+            if medicion['filas'] is not None:
+                medicion['filas_por_segundo'] = round(medicion['filas'] / segundos, 1) if segundos > 0 else None
+
+            rss_final = rss_pico_mb()
+            if rss_final is not None:
+                medicion['rss_pico_mb'] = rss_final
+                medicion['rss_pico_delta_mb'] = round(rss_final - rss_inicial, 2)
+
+            if self.usar_tracemalloc and tracemalloc.is_tracing():
+                # El pico es el de todo el proceso desde iniciar_tracemalloc. Si la etapa lo superó, el pico
+                # se alcanzó dentro de ella y la diferencia es exacta (con hilos incluye lo que asignaron los
+                # demás); si no, solo se sabe que la etapa no pasó del pico anterior y el valor es una cota
+                _, pico = tracemalloc.get_traced_memory()
+                medicion['tracemalloc_pico_mb'] = round((pico - memoria_inicial) / 1024 / 1024, 2)
+                medicion['tracemalloc_pico_exacto'] = pico > pico_inicial
+
+            if perfil is not None:
+                os.makedirs(self.directorio_perfiles, exist_ok=True)
+                ruta = os.path.join(self.directorio_perfiles, f"{etapa.replace('/', '_')}.prof")
+                perfil.dump_stats(ruta)
+                medicion['perfil'] = ruta
+
+            with self.lock:
+                self.registros.append(medicion)
+
+    def resumen(self):
+        with self.lock:
+            return list(self.registros)
+
+    def total_por_prefijo(self, prefijo):
+        return round(sum(m['segundos'] for m in self.resumen() if m['etapa'].startswith(prefijo)), 4)
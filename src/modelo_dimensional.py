@@ -0,0 +1,253 @@
+import sqlite3
+
+# Columnas de cada dimensión/hecho: (columna destino, tipo SQLite, columna origen en raw_*_transformado).
+# Las columnas que no existan en la tabla cruda (p. ej. sin comentarios) simplemente se omiten
+COLUMNAS_DIM_HOST = [
+    ('host_name', 'TEXT', 'host_name'),
+    ('host_since', 'TEXT', 'host_since_clean'),
+    ('host_is_superhost', 'INTEGER', 'host_is_superhost_bin'),
+    ('host_identity_verified', 'INTEGER', 'host_identity_verified_bin')
+]
+
+COLUMNAS_DIM_LISTING = [
+    ('name', 'TEXT', 'name_clean'),
+    ('room_type', 'TEXT', 'room_type_normalizado'),
+    ('property_type', 'TEXT', 'property_type_normalizado'),
+    ('latitude', 'REAL', 'latitude'),
+    ('longitude', 'REAL', 'longitude'),
+    ('geohash', 'TEXT', 'geohash'),
+    ('celda_grid', 'INTEGER', 'celda_grid'),
+    ('price', 'REAL', 'price_clean'),
+    ('categoria_precio', 'TEXT', 'categoria_precio'),
+    ('accommodates', 'INTEGER', 'accommodates_clean'),
+    ('bedrooms', 'REAL', 'bedrooms_clean'),
+    ('beds', 'REAL', 'beds_clean'),
+    ('minimum_nights', 'INTEGER', 'minimum_nights_clean'),
+    ('maximum_nights', 'INTEGER', 'maximum_nights_clean'),
+    ('availability_365', 'INTEGER', 'availability_365_clean'),
+    ('has_availability', 'INTEGER', 'has_availability_bin')
+]
+
+COLUMNAS_FACT_REVIEWS = [
+    ('sentiment_score', 'INTEGER', 'sentiment_score'),
+    ('comments_length', 'INTEGER', 'comments_length')
+]
+
+COLUMNAS_FACT_CALENDAR = [
+    ('available', 'INTEGER', 'available_bin'),
+    ('price', 'REAL', 'price_clean')
+]
+
+TABLAS_MODELO = ['agg_reviews_mes', 'agg_precio_barrio', 'fact_calendar', 'fact_reviews',
+                 'dim_listing', 'dim_host', 'dim_neighbourhood', 'dim_date']
+
+# 'YYYY-MM-DD' -> YYYYMMDD como clave entera de dim_date
+EXPRESION_DATE_KEY = "CAST(REPLACE(substr({col}, 1, 10), '-', '') AS INTEGER)"
+
+NOMBRES_MES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+
+# Esquema estrella construido con SQL dentro de SQLite a partir de las tablas raw_*_transformado:
+# dimensiones con claves sustitutas enteras, hechos que las referencian e índices creados al final
+class ModeloDimensional:
+
+    def __init__(self, conn, logs):
+        self.conn = conn
+        self.logs = logs
+
+    def columnas_tabla(self, tabla):
+        return {fila[1] for fila in self.conn.execute(f'PRAGMA table_info("{tabla}")')}
+
+    def existe_tabla(self, tabla):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone() is not None
+
+    def columnas_disponibles(self, especificacion, tabla):
+        existentes = self.columnas_tabla(tabla)
+        return [(destino, tipo, origen) for destino, tipo, origen in especificacion if origen in existentes]
+
+    def eliminar_modelo(self):
+        for tabla in TABLAS_MODELO:
+            self.conn.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+
+    def crear_dim_date(self):
+        fuentes = [f'SELECT DISTINCT date_clean AS fecha FROM "{tabla}" WHERE date_clean IS NOT NULL'
+                   for tabla in ('raw_reviews_transformado', 'raw_calendar_transformado')
+                   if self.existe_tabla(tabla) and 'date_clean' in self.columnas_tabla(tabla)]
+        if not fuentes:
+            return False
+
+        nombre_mes = 'CASE CAST(strftime(\'%m\', fecha) AS INTEGER) ' + ' '.join(
+            f"WHEN {i} THEN '{nombre}'" for i, nombre in enumerate(NOMBRES_MES, start=1)) + ' END'
+
+        self.conn.execute("""CREATE TABLE dim_date (
+            date_key INTEGER PRIMARY KEY,
+            fecha TEXT NOT NULL UNIQUE,
+            año INTEGER, mes INTEGER, dia INTEGER, trimestre INTEGER,
+            dia_semana INTEGER, nombre_mes TEXT)""")
+        # dia_semana con lunes = 0, igual que pandas dayofweek
+        self.conn.execute(f"""INSERT INTO dim_date
+            SELECT {EXPRESION_DATE_KEY.format(col='fecha')}, substr(fecha, 1, 10),
+                   CAST(strftime('%Y', fecha) AS INTEGER), CAST(strftime('%m', fecha) AS INTEGER),
+                   CAST(strftime('%d', fecha) AS INTEGER), (CAST(strftime('%m', fecha) AS INTEGER) + 2) / 3,
+                   (CAST(strftime('%w', fecha) AS INTEGER) + 6) % 7, {nombre_mes}
+            FROM ({' UNION '.join(fuentes)})
+            GROUP BY substr(fecha, 1, 10)
+            ORDER BY 1""")
+        return True
+
+    def crear_dim_neighbourhood(self):
+        self.conn.execute("""CREATE TABLE dim_neighbourhood (
+            neighbourhood_key INTEGER PRIMARY KEY,
+            neighbourhood TEXT NOT NULL UNIQUE)""")
+        if 'neighbourhood_cleansed_clean' in self.columnas_tabla('raw_listings_transformado'):
+            self.conn.execute("""INSERT INTO dim_neighbourhood (neighbourhood)
+                SELECT DISTINCT neighbourhood_cleansed_clean FROM raw_listings_transformado
+                WHERE neighbourhood_cleansed_clean IS NOT NULL ORDER BY 1""")
+
+    def crear_dim_host(self):
+        columnas = self.columnas_disponibles(COLUMNAS_DIM_HOST, 'raw_listings_transformado')
+        definicion = ''.join(f', "{destino}" {tipo}' for destino, tipo, _ in columnas)
+        self.conn.execute(f"""CREATE TABLE dim_host (
+            host_key INTEGER PRIMARY KEY,
+            host_id INTEGER NOT NULL UNIQUE{definicion})""")
+
+        if 'host_id' not in self.columnas_tabla('raw_listings_transformado'):
+            self.logs.warning("raw_listings_transformado no tiene host_id: dim_host queda vacía")
+            return False
+
+        # Un host aparece en varios listings: se toma un valor por atributo
+        destinos = ''.join(f', "{destino}"' for destino, _, _ in columnas)
+        origenes = ''.join(f', MAX("{origen}")' for _, _, origen in columnas)
+        self.conn.execute(f"""INSERT INTO dim_host (host_id{destinos})
+            SELECT host_id{origenes} FROM raw_listings_transformado
+            WHERE host_id IS NOT NULL GROUP BY host_id ORDER BY host_id""")
+        return True
+
+    def crear_dim_listing(self, con_host):
+        columnas = self.columnas_disponibles(COLUMNAS_DIM_LISTING, 'raw_listings_transformado')
+        definicion = ''.join(f', "{destino}" {tipo}' for destino, tipo, _ in columnas)
+        self.conn.execute(f"""CREATE TABLE dim_listing (
+            listing_key INTEGER PRIMARY KEY,
+            listing_id INTEGER NOT NULL UNIQUE,
+            host_key INTEGER REFERENCES dim_host(host_key),
+            neighbourhood_key INTEGER REFERENCES dim_neighbourhood(neighbourhood_key){definicion})""")
+
+        existentes = self.columnas_tabla('raw_listings_transformado')
+        destinos = ''.join(f', "{destino}"' for destino, _, _ in columnas)
+        origenes = ''.join(f', l."{origen}"' for _, _, origen in columnas)
+        host = 'h.host_key' if con_host else 'NULL'
+        union_host = 'LEFT JOIN dim_host h ON h.host_id = l.host_id' if con_host else ''
+        barrio = 'n.neighbourhood_key' if 'neighbourhood_cleansed_clean' in existentes else 'NULL'
+        union_barrio = ('LEFT JOIN dim_neighbourhood n ON n.neighbourhood = l.neighbourhood_cleansed_clean'
+                        if 'neighbourhood_cleansed_clean' in existentes else '')
+        # INSERT OR IGNORE: si la tabla cruda trae un id repetido (carga incremental antigua) gana el primero
+        self.conn.execute(f"""INSERT OR IGNORE INTO dim_listing (listing_id, host_key, neighbourhood_key{destinos})
+            SELECT l.id, {host}, {barrio}{origenes}
+            FROM raw_listings_transformado l {union_host} {union_barrio}
+            WHERE l.id IS NOT NULL ORDER BY l.id""")
+
+    def crear_fact(self, tabla_fact, tabla_raw, especificacion, columna_id=None):
+        columnas = self.columnas_disponibles(especificacion, tabla_raw)
+        definicion = ''.join(f', "{destino}" {tipo}' for destino, tipo, _ in columnas)
+        destinos = ''.join(f', "{destino}"' for destino, _, _ in columnas)
+        origenes = ''.join(f', r."{origen}"' for _, _, origen in columnas)
+
+        if columna_id:
+            clave = f'{columna_id} INTEGER PRIMARY KEY,'
+            restriccion = ''
+            sin_rowid = ''
+            id_destino, id_origen = f'{columna_id}, ', 'r.id, '
+            # Una review sin fecha válida sigue siendo un hecho: queda con date_key NULL
+            filtro = 'r.listing_id IS NOT NULL'
+        else:
+            # Calendar: la clave natural (listing, fecha) es la PK y la tabla se agrupa físicamente por ella
+            clave = ''
+            restriccion = ', PRIMARY KEY (listing_id, date_key)'
+            sin_rowid = ' WITHOUT ROWID'
+            id_destino, id_origen = '', ''
+            filtro = 'r.listing_id IS NOT NULL AND r.date_clean IS NOT NULL'
+
+        self.conn.execute(f"""CREATE TABLE {tabla_fact} (
+            {clave}
+            listing_key INTEGER REFERENCES dim_listing(listing_key),
+            date_key INTEGER REFERENCES dim_date(date_key),
+            listing_id INTEGER NOT NULL{definicion}{restriccion}){sin_rowid}""")
+
+        self.conn.execute(f"""INSERT OR IGNORE INTO {tabla_fact} ({id_destino}listing_key, date_key, listing_id{destinos})
+            SELECT {id_origen}l.listing_key, {EXPRESION_DATE_KEY.format(col='r.date_clean')}, r.listing_id{origenes}
+            FROM "{tabla_raw}" r LEFT JOIN dim_listing l ON l.listing_id = r.listing_id
+            WHERE {filtro}""")
+
+    def crear_agregados(self, con_reviews):
+        columnas_listing = self.columnas_tabla('dim_listing')
+        if 'price' in columnas_listing:
+            tipo = 'l.room_type' if 'room_type' in columnas_listing else 'NULL'
+            self.conn.execute(f"""CREATE TABLE agg_precio_barrio AS
+                SELECT n.neighbourhood_key, n.neighbourhood, {tipo} AS room_type,
+                       COUNT(*) AS listings, AVG(l.price) AS precio_promedio,
+                       MIN(l.price) AS precio_minimo, MAX(l.price) AS precio_maximo
+                FROM dim_listing l JOIN dim_neighbourhood n ON n.neighbourhood_key = l.neighbourhood_key
+                WHERE l.price > 0
+                GROUP BY n.neighbourhood_key, {tipo}""")
+
+        if con_reviews:
+            sentimiento = ('AVG(f.sentiment_score)' if 'sentiment_score' in self.columnas_tabla('fact_reviews')
+                           else 'NULL')
+            self.conn.execute(f"""CREATE TABLE agg_reviews_mes AS
+                SELECT d.año, d.mes, COUNT(*) AS reviews, COUNT(DISTINCT f.listing_id) AS listings,
+                       {sentimiento} AS sentimiento_promedio
+                FROM fact_reviews f JOIN dim_date d ON d.date_key = f.date_key
+                GROUP BY d.año, d.mes ORDER BY d.año, d.mes""")
+
+    def crear_indices(self):
+        # Después de la carga: índices de FK y cubrientes para los joins y filtros por listing/fecha
+        indices = [
+            ('dim_listing', ['neighbourhood_key', 'price']),
+            ('dim_listing', ['host_key']),
+            ('fact_reviews', ['listing_key', 'date_key']),
+            ('fact_reviews', ['listing_id', 'date_key', 'sentiment_score']),
+            ('fact_reviews', ['date_key', 'listing_key']),
+            ('fact_calendar', ['listing_key', 'date_key', 'available', 'price']),
+            ('fact_calendar', ['date_key', 'listing_id', 'available', 'price'])
+        ]
+        for tabla, columnas in indices:
+            if not self.existe_tabla(tabla):
+                continue
+            existentes = self.columnas_tabla(tabla)
+            columnas = [col for col in columnas if col in existentes]
+            nombre = f"idx_{tabla}_{'_'.join(columnas)}"
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" ({", ".join(columnas)})')
+        self.conn.execute("ANALYZE")
+
+    def construir(self):
+        if not self.existe_tabla('raw_listings_transformado'):
+            self.logs.warning("No hay raw_listings_transformado, no se construye el modelo dimensional")
+            return []
+
+        # Con journal_mode=OFF el ROLLBACK no restaura nada: se necesita un journal real para la transacción
+        if self.conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'off':
+            self.conn.execute("PRAGMA journal_mode=MEMORY")
+
+        self.conn.execute("BEGIN")
+        try:
+            self.eliminar_modelo()
+            con_fechas = self.crear_dim_date()
+            self.crear_dim_neighbourhood()
+            con_host = self.crear_dim_host()
+            self.crear_dim_listing(con_host)
+
+            con_reviews = con_fechas and self.existe_tabla('raw_reviews_transformado')
+            if con_reviews:
+                self.crear_fact('fact_reviews', 'raw_reviews_transformado', COLUMNAS_FACT_REVIEWS, 'review_id')
+            if con_fechas and self.existe_tabla('raw_calendar_transformado'):
+                self.crear_fact('fact_calendar', 'raw_calendar_transformado', COLUMNAS_FACT_CALENDAR)
+
+            self.crear_agregados(con_reviews)
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        self.crear_indices()
+        return [tabla for tabla in reversed(TABLAS_MODELO) if self.existe_tabla(tabla)]
@@ -0,0 +1,307 @@
+import numpy as np
+import pandas as pd
+
+# Cuantiles que se reportan por columna numérica/fecha
+CUANTILES_REPORTE = [0.01, 0.25, 0.5, 0.75, 0.99]
+
+# Tipos inferidos de columnas object que value_counts puede contar sin convertir a texto
+TIPOS_CONTABLES = ('string', 'integer', 'floating', 'mixed-integer-float', 'boolean')
+
+
+def hashes_columna(serie):
+    # Hash de 64 bits vectorizado; listas y objetos no hasheables (ObjectId, dicts) se hashean por su texto
+    if serie.dtype == object:
+        no_nulos = serie.dropna()
+        if len(no_nulos) and isinstance(no_nulos.iloc[0], (list, tuple)):
+            serie = no_nulos.str.join('\x1f')
+    try:
+        return pd.util.hash_pandas_object(serie, index=False).to_numpy()
+    except TypeError:
+        return pd.util.hash_pandas_object(serie.astype(str), index=False).to_numpy()
+
+
+# Conteo aproximado de distintos: 2^precision registros de 1 byte, error típico 1.04/sqrt(2^precision)
+class HyperLogLog:
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registros = np.zeros(1 << precision, dtype=np.uint8)
+
+    def agregar(self, hashes):
+        if not len(hashes):
+            return
+        # Los primeros bits eligen el registro; de los 32 siguientes se toma la posición del primer 1
+        indices = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        resto = ((hashes >> np.uint64(32 - self.precision)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        rango = (33 - np.frexp(resto)[1]).astype(np.uint8)
+        np.maximum.at(self.registros, indices, rango)
+
+    def combinar(self, otro):
+        np.maximum(self.registros, otro.registros, out=self.registros)
+
+    def estimar(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimacion = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype(np.int64)))
+        ceros = int(np.count_nonzero(self.registros == 0))
+        # Rango bajo: conteo lineal sobre los registros vacíos
+        if estimacion <= 2.5 * m and ceros:
+            estimacion = m * np.log(m / ceros)
+        return int(round(estimacion))
+
+
+# Sketch KLL de cuantiles: niveles de compactadores donde cada elemento del nivel h pesa 2^h.
+# Al llenarse, un nivel se ordena y sube la mitad de sus elementos (pares o impares al azar)
+class SketchCuantiles:
+
+    def __init__(self, k=200, semilla=0):
+        self.k = k
+        self.rng = np.random.default_rng(semilla)
+        self.niveles = []
+        self.total = 0
+
+    def capacidad(self, nivel):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.niveles) - nivel - 1))))
+
+    def agregar(self, valores):
+        if not len(valores):
+            return
+        if not self.niveles:
+            self.niveles.append(np.empty(0, dtype=np.float64))
+        self.niveles[0] = np.concatenate([self.niveles[0], np.asarray(valores, dtype=np.float64)])
+        self.total += len(valores)
+        self.compactar()
+
+    def compactar(self):
+        nivel = 0
+        while nivel < len(self.niveles):
+            if len(self.niveles[nivel]) > self.capacidad(nivel):
+                datos = np.sort(self.niveles[nivel])
+                # Con cantidad impar, el último elemento se queda en el nivel
+                resto = datos[len(datos) - len(datos) % 2:]
+                promovidos = datos[self.rng.integers(2):len(datos) - len(datos) % 2:2]
+                self.niveles[nivel] = resto
+                if nivel + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0, dtype=np.float64))
+                self.niveles[nivel + 1] = np.concatenate([self.niveles[nivel + 1], promovidos])
+            nivel += 1
+
+    def combinar(self, otro):
+        for nivel, datos in enumerate(otro.niveles):
+            if nivel == len(self.niveles):
+                self.niveles.append(np.empty(0, dtype=np.float64))
+            self.niveles[nivel] = np.concatenate([self.niveles[nivel], datos])
+        self.total += otro.total
+        self.compactar()
+
+    def cuantiles(self, probabilidades):
+        if not self.total:
+            return [None] * len(probabilidades)
+        valores = np.concatenate(self.niveles)
+        pesos = np.concatenate([np.full(len(datos), 2.0 ** nivel) for nivel, datos in enumerate(self.niveles)])
+        orden = np.argsort(valores, kind='stable')
+        acumulado = np.cumsum(pesos[orden])
+        posiciones = np.searchsorted(acumulado, np.asarray(probabilidades) * acumulado[-1], side='left')
+        return valores[orden][np.minimum(posiciones, len(valores) - 1)].tolist()
+
+
+# Resumen de frecuencias Misra-Gries: conserva a lo sumo 'capacidad' valores; los conteos son cotas
+# inferiores y 'error' acota lo que se pudo descontar a cada uno. Dos resúmenes se combinan sumando
+class TopK:
+
+    def __init__(self, k=10, capacidad=None):
+        self.k = k
+        # Con la capacidad por defecto, columnas de hasta ~1000 valores distintos (fechas de un año,
+        # barrios) se cuentan de forma exacta
+        self.capacidad = capacidad or max(1000, 100 * k)
+        self.conteos = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def recortar(self, conteos):
+        if len(conteos) <= self.capacidad:
+            return conteos
+        conteos = conteos.sort_values(ascending=False, kind='stable')
+        corte = conteos.iloc[self.capacidad]
+        self.error += int(corte)
+        conteos = conteos.iloc[:self.capacidad] - corte
+        return conteos[conteos > 0]
+
+    def agregar(self, serie):
+        # value_counts es exacto dentro del chunk; solo se resumen los conteos. En categóricas incluye las
+        # categorías sin uso con conteo 0, que no deben ocupar lugares del top-k
+        conteos = serie.value_counts(dropna=True)
+        self.combinar_conteos(conteos[conteos > 0])
+
+    def combinar_conteos(self, conteos):
+        conteos = self.recortar(conteos.astype(np.int64))
+        if len(self.conteos):
+            conteos = self.conteos.add(conteos, fill_value=0).astype(np.int64)
+        self.conteos = self.recortar(conteos)
+
+    def combinar(self, otro):
+        self.error += otro.error
+        self.combinar_conteos(otro.conteos)
+
+    def resultado(self):
+        mayores = self.conteos.sort_values(ascending=False, kind='stable').head(self.k)
+        return [{'valor': valor_json(valor), 'conteo': int(conteo)} for valor, conteo in mayores.items()]
+
+
+def valor_json(valor):
+    if isinstance(valor, (np.integer, np.floating, np.bool_)):
+        return valor.item()
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if isinstance(valor, (str, int, float, bool)) or valor is None:
+        return valor
+    return str(valor)
+
+
+# Perfil de una columna en una sola pasada por chunk: nulos, distintos (HLL), min/max, cuantiles (KLL)
+# y valores más frecuentes. Todos los componentes son combinables entre chunks o particiones
+class PerfilColumna:
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.filas = 0
+        self.nulos = 0
+        self.tipo = None
+        self.minimo = None
+        self.maximo = None
+        self.distintos = HyperLogLog(self.config.get('precision_hll', 12))
+        self.cuantiles = None
+        self.frecuentes = None
+
+    def clase_tipo(self, serie):
+        if pd.api.types.is_bool_dtype(serie):
+            return 'booleano'
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return 'fecha'
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return 'categoria'
+        if pd.api.types.is_numeric_dtype(serie):
+            return 'entero' if pd.api.types.is_integer_dtype(serie) else 'decimal'
+        return 'objeto'
+
+    def agregar(self, serie):
+        self.filas += len(serie)
+        self.tipo = self.tipo or self.clase_tipo(serie)
+
+        mascara_nulos = serie.isna().to_numpy()
+        self.nulos += int(mascara_nulos.sum())
+        no_nulos = serie[~mascara_nulos]
+        if not len(no_nulos):
+            return
+
+        self.distintos.agregar(hashes_columna(no_nulos))
+
+        if self.tipo in ('entero', 'decimal', 'fecha'):
+            # Fechas como enteros de nanosegundos: el orden y los cuantiles se conservan
+            if self.tipo == 'fecha':
+                valores = no_nulos.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            else:
+                valores = no_nulos.to_numpy(dtype=np.float64)
+            self.minimo = valores.min() if self.minimo is None else min(self.minimo, valores.min())
+            self.maximo = valores.max() if self.maximo is None else max(self.maximo, valores.max())
+            if self.cuantiles is None:
+                self.cuantiles = SketchCuantiles(self.config.get('k_cuantiles', 200))
+            self.cuantiles.agregar(valores)
+
+        # Frecuentes: no se calculan para decimales (casi todos distintos) ni para listas
+        if self.tipo == 'decimal' or (self.tipo == 'objeto' and isinstance(no_nulos.iloc[0], (list, tuple))):
+            return
+        if self.frecuentes is None:
+            self.frecuentes = TopK(self.config.get('top_k', 10))
+        # Textos mezclados con dicts u ObjectId (fechas de MongoDB) se cuentan por su texto
+        if self.tipo == 'objeto' and pd.api.types.infer_dtype(no_nulos, skipna=True) not in TIPOS_CONTABLES:
+            no_nulos = no_nulos.astype(str)
+        self.frecuentes.agregar(no_nulos)
+
+    def combinar(self, otro):
+        self.filas += otro.filas
+        self.nulos += otro.nulos
+        self.tipo = self.tipo or otro.tipo
+        self.distintos.combinar(otro.distintos)
+        for atributo, funcion in (('minimo', min), ('maximo', max)):
+            mio, suyo = getattr(self, atributo), getattr(otro, atributo)
+            setattr(self, atributo, suyo if mio is None else mio if suyo is None else funcion(mio, suyo))
+        for atributo in ('cuantiles', 'frecuentes'):
+            if getattr(otro, atributo) is None:
+                continue
+            if getattr(self, atributo) is None:
+                setattr(self, atributo, getattr(otro, atributo))
+            else:
+                getattr(self, atributo).combinar(getattr(otro, atributo))
+
+    def valor_reporte(self, valor):
+        if valor is None:
+            return None
+        if self.tipo == 'fecha':
+            return pd.Timestamp(int(valor)).isoformat()
+        return int(valor) if self.tipo == 'entero' else round(float(valor), 6)
+
+    def resultado(self):
+        resultado = {
+            'tipo': self.tipo,
+            'nulos': self.nulos,
+            'tasa_nulos': round(self.nulos / self.filas, 6) if self.filas else None,
+            'distintos_aprox': min(self.distintos.estimar(), self.filas - self.nulos)
+        }
+        if self.cuantiles is not None:
+            resultado['minimo'] = self.valor_reporte(self.minimo)
+            resultado['maximo'] = self.valor_reporte(self.maximo)
+            resultado['cuantiles_aprox'] = {
+                f"p{int(p * 100)}": self.valor_reporte(valor)
+                for p, valor in zip(CUANTILES_REPORTE, self.cuantiles.cuantiles(CUANTILES_REPORTE))
+            }
+        if self.frecuentes is not None:
+            resultado['top_k'] = self.frecuentes.resultado()
+            resultado['top_k_error_maximo'] = self.frecuentes.error
+        return resultado
+
+
+# Perfil de una tabla: un PerfilColumna por columna. agregar() recibe chunks (modo pipeline o
+# particiones) y combinar() une perfiles calculados por separado
+class PerfilCalidad:
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.columnas = {}
+        self.filas = 0
+
+    def agregar(self, df):
+        self.filas += len(df)
+        for col in df.columns:
+            if col not in self.columnas:
+                perfil = PerfilColumna(self.config)
+                # Columna nueva en un chunk posterior: las filas anteriores cuentan como nulas
+                perfil.filas = perfil.nulos = self.filas - len(df)
+                self.columnas[col] = perfil
+            self.columnas[col].agregar(df[col])
+        # Columnas ausentes en este chunk: sus filas cuentan como nulas
+        for col, perfil in self.columnas.items():
+            if col not in df.columns:
+                perfil.filas += len(df)
+                perfil.nulos += len(df)
+
+    def agregar_por_chunks(self, df, filas_por_chunk=None):
+        filas_por_chunk = filas_por_chunk or self.config.get('filas_por_chunk', 250000)
+        for inicio in range(0, len(df), filas_por_chunk):
+            self.agregar(df.iloc[inicio:inicio + filas_por_chunk])
+
+    def combinar(self, otro):
+        for col, perfil in otro.columnas.items():
+            if col in self.columnas:
+                self.columnas[col].combinar(perfil)
+            else:
+                perfil.filas += self.filas
+                perfil.nulos += self.filas
+                self.columnas[col] = perfil
+        for col, perfil in self.columnas.items():
+            if col not in otro.columnas:
+                perfil.filas += otro.filas
+                perfil.nulos += otro.filas
+        self.filas += otro.filas
+
+    def resultado(self):
+        return {col: perfil.resultado() for col, perfil in self.columnas.items()}
@@ -0,0 +1,113 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Columnas de partición (estilo Hive: año=2019/mes=7/) por colección
+PARTICIONES_PARQUET = {
+    'reviews': ['año', 'mes'],
+    'calendar': ['año', 'mes']
+}
+
+TIPOS_PARTICION = {'año': 'int16', 'mes': 'int8'}
+
+COMPRESIONES_PARQUET = ('snappy', 'zstd', 'gzip', 'none')
+
+
+def tipo_arrow(serie, nombre_columna):
+    # pyarrow es opcional: solo se importa si se pide la salida Parquet
+    import pyarrow as pa
+
+    if nombre_columna in TIPOS_PARTICION:
+        return pa.from_numpy_dtype(np.dtype(TIPOS_PARTICION[nombre_columna]))
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Diccionario explícito: los lectores lo cargan como category sin reconstruirlo
+        return pa.dictionary(pa.int32(), pa.string())
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return pa.timestamp('ns')
+    if pd.api.types.is_bool_dtype(serie):
+        return pa.bool_()
+    if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_numeric_dtype(serie):
+        return pa.from_numpy_dtype(serie.dtype.numpy_dtype)
+    if pd.api.types.is_numeric_dtype(serie):
+        return pa.from_numpy_dtype(serie.dtype)
+
+    # object: listas (amenities_procesados) o texto; lo demás (ObjectId, dicts) se guarda como texto
+    no_nulos = serie.dropna()
+    if len(no_nulos) and isinstance(no_nulos.iloc[0], (list, tuple, np.ndarray)):
+        return pa.list_(pa.string())
+    return pa.string()
+
+
+def arreglo_arrow(serie, tipo):
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(tipo):
+        codigos = serie.cat.codes.to_numpy().astype(np.int32)
+        categorias = pa.array([str(categoria) for categoria in serie.cat.categories], type=pa.string())
+        return pa.DictionaryArray.from_arrays(pa.array(codigos, mask=codigos < 0), categorias)
+
+    if pa.types.is_list(tipo):
+        valores = [[str(item) for item in valor] if isinstance(valor, (list, tuple, np.ndarray)) else None
+                   for valor in serie.tolist()]
+        return pa.array(valores, type=tipo)
+
+    if pa.types.is_string(tipo):
+        if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+            return pa.array(serie, type=tipo, from_pandas=True)
+        valores = []
+        for valor in serie.astype(object).tolist():
+            if isinstance(valor, str):
+                valores.append(valor)
+            elif valor is None or (not isinstance(valor, (list, dict, tuple, np.ndarray)) and pd.isna(valor)):
+                valores.append(None)
+            else:
+                valores.append(str(valor))
+        return pa.array(valores, type=tipo)
+
+    return pa.array(serie, type=tipo, from_pandas=True)
+
+
+def lotes_arrow(df, columnas, esquema, filas_por_grupo):
+    # Generador: el DataFrame se convierte a Arrow por tramos, nunca completo
+    import pyarrow as pa
+
+    for inicio in range(0, len(df), filas_por_grupo):
+        lote = df.iloc[inicio:inicio + filas_por_grupo]
+        arreglos = [arreglo_arrow(lote[col], esquema.field(col).type) for col in columnas]
+        yield pa.RecordBatch.from_arrays(arreglos, schema=esquema)
+
+
+def escribir_parquet(nombre, df, ruta_parquet, config, sufijo=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    compresion = config.get('parquet_compresion', 'zstd')
+    if compresion not in COMPRESIONES_PARQUET:
+        raise ValueError(f"Compresión Parquet no soportada: {compresion}")
+    filas_por_grupo = config.get('parquet_filas_por_grupo', 100000)
+
+    columnas = [col for col in df.columns if col != '_id']
+    esquema = pa.schema([pa.field(col, tipo_arrow(df[col], col)) for col in columnas])
+
+    particiones = [col for col in PARTICIONES_PARQUET.get(nombre, []) if col in columnas]
+    directorio = os.path.join(ruta_parquet, nombre)
+
+    # Carga completa: se reemplaza el dataset; con sufijo (incremental) se agregan archivos nuevos
+    if sufijo is None and os.path.exists(directorio):
+        shutil.rmtree(directorio)
+
+    formato = ds.ParquetFileFormat()
+    ds.write_dataset(
+        lotes_arrow(df, columnas, esquema, filas_por_grupo),
+        directorio,
+        schema=esquema,
+        format=formato,
+        file_options=formato.make_write_options(compression=compresion),
+        partitioning=particiones or None,
+        partitioning_flavor='hive' if particiones else None,
+        basename_template=f"{nombre}{'_' + sufijo if sufijo else ''}-{{i}}.parquet",
+        max_rows_per_group=filas_por_grupo,
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    return directorio
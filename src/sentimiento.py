@@ -0,0 +1,92 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Léxicos por defecto; las repeticiones cuentan doble, igual que en la versión original
+PALABRAS_POSITIVAS = ['good', 'great', 'excellent', 'amazing', 'perfect', 'wonderful',
+                      'bueno', 'excelente', 'perfecto', 'maravilloso']
+PALABRAS_NEGATIVAS = ['bad', 'terrible', 'awful', 'poor', 'horrible',
+                      'malo', 'terrible', 'horrible', 'pésimo']
+
+BACKENDS_SENTIMIENTO = ('regex', 'aho_corasick')
+
+
+# Puntaje = (palabras positivas presentes) - (palabras negativas presentes), buscando todas
+# las palabras del léxico en una sola pasada sobre el texto en minúsculas
+class PuntuadorSentimiento:
+
+    def __init__(self, positivas=None, negativas=None, backend='regex', tamano_chunk=100000):
+        positivas = [p.lower() for p in (positivas if positivas is not None else PALABRAS_POSITIVAS)]
+        negativas = [n.lower() for n in (negativas if negativas is not None else PALABRAS_NEGATIVAS)]
+
+        if backend not in BACKENDS_SENTIMIENTO:
+            raise ValueError(f"Backend de sentimiento no soportado: {backend}")
+
+        self.backend = backend
+        self.tamano_chunk = tamano_chunk
+
+        # Peso neto de cada palabra distinta
+        self.pesos = {}
+        for palabra in positivas:
+            self.pesos[palabra] = self.pesos.get(palabra, 0) + 1
+        for palabra in negativas:
+            self.pesos[palabra] = self.pesos.get(palabra, 0) - 1
+        palabras = sorted(self.pesos, key=len, reverse=True)
+
+        # Cierre por subcadena: si aparece 'perfecto' también aparece 'perfect'
+        self.cierre = pd.DataFrame(
+            [(palabra, implicada) for palabra in palabras for implicada in palabras if implicada in palabra],
+            columns=['palabra', 'implicada']
+        )
+
+        # Lookahead para capturar coincidencias solapadas; alternativas más largas primero
+        self.patron = None
+        if palabras:
+            self.patron = re.compile('(?=(' + '|'.join(re.escape(p) for p in palabras) + '))')
+
+        self.automata = None
+        if backend == 'aho_corasick' and palabras:
+            import ahocorasick
+            self.automata = ahocorasick.Automaton()
+            for palabra in palabras:
+                self.automata.add_word(palabra, palabra)
+            self.automata.make_automaton()
+
+    def puntuar_chunk_regex(self, minusculas):
+        encontrados = minusculas.str.extractall(self.patron)[0]
+        if encontrados.empty:
+            return np.zeros(len(minusculas), dtype=np.int64)
+
+        pares = pd.DataFrame({
+            'fila': encontrados.index.get_level_values(0),
+            'palabra': encontrados.to_numpy()
+        }).drop_duplicates()
+        pares = pares.merge(self.cierre, on='palabra')[['fila', 'implicada']].drop_duplicates()
+
+        puntaje = pares['implicada'].map(self.pesos).groupby(pares['fila']).sum()
+        resultado = np.zeros(len(minusculas), dtype=np.int64)
+        resultado[puntaje.index.to_numpy()] = puntaje.to_numpy()
+        return resultado
+
+    def puntuar_chunk_aho_corasick(self, minusculas):
+        # El autómata ya reporta coincidencias solapadas, no hace falta el cierre
+        resultado = np.zeros(len(minusculas), dtype=np.int64)
+        for i, texto in enumerate(minusculas.tolist()):
+            if isinstance(texto, str):
+                presentes = {palabra for _, palabra in self.automata.iter(texto)}
+                resultado[i] = sum(self.pesos[palabra] for palabra in presentes)
+        return resultado
+
+    def puntuar(self, serie):
+        if self.patron is None or serie.empty:
+            return pd.Series(0, index=serie.index, dtype='int64')
+
+        partes = []
+        for inicio in range(0, len(serie), self.tamano_chunk):
+            minusculas = serie.iloc[inicio:inicio + self.tamano_chunk].str.lower().reset_index(drop=True)
+            if self.automata is not None:
+                partes.append(self.puntuar_chunk_aho_corasick(minusculas))
+            else:
+                partes.append(self.puntuar_chunk_regex(minusculas))
+
+        return pd.Series(np.concatenate(partes), index=serie.index, dtype='int64')
@@ -2,14 +2,67 @@ import pandas as pd
 import numpy as np
 import re
 from datetime import datetime
-import ast
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from extraccion import Logs
+from amenities import MotorAmenities, AMENITIES_COMUNES
+from sentimiento import PuntuadorSentimiento
+from metricas import Metricas
+from perfil_calidad import PerfilCalidad
+from geoespacial import geohash_vectorizado, celda_grid, PRECISION_GEOHASH, TAMANO_CELDA_GRADOS
+
+# Vocabulario que se interpreta como verdadero en campos booleanos de texto
+VALORES_VERDADEROS = {'t', 'true', '1', 'yes', 'si'}
+
+# Formato con el que vienen las fechas de Inside Airbnb; el resto se resuelve valor a valor
+FORMATO_FECHA = '%Y-%m-%d'
+
+# Límites superiores (inclusivos) de cada categoría de precio; la última categoría no tiene tope
+LIMITES_PRECIO = [500, 1000, 2000, 5000]
+ETIQUETAS_PRECIO = ['Económico', 'Medio', 'Medio-Alto', 'Alto', 'Premium']
+
+# Método de Transformacion que procesa cada colección
+METODOS_TRANSFORMACION = {
+    'listings': 'transformar_listings',
+    'reviews': 'transformar_reviews',
+    'calendar': 'transformar_calendar'
+}
+
+# Texto de baja cardinalidad que se guarda como category al final de cada transformación
+COLUMNAS_CATEGORICAS = [
+    'room_type', 'room_type_normalizado', 'property_type', 'property_type_normalizado',
+    'neighbourhood_cleansed', 'neighbourhood_cleansed_clean', 'categoria_precio', 'nombre_mes'
+]
+
+# Sufijos de columnas derivadas que reemplazan a su columna cruda
+SUFIJOS_DERIVADOS = ('_clean', '_normalizado', '_bin')
+
+# Columnas que nunca se eliminan aunque tengan una versión limpia (claves de carga)
+COLUMNAS_PROTEGIDAS = {'id', 'listing_id'}
+
+# Columnas críticas y clave de duplicados por colección para el modo pipeline
+CLAVES_DEDUPLICACION = {
+    'listings': (['id', 'latitude', 'longitude'], 'id'),
+    'reviews': (['id', 'listing_id'], 'id')
+}
+
+
+def transformar_particion(nombre, df, config):
+    # Función de módulo para poder enviarla a los procesos del pool
+    transformador = Transformacion(config)
+    return getattr(transformador, METODOS_TRANSFORMACION[nombre])(df)
+
 
 class Transformacion:
-    def __init__(self):
+    def __init__(self, config=None, metricas=None):
+        self.config = config or {}
         self.logs = Logs("TRANSFORMACION")
+        self.metricas = metricas or Metricas()
         self.dataframes_transformados = {}
+        self.optimizacion_memoria = {}
+        # Perfiles de calidad acumulados chunk a chunk (modo pipeline)
+        self.perfiles = {}
+        self.motor_amenities = None
         
     def limpiar_precio(self, precio_str):
         if pd.isna(precio_str) or precio_str == '':
@@ -22,6 +75,53 @@ class Transformacion:
         except (ValueError, TypeError):
             return 0.0
     
+    def limpiar_precios(self, serie):
+        # Columnas ya numéricas: solo nulos -> 0
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            return serie.astype('float64').fillna(0.0)
+        
+        nulos = serie.isna() | (serie.astype(object) == '')
+        texto = serie.astype(str).str.replace(r'[$,]', '', regex=True)
+        precios = pd.to_numeric(texto, errors='coerce').astype('float64')
+        
+        # Lo que to_numeric no reconoce se resuelve con la regla escalar, una vez por valor distinto
+        pendientes = precios.isna() & ~nulos
+        if pendientes.any():
+            valores_pendientes = serie[pendientes]
+            resueltos = {valor: self.limpiar_precio(valor) for valor in valores_pendientes.astype(str).unique()}
+            precios[pendientes] = valores_pendientes.astype(str).map(resueltos)
+        
+        precios[nulos] = 0.0
+        return precios
+    
+    def es_verdadero(self, valor):
+        # Solo bool de Python, como la regla original (np.bool_ no cuenta)
+        if isinstance(valor, bool):
+            return 1 if valor else 0
+        if isinstance(valor, str):
+            return 1 if valor.lower().strip() in VALORES_VERDADEROS else 0
+        return 0
+    
+    def normalizar_booleano(self, serie):
+        # La regla se evalúa solo sobre los valores únicos y se propaga con los códigos de factorize
+        codigos, unicos = pd.factorize(serie)
+        tabla = [self.es_verdadero(valor) for valor in unicos]
+        
+        # factorize une valores iguales en Python (True == 1 == 1.0, False == 0) y la regla depende del tipo:
+        # en columnas object con varios tipos la clave combina el código del valor con el de su tipo
+        if serie.dtype == object and len(unicos):
+            codigos_tipo, tipos = pd.factorize(serie.map(type))
+            if len(tipos) > 1:
+                codigos, _ = pd.factorize(codigos.astype(np.int64) * len(tipos) + codigos_tipo)
+                # Los códigos se numeran por primera aparición: el primer valor de cada uno lo representa
+                primeras = pd.Series(codigos).drop_duplicates().index
+                valores = serie.to_numpy()
+                tabla = [self.es_verdadero(valores[i]) for i in primeras]
+        
+        # El código -1 (nulos) apunta a la última posición de la tabla, que vale 0
+        tabla = np.array(tabla + [0], dtype='int8')
+        return pd.Series(tabla[codigos], index=serie.index, dtype='int8')
+    
     def normalizar_fecha(self, fecha_str):
         if pd.isna(fecha_str):
             return None
@@ -41,11 +141,81 @@ class Transformacion:
         except:
             return None
     
-    def derivar_variables_tiempo(self, df, columna_fecha):
-        df_temp = df.copy()
+    def resolver_fecha(self, valor):
+        # Regla escalar para un valor distinto: mismo criterio que normalizar_fecha pero devolviendo Timestamp
+        try:
+            if isinstance(valor, str):
+                fecha = pd.Timestamp(pd.to_datetime(valor))
+            elif isinstance(valor, np.datetime64) or hasattr(valor, 'strftime'):
+                fecha = pd.Timestamp(valor)
+            else:
+                return pd.NaT
+            
+            if fecha.tzinfo is not None:
+                fecha = fecha.tz_localize(None)
+            return fecha.normalize()
+        except Exception:
+            return pd.NaT
+    
+    def desenvolver_fecha(self, valor):
+        if isinstance(valor, dict):
+            valor = valor.get('$date')
+            # Formas anidadas ({'$numberLong': ...}) no se interpretan, igual que antes
+            return None if isinstance(valor, dict) else valor
+        return valor
+    
+    def normalizar_fechas(self, serie):
+        # Columnas ya datetime64: solo truncar al día
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            if getattr(serie.dt, 'tz', None) is not None:
+                serie = serie.dt.tz_localize(None)
+            return serie.dt.normalize()
+        
+        # Los valores distintos son pocos (fechas) frente a las filas: se resuelven una vez cada uno
+        try:
+            codigos, unicos = pd.factorize(serie)
+        except TypeError:
+            # Diccionarios {'$date': ...} de MongoDB no son hashables: se desenvuelven antes
+            serie = serie.map(self.desenvolver_fecha)
+            codigos, unicos = pd.factorize(serie)
+        
+        unicos = pd.Series(unicos, dtype=object)
+        fechas = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+        
+        # Ruta rápida: textos con formato explícito
+        es_texto = unicos.map(lambda v: isinstance(v, str))
+        if es_texto.any():
+            fechas[es_texto] = pd.to_datetime(unicos[es_texto], format=FORMATO_FECHA, errors='coerce')
+        
+        # Resto (otros formatos, datetime, zonas horarias) con la regla escalar, cacheada por valor distinto
+        pendientes = fechas.isna()
+        if pendientes.any():
+            fechas[pendientes] = unicos[pendientes].map(self.resolver_fecha).astype('datetime64[ns]')
+        
+        # El código -1 (nulos) apunta a la última posición, que es NaT
+        tabla = np.append(fechas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+        return pd.Series(tabla[codigos], index=serie.index, dtype='datetime64[ns]')
+    
+    def columna_origen(self, df, calculada, cruda):
+        # Con pushdown, MongoDB ya entrega la columna calculada: se retira para recalcularla por la ruta
+        # rápida al final del DataFrame, así el orden de columnas es el mismo que sin pushdown
+        if calculada in df.columns:
+            return df.pop(calculada)
+        return df[cruda]
+    
+    def filtrar_nulos(self, df, columnas):
+        # Igual que dropna(subset=columnas), pero con take: el resultado es una copia propia que no queda
+        # marcada como slice del DataFrame del llamador, así se le pueden agregar columnas directamente
+        mascara = df[columnas].notna().all(axis=1).to_numpy()
+        return df.take(np.flatnonzero(mascara))
+    
+    def derivar_variables_tiempo(self, df, columna_fecha, copiar=True):
+        # copiar=False cuando el llamador ya es dueño del DataFrame: las columnas se agregan en el mismo
+        df_temp = df.copy() if copiar else df
         
-        # Convertir a datetime si no lo está
-        df_temp[columna_fecha] = pd.to_datetime(df_temp[columna_fecha], errors='coerce')
+        # Convertir a datetime si no lo está (normalizar_fechas ya entrega datetime64)
+        if not pd.api.types.is_datetime64_any_dtype(df_temp[columna_fecha]):
+            df_temp[columna_fecha] = pd.to_datetime(df_temp[columna_fecha], errors='coerce')
         
         # Derivar variables
         df_temp['año'] = df_temp[columna_fecha].dt.year
@@ -57,44 +227,60 @@ class Transformacion:
         
         return df_temp
     
-    def categorizar_precios(self, df, columna_precio='price_clean'):
-        df_temp = df.copy()
+    def categorizar_precio_individual(self, precio, limites, etiquetas):
+        try:
+            precio_num = float(precio) if pd.notna(precio) else 0
+            for limite, etiqueta in zip(limites, etiquetas):
+                if precio_num <= limite:
+                    return etiqueta
+            return etiquetas[-1]
+        except (ValueError, TypeError):
+            return 'No especificado'
+    
+    def categorizar_precios(self, df, columna_precio='price_clean', copiar=True):
+        df_temp = df.copy() if copiar else df
+        
+        limites = self.config.get('limites_precio', LIMITES_PRECIO)
+        etiquetas = self.config.get('etiquetas_precio', ETIQUETAS_PRECIO)
+        categorias = list(etiquetas) + ['No especificado']
         
         try:
             # Verificar que la columna existe
             if columna_precio not in df_temp.columns:
                 self.logs.warning(f"Columna {columna_precio} no existe, creando categoría por defecto")
-                df_temp['categoria_precio'] = 'No especificado'
+                df_temp['categoria_precio'] = pd.Categorical(['No especificado'] * len(df_temp), categories=categorias)
                 return df_temp
             
-            # Función simple para categorizar precios
-            def categorizar_precio_individual(precio):
-                try:
-                    precio_num = float(precio) if pd.notna(precio) else 0
-                    if precio_num <= 500:
-                        return 'Económico'
-                    elif precio_num <= 1000:
-                        return 'Medio'
-                    elif precio_num <= 2000:
-                        return 'Medio-Alto'
-                    elif precio_num <= 5000:
-                        return 'Alto'
-                    else:
-                        return 'Premium'
-                except:
-                    return 'No especificado'
+            if len(etiquetas) != len(limites) + 1:
+                raise ValueError(f"Se esperaban {len(limites) + 1} etiquetas de precio y hay {len(etiquetas)}")
+            
+            # Nulos cuentan como 0
+            precios = pd.to_numeric(df_temp[columna_precio], errors='coerce')
+            no_numericos = precios.isna() & df_temp[columna_precio].notna()
+            
+            # include_lowest: -inf cae en el primer rango, como con la regla escalar (-inf <= limite)
+            bordes = [-np.inf] + [float(limite) for limite in limites] + [np.inf]
+            categoria = pd.cut(precios.fillna(0), bins=bordes, labels=etiquetas, right=True, include_lowest=True)
+            categoria = categoria.cat.set_categories(categorias)
             
-            df_temp['categoria_precio'] = df_temp[columna_precio].apply(categorizar_precio_individual)
+            # Lo que to_numeric no reconoce se resuelve con la regla escalar, una vez por valor distinto
+            if no_numericos.any():
+                valores = df_temp.loc[no_numericos, columna_precio]
+                resueltos = {valor: self.categorizar_precio_individual(valor, limites, etiquetas)
+                             for valor in valores.unique()}
+                categoria[no_numericos] = valores.map(resueltos)
+            
+            df_temp['categoria_precio'] = categoria
             self.logs.info("Precios categorizados exitosamente")
             
         except Exception as e:
             self.logs.warning(f"Error categorizando precios: {str(e)}")
-            df_temp['categoria_precio'] = 'No especificado'
+            df_temp['categoria_precio'] = pd.Categorical(['No especificado'] * len(df_temp), categories=categorias)
         
         return df_temp
     
-    def expandir_amenities(self, df, columna_amenities='amenities'):
-        df_temp = df.copy()
+    def expandir_amenities(self, df, columna_amenities='amenities', copiar=True):
+        df_temp = df.copy() if copiar else df
         
         # Verificar si la columna existe
         if columna_amenities not in df_temp.columns:
@@ -103,81 +289,28 @@ class Transformacion:
         
         self.logs.info(f"Procesando columna {columna_amenities}")
         
-        # Procesar amenities de manera más segura
-        amenities_procesados = []
-        
-        # Iterar por índices en lugar de valores directos
-        for idx in df_temp.index:
-            try:
-                amenities = df_temp.loc[idx, columna_amenities]
-                
-                # Verificar si es nulo o vacío de manera segura
-                if amenities is None or pd.isna(amenities):
-                    amenities_procesados.append([])
-                    continue
-                
-                # Convertir a string para verificar si está vacío
-                amenities_str = str(amenities).strip()
-                if amenities_str == '' or amenities_str.lower() == 'nan':
-                    amenities_procesados.append([])
-                    continue
-                    
-                # Procesar según el tipo
-                if isinstance(amenities, str) and amenities_str.startswith('['):
-                    try:
-                        amenities_list = ast.literal_eval(amenities_str)
-                    except:
-                        amenities_list = []
-                elif isinstance(amenities, list):
-                    amenities_list = amenities
-                elif isinstance(amenities, str):
-                    # Si es un string simple, convertir a lista
-                    amenities_list = [amenities_str]
-                else:
-                    amenities_list = []
-                    
-                # Limpiar nombres de amenities
-                amenities_clean = []
-                for a in amenities_list:
-                    if a and str(a).strip():
-                        clean_amenity = re.sub(r'[^a-zA-Z0-9\s]', '', str(a)).strip()
-                        if clean_amenity:
-                            amenities_clean.append(clean_amenity)
-                
-                amenities_procesados.append(amenities_clean)
-                
-            except Exception as e:
-                self.logs.warning(f"Error procesando amenities en fila {idx}: {str(e)}")
-                amenities_procesados.append([])
+        # Parseo columnar: vocabulario de enteros + matriz CSR listing x amenity
+        motor = MotorAmenities().procesar(df_temp[columna_amenities])
+        self.motor_amenities = motor
+        if motor.errores:
+            self.logs.warning(f"{motor.errores} filas con amenities mal formados, se dejan vacías")
+        self.logs.info(f"Vocabulario de amenities: {len(motor.vocabulario)} valores distintos, "
+                       f"{len(motor.indices)} asignaciones")
         
         # Agregar la columna procesada
-        df_temp['amenities_procesados'] = amenities_procesados
+        df_temp['amenities_procesados'] = motor.listas()
         
-        # Crear columnas binarias para amenities más comunes
-        amenities_comunes = ['WiFi', 'Kitchen', 'Air conditioning', 'Heating', 
-                           'TV', 'Washer', 'Dryer', 'Pool', 'Gym', 'Parking']
+        # Columnas binarias derivadas de la matriz: lista fija (por subcadena) o top-N por frecuencia
+        top_amenities = self.config.get('top_amenities')
+        if top_amenities:
+            banderas = motor.banderas_exactas(motor.top_n(top_amenities))
+        else:
+            banderas = motor.banderas_subcadena(AMENITIES_COMUNES)
         
-        for amenity in amenities_comunes:
+        for amenity, valores in banderas.items():
             col_name = f'amenity_{amenity.lower().replace(" ", "_")}'
-            try:
-                # Función segura para verificar amenities
-                def tiene_amenity(amenities_list):
-                    try:
-                        if not amenities_list or not isinstance(amenities_list, list):
-                            return 0
-                        for item in amenities_list:
-                            if item and amenity.lower() in str(item).lower():
-                                return 1
-                        return 0
-                    except:
-                        return 0
-                
-                df_temp[col_name] = df_temp['amenities_procesados'].apply(tiene_amenity)
-                self.logs.info(f"Columna {col_name} creada exitosamente")
-                
-            except Exception as e:
-                self.logs.warning(f"Error creando columna {col_name}: {str(e)}")
-                df_temp[col_name] = 0
+            df_temp[col_name] = valores
+            self.logs.info(f"Columna {col_name} creada exitosamente")
         
         self.logs.info("Expansión de amenities completada")
         return df_temp
@@ -185,135 +318,157 @@ class Transformacion:
     def transformar_listings(self, df_listings):
         self.logs.info("=== Iniciando transformación de LISTINGS ===")
         
-        df = df_listings.copy()
+        # Sin copia inicial: el paso 1 ya entrega un DataFrame nuevo, propio de esta transformación,
+        # y los pasos siguientes agregan columnas sobre él sin tocar el del llamador
+        df = df_listings
         registros_iniciales = len(df)
         self.logs.info(f"Registros iniciales: {registros_iniciales}")
         
         try:
             # 1. Limpieza de valores nulos críticos
-            self.logs.info("Paso 1: Limpieza de valores nulos críticos")
-            df = df.dropna(subset=['id', 'latitude', 'longitude'])
-            self.logs.info(f"Registros después de eliminar nulos críticos: {len(df)}")
+            with self.metricas.medir('transformacion.listings.paso_1', len(df)):
+                self.logs.info("Paso 1: Limpieza de valores nulos críticos")
+                df = self.filtrar_nulos(df, ['id', 'latitude', 'longitude'])
+                self.logs.info(f"Registros después de eliminar nulos críticos: {len(df)}")
             
             # 2. Eliminar duplicados por ID
-            self.logs.info("Paso 2: Eliminación de duplicados")
-            df = df.drop_duplicates(subset=['id'])
-            self.logs.info(f"Registros después de eliminar duplicados: {len(df)}")
+            with self.metricas.medir('transformacion.listings.paso_2', len(df)):
+                self.logs.info("Paso 2: Eliminación de duplicados")
+                df = df.drop_duplicates(subset=['id'])
+                self.logs.info(f"Registros después de eliminar duplicados: {len(df)}")
             
             # 3. Normalización de precios
-            self.logs.info("Paso 3: Normalización de precios")
-            df['price_clean'] = df['price'].apply(self.limpiar_precio)
-            self.logs.info("Precios normalizados")
+            with self.metricas.medir('transformacion.listings.paso_3', len(df)):
+                self.logs.info("Paso 3: Normalización de precios")
+                df['price_clean'] = self.limpiar_precios(self.columna_origen(df, 'price_clean', 'price'))
+                self.logs.info("Precios normalizados")
             
             # 4. Conversión de fechas
-            self.logs.info("Paso 4: Conversión de fechas")
-            fecha_cols = ['host_since', 'calendar_last_scraped', 'last_scraped']
-            for col in fecha_cols:
-                if col in df.columns:
-                    df[f'{col}_clean'] = df[col].apply(self.normalizar_fecha)
-                    self.logs.info(f"Fecha {col} normalizada")
+            with self.metricas.medir('transformacion.listings.paso_4', len(df)):
+                self.logs.info("Paso 4: Conversión de fechas")
+                fecha_cols = ['host_since', 'calendar_last_scraped', 'last_scraped']
+                for col in fecha_cols:
+                    if col in df.columns:
+                        df[f'{col}_clean'] = self.normalizar_fechas(self.columna_origen(df, f'{col}_clean', col))
+                        self.logs.info(f"Fecha {col} normalizada")
             
             # 5. Derivación de variables (categorización de precios)
-            self.logs.info("Paso 5: Categorización de precios")
-            df = self.categorizar_precios(df, 'price_clean')
-            self.logs.info("Precios categorizados")
+            with self.metricas.medir('transformacion.listings.paso_5', len(df)):
+                self.logs.info("Paso 5: Categorización de precios")
+                df = self.categorizar_precios(df, 'price_clean', copiar=False)
+                self.logs.info("Precios categorizados")
             
             # 6. Expansión de amenities (solo si existe la columna)
-            self.logs.info("Paso 6: Expansión de amenities")
-            if 'amenities' in df.columns:
-                df = self.expandir_amenities(df, 'amenities')
-                self.logs.info("Amenities expandidos")
-            else:
-                self.logs.info("Columna amenities no encontrada, saltando expansión")
+            with self.metricas.medir('transformacion.listings.paso_6', len(df)):
+                self.logs.info("Paso 6: Expansión de amenities")
+                if 'amenities' in df.columns:
+                    df = self.expandir_amenities(df, 'amenities', copiar=False)
+                    self.logs.info("Amenities expandidos")
+                else:
+                    self.logs.info("Columna amenities no encontrada, saltando expansión")
             
             # 7. Normalización de campos categóricos
-            self.logs.info("Paso 7: Normalización de campos categóricos")
-            categorical_mappings = {
-                'room_type': {
-                    'Entire home/apt': 'Casa/Apartamento completo',
-                    'Private room': 'Habitación privada',
-                    'Shared room': 'Habitación compartida',
-                    'Hotel room': 'Habitación de hotel'
-                },
-                'property_type': {
-                    'Apartment': 'Apartamento',
-                    'House': 'Casa',
-                    'Condominium': 'Condominio',
-                    'Loft': 'Loft',
-                    'Other': 'Otro'
+            with self.metricas.medir('transformacion.listings.paso_7', len(df)):
+                self.logs.info("Paso 7: Normalización de campos categóricos")
+                categorical_mappings = {
+                    'room_type': {
+                        'Entire home/apt': 'Casa/Apartamento completo',
+                        'Private room': 'Habitación privada',
+                        'Shared room': 'Habitación compartida',
+                        'Hotel room': 'Habitación de hotel'
+                    },
+                    'property_type': {
+                        'Apartment': 'Apartamento',
+                        'House': 'Casa',
+                        'Condominium': 'Condominio',
+                        'Loft': 'Loft',
+                        'Other': 'Otro'
+                    }
                 }
-            }
-            
-            for col, mapping in categorical_mappings.items():
-                if col in df.columns:
-                    try:
-                        def mapear_categoria_seguro(valor):
-                            if pd.isna(valor):
-                                return 'No especificado'
-                            valor_str = str(valor).strip()
-                            return mapping.get(valor_str, valor_str)
+                
+                for col, mapping in categorical_mappings.items():
+                    if col in df.columns:
+                        try:
+                            def mapear_categoria_seguro(valor):
+                                if pd.isna(valor):
+                                    return 'No especificado'
+                                valor_str = str(valor).strip()
+                                return mapping.get(valor_str, valor_str)
                         
-                        df[f'{col}_normalizado'] = df[col].apply(mapear_categoria_seguro)
-                        self.logs.info(f"Columna categórica {col} normalizada correctamente")
+                            # astype(object) para que las columnas category se mapeen valor a valor
+                            df[f'{col}_normalizado'] = df[col].astype(object).apply(mapear_categoria_seguro)
+                            self.logs.info(f"Columna categórica {col} normalizada correctamente")
                         
-                    except Exception as e:
-                        self.logs.warning(f"Error normalizando columna categórica {col}: {str(e)}")
-                        df[f'{col}_normalizado'] = df[col].astype(str)
+                        except Exception as e:
+                            self.logs.warning(f"Error normalizando columna categórica {col}: {str(e)}")
+                            df[f'{col}_normalizado'] = df[col].astype(str)
             
-            # 8. Conversión de booleanos - versión simplificada
-            self.logs.info("Paso 8: Conversión de booleanos")
-            boolean_cols = ['host_is_superhost', 'host_identity_verified', 'has_availability']
-            for col in boolean_cols:
-                if col in df.columns:
-                    try:
-                        # Versión más simple y segura
-                        df[f'{col}_bin'] = 0  # Valor por defecto
+            # 8. Conversión de booleanos (vectorizada)
+            with self.metricas.medir('transformacion.listings.paso_8', len(df)):
+                self.logs.info("Paso 8: Conversión de booleanos")
+                boolean_cols = ['host_is_superhost', 'host_identity_verified', 'has_availability']
+                for col in boolean_cols:
+                    if col in df.columns:
+                        try:
+                            if f'{col}_bin' in df.columns:
+                                # Ya calculada en MongoDB (pushdown)
+                                df[f'{col}_bin'] = df.pop(f'{col}_bin').fillna(0).astype('int8')
+                            else:
+                                df[f'{col}_bin'] = self.normalizar_booleano(df[col])
+                            self.logs.info(f"Columna booleana {col} procesada correctamente")
                         
-                        # Procesar fila por fila para evitar problemas de arrays
-                        for idx in df.index:
-                            valor = df.loc[idx, col]
-                            if pd.notna(valor):
-                                if isinstance(valor, bool):
-                                    df.loc[idx, f'{col}_bin'] = 1 if valor else 0
-                                elif isinstance(valor, str):
-                                    valor_lower = valor.lower().strip()
-                                    if valor_lower in ['t', 'true', '1', 'yes', 'si']:
-                                        df.loc[idx, f'{col}_bin'] = 1
-                        
-                        self.logs.info(f"Columna booleana {col} procesada correctamente")
-                        
-                    except Exception as e:
-                        self.logs.warning(f"Error procesando columna booleana {col}: {str(e)}")
-                        df[f'{col}_bin'] = 0
+                        except Exception as e:
+                            self.logs.warning(f"Error procesando columna booleana {col}: {str(e)}")
+                            df[f'{col}_bin'] = 0
             
             # 9. Limpieza de valores numéricos - versión simplificada
-            self.logs.info("Paso 9: Limpieza de valores numéricos")
-            numeric_cols = ['accommodates', 'bedrooms', 'beds', 'minimum_nights', 
-                           'maximum_nights', 'availability_30', 'availability_60', 
-                           'availability_90', 'availability_365']
-            
-            for col in numeric_cols:
-                if col in df.columns:
-                    try:
-                        df[f'{col}_clean'] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                        self.logs.info(f"Columna numérica {col} procesada correctamente")
+            with self.metricas.medir('transformacion.listings.paso_9', len(df)):
+                self.logs.info("Paso 9: Limpieza de valores numéricos")
+                numeric_cols = ['accommodates', 'bedrooms', 'beds', 'minimum_nights', 
+                               'maximum_nights', 'availability_30', 'availability_60', 
+                               'availability_90', 'availability_365']
+                
+                for col in numeric_cols:
+                    if col in df.columns:
+                        try:
+                            df[f'{col}_clean'] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                            self.logs.info(f"Columna numérica {col} procesada correctamente")
                         
-                    except Exception as e:
-                        self.logs.warning(f"Error procesando columna numérica {col}: {str(e)}")
-                        df[f'{col}_clean'] = 0
+                        except Exception as e:
+                            self.logs.warning(f"Error procesando columna numérica {col}: {str(e)}")
+                            df[f'{col}_clean'] = 0
             
             # 10. Limpieza de campos de texto
-            self.logs.info("Paso 10: Limpieza de campos de texto")
-            text_cols = ['neighbourhood_cleansed', 'name', 'description']
-            for col in text_cols:
-                if col in df.columns:
-                    try:
-                        df[f'{col}_clean'] = df[col].fillna('No especificado').astype(str).str.strip()
-                        self.logs.info(f"Columna de texto {col} procesada correctamente")
+            with self.metricas.medir('transformacion.listings.paso_10', len(df)):
+                self.logs.info("Paso 10: Limpieza de campos de texto")
+                text_cols = ['neighbourhood_cleansed', 'name', 'description']
+                for col in text_cols:
+                    if col in df.columns:
+                        try:
+                            df[f'{col}_clean'] = df[col].astype(object).fillna('No especificado').astype(str).str.strip()
+                            self.logs.info(f"Columna de texto {col} procesada correctamente")
                         
-                    except Exception as e:
-                        self.logs.warning(f"Error procesando columna de texto {col}: {str(e)}")
-                        df[f'{col}_clean'] = 'No especificado'
+                        except Exception as e:
+                            self.logs.warning(f"Error procesando columna de texto {col}: {str(e)}")
+                            df[f'{col}_clean'] = 'No especificado'
+            
+            # 11. Claves geoespaciales (antes del downcast, con las coordenadas en float64)
+            with self.metricas.medir('transformacion.listings.paso_11', len(df)):
+                self.logs.info("Paso 11: Claves geoespaciales")
+                try:
+                    df['geohash'] = geohash_vectorizado(df['latitude'], df['longitude'],
+                                                        self.config.get('precision_geohash', PRECISION_GEOHASH))
+                    df['celda_grid'] = celda_grid(df['latitude'], df['longitude'],
+                                                  self.config.get('tamano_celda_grados', TAMANO_CELDA_GRADOS))
+                    self.logs.info(f"Geohash y celda de cuadrícula calculados: {df['celda_grid'].nunique()} celdas")
+                
+                except Exception as e:
+                    self.logs.warning(f"Error calculando claves geoespaciales: {str(e)}")
+            
+            # 12. Optimización de tipos (downcast numérico y category)
+            with self.metricas.medir('transformacion.listings.paso_12', len(df)):
+                self.logs.info("Paso 12: Optimización de tipos")
+                df = self.optimizar_tipos('listings', df)
             
             registros_finales = len(df)
             self.logs.info(f"Registros finales: {registros_finales}")
@@ -331,12 +486,12 @@ class Transformacion:
     def transformar_reviews(self, df_reviews):
         self.logs.info("=== Iniciando transformación de REVIEWS ===")
         
-        df = df_reviews.copy()
+        df = df_reviews
         registros_iniciales = len(df)
         self.logs.info(f"Registros iniciales: {registros_iniciales}")
         
         # 1. Limpieza de valores nulos críticos
-        df = df.dropna(subset=['id', 'listing_id'])
+        df = self.filtrar_nulos(df, ['id', 'listing_id'])
         self.logs.info(f"Registros después de eliminar nulos críticos: {len(df)}")
         
         # 2. Eliminar duplicados
@@ -344,29 +499,29 @@ class Transformacion:
         self.logs.info(f"Registros después de eliminar duplicados: {len(df)}")
         
         # 3. Normalización de fechas
-        df['date_clean'] = df['date'].apply(self.normalizar_fecha)
-        df = self.derivar_variables_tiempo(df, 'date_clean')
+        df['date_clean'] = self.normalizar_fechas(self.columna_origen(df, 'date_clean', 'date'))
+        df = self.derivar_variables_tiempo(df, 'date_clean', copiar=False)
         
         # 4. Limpieza de comentarios
         if 'comments' in df.columns:
             df['comments_clean'] = df['comments'].astype(str).str.strip()
             df['comments_length'] = df['comments_clean'].str.len()
             
-            # Análisis básico de sentimiento (simplificado)
-            positive_words = ['good', 'great', 'excellent', 'amazing', 'perfect', 'wonderful',
-                            'bueno', 'excelente', 'perfecto', 'maravilloso']
-            negative_words = ['bad', 'terrible', 'awful', 'poor', 'horrible',
-                            'malo', 'terrible', 'horrible', 'pésimo']
-            
-            df['sentiment_score'] = df['comments_clean'].apply(
-                lambda x: sum(1 for word in positive_words if word.lower() in x.lower()) -
-                         sum(1 for word in negative_words if word.lower() in x.lower())
+            # Análisis básico de sentimiento (una pasada multi-palabra por chunk)
+            puntuador = PuntuadorSentimiento(
+                positivas=self.config.get('lexico_positivo'),
+                negativas=self.config.get('lexico_negativo'),
+                backend=self.config.get('backend_sentimiento', 'regex')
             )
+            df['sentiment_score'] = puntuador.puntuar(df['comments_clean'])
         
         # 5. Limpieza de nombres de reviewers
         if 'reviewer_name' in df.columns:
             df['reviewer_name_clean'] = df['reviewer_name'].astype(str).str.strip().str.title()
         
+        # 6. Optimización de tipos
+        df = self.optimizar_tipos('reviews', df)
+        
         registros_finales = len(df)
         self.logs.info(f"Registros finales: {registros_finales}")
         self.logs.info(f"Registros eliminados: {registros_iniciales - registros_finales}")
@@ -376,43 +531,165 @@ class Transformacion:
     def transformar_calendar(self, df_calendar):
         self.logs.info("=== Iniciando transformación de CALENDAR ===")
         
-        df = df_calendar.copy()
+        df = df_calendar
         registros_iniciales = len(df)
         self.logs.info(f"Registros iniciales: {registros_iniciales}")
         
         # 1. Limpieza de valores nulos críticos
-        df = df.dropna(subset=['listing_id', 'date'])
+        df = self.filtrar_nulos(df, ['listing_id', 'date'])
         self.logs.info(f"Registros después de eliminar nulos críticos: {len(df)}")
         
         # 2. Normalización de fechas
-        df['date_clean'] = df['date'].apply(self.normalizar_fecha)
-        df = self.derivar_variables_tiempo(df, 'date_clean')
+        df['date_clean'] = self.normalizar_fechas(self.columna_origen(df, 'date_clean', 'date'))
+        df = self.derivar_variables_tiempo(df, 'date_clean', copiar=False)
         
         # 3. Normalización de precios
         if 'price' in df.columns:
-            df['price_clean'] = df['price'].apply(self.limpiar_precio)
+            df['price_clean'] = self.limpiar_precios(self.columna_origen(df, 'price_clean', 'price'))
         
         # 4. Conversión de disponibilidad
         if 'available' in df.columns:
-            df['available_bin'] = df['available'].map({'t': 1, 'f': 0, True: 1, False: 0}).fillna(0)
+            if 'available_bin' in df.columns:
+                df['available_bin'] = df.pop('available_bin').fillna(0).astype('int8')
+            else:
+                df['available_bin'] = self.normalizar_booleano(df['available'])
+        
+        # 5. Optimización de tipos
+        df = self.optimizar_tipos('calendar', df)
         
         registros_finales = len(df)
         self.logs.info(f"Registros finales: {registros_finales}")
         
         return df
     
-    def ejecutar_transformacion_completa(self, dataframes_extraidos):
-        self.logs.info("=== INICIANDO TRANSFORMACIÓN COMPLETA ===")
+    def particionar(self, nombre, df):
+        filas_por_particion = self.config.get('filas_por_particion', 250000)
         
-        # Transformar cada DataFrame
-        if 'listings' in dataframes_extraidos and not dataframes_extraidos['listings'].empty:
-            self.dataframes_transformados['listings'] = self.transformar_listings(dataframes_extraidos['listings'])
+        # Listings es pequeño y su transformación necesita todas las filas
+        if nombre == 'listings' or len(df) <= filas_por_particion:
+            return [df]
         
-        if 'reviews' in dataframes_extraidos and not dataframes_extraidos['reviews'].empty:
-            self.dataframes_transformados['reviews'] = self.transformar_reviews(dataframes_extraidos['reviews'])
+        # drop_duplicates es global: se aplica antes de partir para no dejar duplicados entre particiones
+        if nombre == 'reviews':
+            df = df.dropna(subset=['id', 'listing_id']).drop_duplicates(subset=['id'])
         
-        if 'calendar' in dataframes_extraidos and not dataframes_extraidos['calendar'].empty:
-            self.dataframes_transformados['calendar'] = self.transformar_calendar(dataframes_extraidos['calendar'])
+        return [df.iloc[inicio:inicio + filas_por_particion] for inicio in range(0, len(df), filas_por_particion)]
+    
+    def reducir_numerico(self, serie):
+        # Solo conversiones sin pérdida: la carga debe escribir exactamente los mismos valores
+        if pd.api.types.is_bool_dtype(serie):
+            return serie
+        if pd.api.types.is_integer_dtype(serie) and not isinstance(serie.dtype, pd.api.extensions.ExtensionDtype):
+            return pd.to_numeric(serie, downcast='integer')
+        if pd.api.types.is_float_dtype(serie) and serie.dtype != np.float32:
+            valores = serie.to_numpy()
+            reducidos = valores.astype(np.float32)
+            with np.errstate(over='ignore', invalid='ignore'):
+                exactos = (reducidos.astype(np.float64) == valores) | np.isnan(valores)
+            if exactos.all():
+                return pd.Series(reducidos, index=serie.index, name=serie.name)
+        return serie
+    
+    def optimizar_tipos(self, nombre, df):
+        bytes_antes = int(df.memory_usage(deep=True).sum())
+        
+        # Opcional: quitar columnas crudas que ya tienen su versión limpia
+        if self.config.get('eliminar_columnas_crudas', False):
+            columnas = set(df.columns)
+            crudas = [col for col in df.columns if col not in COLUMNAS_PROTEGIDAS
+                      and any(f'{col}{sufijo}' in columnas for sufijo in SUFIJOS_DERIVADOS)]
+            df = df.drop(columns=crudas)
+            self.logs.info(f"Columnas crudas eliminadas en {nombre}: {crudas}")
+        
+        for col in df.columns:
+            serie = df[col]
+            if col in COLUMNAS_CATEGORICAS and serie.dtype == object:
+                # Solo si de verdad se repiten los valores; si no, category ocupa más
+                if serie.nunique(dropna=True) < 0.5 * len(serie):
+                    df[col] = serie.astype('category')
+            elif pd.api.types.is_numeric_dtype(serie):
+                reducida = self.reducir_numerico(serie)
+                if reducida.dtype != serie.dtype:
+                    df[col] = reducida
+        
+        bytes_despues = int(df.memory_usage(deep=True).sum())
+        self.optimizacion_memoria[nombre] = {'bytes_antes': bytes_antes, 'bytes_despues': bytes_despues}
+        # Viaja con el DataFrame cuando la transformación corre en otro proceso
+        df.attrs['bytes_antes_optimizacion'] = bytes_antes
+        self.logs.info(f"Memoria de {nombre}: {bytes_antes / 1024 / 1024:.1f} MB -> {bytes_despues / 1024 / 1024:.1f} MB")
+        return df
+    
+    def deduplicar_streaming(self, nombre, df, vistos):
+        # drop_duplicates sobre chunks: un ID se conserva solo la primera vez que aparece en todo el flujo
+        if nombre not in CLAVES_DEDUPLICACION:
+            return df
+        
+        criticas, clave = CLAVES_DEDUPLICACION[nombre]
+        df = df.dropna(subset=criticas)
+        ids = df[clave]
+        ya_vistos = ids.map(vistos.__contains__).to_numpy(dtype=bool)
+        df = df[~ya_vistos & ~ids.duplicated().to_numpy()]
+        vistos.update(df[clave].tolist())
+        return df
+    
+    def concatenar_particiones(self, partes):
+        if len(partes) == 1:
+            return partes[0]
+        
+        df = pd.concat(partes)
+        
+        # Las categorías pueden diferir entre particiones y pd.concat las degrada a object
+        for col in partes[0].columns:
+            if isinstance(partes[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        
+        return df
+    
+    def ejecutar_transformacion_paralela(self, dataframes_extraidos, workers):
+        self.logs.info(f"Transformación paralela con {workers} procesos")
+        
+        tareas = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Se envían todas las particiones de todas las colecciones antes de esperar resultados
+            for nombre in METODOS_TRANSFORMACION:
+                if nombre in dataframes_extraidos and not dataframes_extraidos[nombre].empty:
+                    particiones = self.particionar(nombre, dataframes_extraidos[nombre])
+                    self.logs.info(f"{nombre}: {len(particiones)} particiones")
+                    futuros = [pool.submit(transformar_particion, nombre, particion, self.config)
+                               for particion in particiones]
+                    tareas.append((nombre, futuros))
+            
+            # Resultados en el orden de envío para que la salida sea determinista
+            for nombre, futuros in tareas:
+                partes = [f.result() for f in futuros]
+                df = self.concatenar_particiones(partes)
+                self.dataframes_transformados[nombre] = df
+                self.optimizacion_memoria[nombre] = {
+                    'bytes_antes': sum(parte.attrs.get('bytes_antes_optimizacion', 0) for parte in partes),
+                    'bytes_despues': int(df.memory_usage(deep=True).sum())
+                }
+    
+    def ejecutar_transformacion_completa(self, dataframes_extraidos):
+        self.logs.info("=== INICIANDO TRANSFORMACIÓN COMPLETA ===")
+        
+        workers = self.config.get('workers', 1)
+        if workers and workers > 1:
+            # Los pasos corren en otros procesos; solo se mide el conjunto
+            filas = sum(len(df) for df in dataframes_extraidos.values())
+            with self.metricas.medir('transformacion.paralela', filas):
+                self.ejecutar_transformacion_paralela(dataframes_extraidos, workers)
+        else:
+            # Transformar cada DataFrame (listings se mide por paso dentro de transformar_listings)
+            if 'listings' in dataframes_extraidos and not dataframes_extraidos['listings'].empty:
+                self.dataframes_transformados['listings'] = self.transformar_listings(dataframes_extraidos['listings'])
+            
+            if 'reviews' in dataframes_extraidos and not dataframes_extraidos['reviews'].empty:
+                with self.metricas.medir('transformacion.reviews', len(dataframes_extraidos['reviews'])):
+                    self.dataframes_transformados['reviews'] = self.transformar_reviews(dataframes_extraidos['reviews'])
+            
+            if 'calendar' in dataframes_extraidos and not dataframes_extraidos['calendar'].empty:
+                with self.metricas.medir('transformacion.calendar', len(dataframes_extraidos['calendar'])):
+                    self.dataframes_transformados['calendar'] = self.transformar_calendar(dataframes_extraidos['calendar'])
         
         # Resumen de transformaciones
         self.logs.info("=== RESUMEN DE TRANSFORMACIONES ===")
@@ -421,16 +698,37 @@ class Transformacion:
         
         return self.dataframes_transformados
     
+    def perfilar(self, nombre, df):
+        # Los sketches de cada chunk se combinan: el perfil final no necesita la tabla completa en memoria
+        if nombre not in self.perfiles:
+            self.perfiles[nombre] = PerfilCalidad(self.config.get('perfil_calidad'))
+        self.perfiles[nombre].agregar(df)
+    
     def generar_reporte_calidad(self):
         reporte = {}
         
+        # Tablas completas en memoria: se perfilan por chunks; en modo pipeline ya vienen acumuladas
+        perfiles = dict(self.perfiles)
         for nombre, df in self.dataframes_transformados.items():
+            if nombre not in perfiles:
+                with self.metricas.medir(f'transformacion.reporte_calidad.{nombre}', len(df)):
+                    perfiles[nombre] = PerfilCalidad(self.config.get('perfil_calidad'))
+                    perfiles[nombre].agregar_por_chunks(df)
+        
+        for nombre, perfil in perfiles.items():
+            columnas = perfil.resultado()
             reporte[nombre] = {
-                'total_registros': len(df),
-                'total_columnas': len(df.columns),
-                'valores_nulos_por_columna': df.isnull().sum().to_dict(),
-                'porcentaje_completitud': ((df.count() / len(df)) * 100).round(2).to_dict()
+                'total_registros': perfil.filas,
+                'total_columnas': len(columnas),
+                'valores_nulos_por_columna': {col: datos['nulos'] for col, datos in columnas.items()},
+                'porcentaje_completitud': {
+                    col: round((1 - datos['tasa_nulos']) * 100, 2) if perfil.filas else 0.0
+                    for col, datos in columnas.items()
+                },
+                'perfil_columnas': columnas
             }
+            if nombre in self.optimizacion_memoria:
+                reporte[nombre]['memoria'] = self.optimizacion_memoria[nombre]
         
         self.logs.info("Reporte de calidad generado")
         return reporte
@@ -0,0 +1,131 @@
+import os
+from datetime import datetime
+import mongomock
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacion import construir_pipeline, pipeline_seleccion, COLUMNAS_PUSHDOWN, CLAVES_DUPLICADOS, NULOS_CRITICOS
+from datos_sinteticos import GeneradorDatosSinteticos
+from extraccion import Extraccion, PROYECCIONES
+from transformacion import Transformacion, METODOS_TRANSFORMACION
+
+# MongoDB real para la comparación: ETL_TEST_MONGODB_URI o, si está instalado, pymongo_inmemory
+URI_PRUEBAS = os.environ.get('ETL_TEST_MONGODB_URI')
+BD_PRUEBAS = 'etl_test_pushdown'
+
+CLAVES_ORDEN = {'listings': ['id'], 'reviews': ['id'], 'calendar': ['listing_id', 'date_clean']}
+
+# Precios que no genera datos_sinteticos: espacios, sin '$', numéricos, vacíos y no numéricos
+PRECIOS_BORDE = [' $1,234.50 ', '850', 1200, 99.5, '', 'N/A', None, '$$12']
+
+
+def cadenas(valor):
+    # Cadenas del pipeline que MongoDB interpreta como expresión (lo que va en $literal queda fuera)
+    if isinstance(valor, dict):
+        for clave, interno in valor.items():
+            yield clave
+            if clave != '$literal':
+                yield from cadenas(interno)
+    elif isinstance(valor, list):
+        for interno in valor:
+            yield from cadenas(interno)
+    elif isinstance(valor, str):
+        yield valor
+
+
+def documento_mongo(documento):
+    # {'$date': ...} de mongoexport -> fecha BSON, como la guarda mongoimport
+    return {campo: datetime.strptime(valor['$date'], '%Y-%m-%dT%H:%M:%SZ') if isinstance(valor, dict) else valor
+            for campo, valor in documento.items()}
+
+
+@pytest.mark.parametrize('nombre', list(COLUMNAS_PUSHDOWN))
+def test_pipeline_sin_rutas_de_campo_vacias(nombre):
+    # '$' solo no es una ruta de campo válida: los literales que empiezan con '$' van en $literal
+    pipeline = construir_pipeline(nombre, proyeccion={campo: 1 for campo in PROYECCIONES[nombre]})
+    assert '$' not in list(cadenas(pipeline))
+
+
+@pytest.fixture(scope='module')
+def bd_mongomock():
+    # _id enteros insertados en orden aleatorio: el orden natural de find() difiere del de _id
+    bd = mongomock.MongoClient()[BD_PRUEBAS]
+    rng = np.random.default_rng(11)
+    for nombre, documentos in GeneradorDatosSinteticos(semilla=5).documentos(3000, ('listings', 'reviews')):
+        documentos = [documento_mongo(documento) for documento in documentos]
+        for posicion in rng.permutation(len(documentos)):
+            bd[nombre].insert_one(dict(documentos[posicion], _id=int(posicion)))
+    return bd
+
+
+@pytest.mark.parametrize('limite', [None, 40, 700])
+@pytest.mark.parametrize('nombre', ['listings', 'reviews'])
+def test_seleccion_pushdown_igual_a_python(bd_mongomock, nombre, limite):
+    # mongomock no implementa $replaceAll/$convert: se comparan las etapas que eligen los documentos
+    # (nulos, orden, límite y duplicados) contra find() + filtrar_nulos + drop_duplicates
+    proyeccion = {campo: 1 for campo in PROYECCIONES[nombre]}
+    agregado = [documento['_id'] for documento in
+                bd_mongomock[nombre].aggregate(pipeline_seleccion(nombre, proyeccion=proyeccion, limite=limite))]
+
+    extractor = Extraccion(usar_proyeccion=True, campos_watermark={nombre: '_id'})
+    extractor.db = bd_mongomock
+    df = Transformacion({}).filtrar_nulos(extractor.leer_coleccion(nombre, limite), NULOS_CRITICOS[nombre])
+    python = df.drop_duplicates(subset=[CLAVES_DUPLICADOS[nombre]])['_id'].tolist()
+
+    assert len(agregado) > 0
+    assert agregado == python
+
+
+@pytest.fixture(scope='module')
+def mongo():
+    if URI_PRUEBAS:
+        from pymongo import MongoClient
+        cliente = MongoClient(URI_PRUEBAS, serverSelectionTimeoutMS=5000)
+        try:
+            cliente.admin.command('ping')
+        except Exception as e:
+            pytest.skip(f"MongoDB de pruebas no disponible: {e}")
+        yield cliente
+        cliente.drop_database(BD_PRUEBAS)
+        cliente.close()
+        return
+
+    pymongo_inmemory = pytest.importorskip('pymongo_inmemory')
+    try:
+        cliente = pymongo_inmemory.MongoClient()
+        cliente.admin.command('ping')
+    except Exception as e:
+        pytest.skip(f"No se pudo iniciar mongod en memoria: {e}")
+    yield cliente
+    cliente.close()
+
+
+@pytest.fixture(scope='module')
+def bd(mongo):
+    mongo.drop_database(BD_PRUEBAS)
+    bd = mongo[BD_PRUEBAS]
+    for nombre, documentos in GeneradorDatosSinteticos(semilla=7).documentos('10k'):
+        documentos = [documento_mongo(documento) for documento in documentos]
+        if 'price' in documentos[0]:
+            for i, precio in enumerate(PRECIOS_BORDE):
+                documentos[i]['price'] = precio
+        bd[nombre].insert_many(documentos)
+    return bd
+
+
+def extraer_y_transformar(bd, nombre, pushdown):
+    extractor = Extraccion(usar_proyeccion=True, pushdown=pushdown)
+    extractor.db = bd
+    df = extractor.leer_coleccion(nombre)
+    df = getattr(Transformacion({}), METODOS_TRANSFORMACION[nombre])(df)
+    return df.sort_values(CLAVES_ORDEN[nombre], kind='stable').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('nombre', ['listings', 'reviews', 'calendar'])
+def test_pushdown_igual_a_python(bd, nombre):
+    python = extraer_y_transformar(bd, nombre, pushdown=False)
+    agregado = extraer_y_transformar(bd, nombre, pushdown=True)
+
+    assert len(python) > 0
+    pd.testing.assert_frame_equal(python, agregado)
@@ -0,0 +1,94 @@
+import os
+import pandas as pd
+import pytest
+from bson import ObjectId
+
+from cache_transformacion import CacheTransformacion
+
+pytest.importorskip('pyarrow')
+
+
+def listings(filas=500, desplazamiento=0):
+    return pd.DataFrame({
+        '_id': [ObjectId(f'{i + desplazamiento:024x}') for i in range(filas)],
+        'id': range(desplazamiento, desplazamiento + filas),
+        'price': [f'${i},000.00' for i in range(filas)],
+        'amenities_procesados': [['wifi', 'tv'][:i % 3] for i in range(filas)],
+        'room_type': pd.Categorical(['Entire home/apt', 'Private room'] * (filas // 2))
+    })
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheTransformacion({'sentimiento': True}, {'directorio': str(tmp_path)})
+
+
+def test_misma_entrada_misma_clave_y_lectura_igual(cache):
+    df = listings()
+    clave = cache.clave('listings', df)
+    assert cache.leer('listings', clave) is None
+
+    assert cache.guardar('listings', clave, df, memoria=123)
+    leido, memoria = cache.leer('listings', cache.clave('listings', listings()))
+
+    assert memoria == 123
+    pd.testing.assert_frame_equal(leido, df)
+
+
+def cambiar(df, caso):
+    if caso == 'celda':
+        df.loc[250, 'price'] = '$1.00'
+    elif caso == 'lista':
+        df['amenities_procesados'] = [['wifi', 'cocina']] + df['amenities_procesados'].tolist()[1:]
+    elif caso == 'tipo':
+        df['id'] = df['id'].astype('float64')
+    elif caso == 'columna':
+        df.drop(columns='room_type', inplace=True)
+    elif caso == 'fila':
+        df.drop(index=499, inplace=True)
+
+
+@pytest.mark.parametrize('caso', ['celda', 'lista', 'tipo', 'columna', 'fila'])
+def test_cambio_de_contenido_invalida_la_entrada(cache, caso):
+    df = listings()
+    cache.guardar('listings', cache.clave('listings', df), df)
+
+    cambiado = listings()
+    cambiar(cambiado, caso)
+    assert cache.clave('listings', cambiado) != cache.clave('listings', df)
+    assert cache.leer('listings', cache.clave('listings', cambiado)) is None
+
+
+def test_cambio_de_configuracion_invalida_la_entrada(cache, tmp_path):
+    df = listings()
+    cache.guardar('listings', cache.clave('listings', df), df)
+
+    otra = CacheTransformacion({'sentimiento': False}, {'directorio': str(tmp_path)})
+    assert otra.leer('listings', otra.clave('listings', df)) is None
+
+
+def test_desalojo_lru_respeta_el_limite(tmp_path):
+    medida = CacheTransformacion(config={'directorio': str(tmp_path / 'medida')})
+    medida.guardar('listings', 'entrada', listings())
+    tamano = os.path.getsize(medida.ruta('entrada'))
+
+    # Caben dos entradas (todas miden lo mismo: mismo número de filas y mismos valores desplazados)
+    cache = CacheTransformacion(config={'directorio': str(tmp_path / 'cache'), 'limite_mb': 2.5 * tamano / 1024 ** 2})
+    claves = []
+    for i in range(3):
+        df = listings(desplazamiento=i * 1000)
+        claves.append(cache.clave('listings', df))
+        cache.guardar('listings', claves[-1], df)
+        os.utime(cache.ruta(claves[-1]), (1000 + i, 1000 + i))
+
+    # La tercera desaloja la más antigua (0); leer la 1 la marca como usada y la siguiente desaloja la 2
+    assert [os.path.exists(cache.ruta(clave)) for clave in claves] == [False, True, True]
+    assert cache.leer('listings', claves[1]) is not None
+
+    df = listings(desplazamiento=3000)
+    claves.append(cache.clave('listings', df))
+    cache.guardar('listings', claves[-1], df)
+
+    assert [os.path.exists(cache.ruta(clave)) for clave in claves] == [False, True, False, True]
+    total = sum(os.path.getsize(os.path.join(cache.directorio, archivo)) for archivo in os.listdir(cache.directorio))
+    assert total <= cache.limite_bytes
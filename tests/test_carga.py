@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import openpyxl
+import pandas as pd
+import pytest
+
+import carga as carga_modulo
+from carga import Carga, escribir_excel_streaming
+
+TABLA = 'raw_reviews_transformado'
+
+
+def reviews(inicio, filas):
+    ids = range(inicio, inicio + filas)
+    return pd.DataFrame({'id': list(ids), 'listing_id': [i % 37 for i in ids],
+                         'comments': [f'comentario {i}' for i in ids]})
+
+
+@pytest.fixture
+def carga(tmp_path):
+    return Carga(str(tmp_path / 'dw.db'), str(tmp_path / 'output') + '/',
+                 {'tamano_lote_sqlite': 100, 'modelo_dimensional': False, 'indice_espacial': False})
+
+
+def consultar(carga, sql):
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def cargar_por_chunks(carga, chunks, falla_despues=None):
+    # Igual que la etapa de carga de ejecutar_pipeline: falla_despues simula el error de otra etapa
+    conn = carga.abrir_carga_streaming()
+    try:
+        for i, chunk in enumerate(chunks):
+            carga.cargar_lote_sqlite(conn, 'reviews', chunk, i == 0)
+            if i == falla_despues:
+                raise RuntimeError('fallo en la transformación')
+        carga.finalizar_carga_streaming(conn, ['reviews'])
+    finally:
+        carga.revertir_carga_streaming(conn)
+        conn.close()
+
+
+def test_carga_por_chunks_completa(carga):
+    cargar_por_chunks(carga, [reviews(0, 250), reviews(250, 250), reviews(500, 30)])
+
+    assert consultar(carga, f'SELECT COUNT(*), MAX(id) FROM "{TABLA}"') == [(530, 529)]
+    assert carga.verificar_carga()[TABLA]['estado'] == 'OK'
+
+
+def test_fallo_a_mitad_de_la_carga_por_chunks_conserva_la_tabla_anterior(carga):
+    carga.cargar_a_sqlite({'reviews': reviews(0, 40)})
+    checksums_antes = consultar(carga, f'SELECT * FROM etl_checksums WHERE tabla = \'{TABLA}\'')
+
+    with pytest.raises(RuntimeError):
+        cargar_por_chunks(carga, [reviews(1000, 250), reviews(1250, 250), reviews(1500, 250)], falla_despues=1)
+
+    assert consultar(carga, f'SELECT COUNT(*), MIN(id), MAX(id) FROM "{TABLA}"') == [(40, 0, 39)]
+    assert consultar(carga, f'SELECT * FROM etl_checksums WHERE tabla = \'{TABLA}\'') == checksums_antes
+    assert carga.verificar_carga()[TABLA]['estado'] == 'OK'
+
+
+def test_fallo_en_la_primera_carga_por_chunks_no_deja_tabla(carga):
+    with pytest.raises(RuntimeError):
+        cargar_por_chunks(carga, [reviews(0, 250), reviews(250, 250)], falla_despues=1)
+
+    assert consultar(carga, f"SELECT name FROM sqlite_master WHERE name = '{TABLA}'") == []
+
+
+def listings(ids, precio=100.0):
+    return pd.DataFrame({
+        'id': pd.array(ids, dtype='Int64'),
+        'host_id': pd.array([None if i % 5 == 0 else i * 10 for i in ids], dtype='Int64'),
+        'price_clean': [precio + i for i in ids],
+        'host_is_superhost': [i % 2 == 0 for i in ids],
+        'host_since': pd.to_datetime([f'2015-01-{1 + i % 28:02d}' for i in ids]),
+        'room_type': pd.Categorical(['Entire home/apt' if i % 3 else 'Private room' for i in ids]),
+        'name': [f'alojamiento {i}' if i % 4 else None for i in ids]
+    })
+
+
+def test_ida_y_vuelta_de_un_dataframe(carga):
+    df = listings(range(250))
+    carga.cargar_a_sqlite({'listings': df})
+
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        leido = pd.read_sql('SELECT * FROM raw_listings_transformado ORDER BY rowid', conn)
+        tipos = {fila[1]: fila[2] for fila in conn.execute('PRAGMA table_info(raw_listings_transformado)')}
+
+    assert list(leido.columns) == list(df.columns)
+    assert tipos == {'id': 'INTEGER', 'host_id': 'INTEGER', 'price_clean': 'REAL', 'host_is_superhost': 'INTEGER',
+                     'host_since': 'TEXT', 'room_type': 'TEXT', 'name': 'TEXT'}
+    assert leido['id'].tolist() == df['id'].tolist()
+    assert leido['host_id'].astype('Int64').tolist() == df['host_id'].tolist()
+    assert leido['price_clean'].tolist() == df['price_clean'].tolist()
+    assert leido['host_is_superhost'].astype(bool).tolist() == df['host_is_superhost'].tolist()
+    assert leido['host_since'].tolist() == df['host_since'].dt.strftime('%Y-%m-%d').tolist()
+    assert leido['room_type'].tolist() == df['room_type'].astype(str).tolist()
+    assert leido['name'].tolist() == df['name'].tolist()
+
+
+def test_upsert_repetido_conserva_los_conteos(carga):
+    carga.cargar_incremental_sqlite({'listings': listings(range(100))})
+    carga.cargar_incremental_sqlite({'listings': listings(range(100))})
+    assert consultar(carga, 'SELECT COUNT(*), COUNT(DISTINCT id) FROM raw_listings_transformado') == [(100, 100)]
+
+    # Delta con 20 filas existentes modificadas y 30 nuevas
+    carga.cargar_incremental_sqlite({'listings': listings(range(80, 130), precio=500.0)})
+    carga.cargar_incremental_sqlite({'listings': listings(range(80, 130), precio=500.0)})
+
+    assert consultar(carga, 'SELECT COUNT(*), COUNT(DISTINCT id) FROM raw_listings_transformado') == [(130, 130)]
+    assert consultar(carga, 'SELECT price_clean FROM raw_listings_transformado WHERE id IN (79, 80) ORDER BY id') == \
+        [(179.0,), (580.0,)]
+    assert carga.verificar_carga()['raw_listings_transformado'] == {'registros': 130, 'estado': 'SIN_CHECKSUM'}
+
+
+def test_clave_unica_depura_claves_repetidas(carga):
+    # Carga completa con ids repetidos: al pasar a incremental se conserva la última fila de cada id
+    df = listings([1, 2, 3, 2, 1])
+    df['name'] = ['a', 'b', 'c', 'd', 'e']
+    carga.cargar_a_sqlite({'listings': df})
+
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        carga.asegurar_clave_unica(conn, 'raw_listings_transformado', ['id'])
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute('INSERT INTO raw_listings_transformado (id) VALUES (3)')
+
+    assert consultar(carga, 'SELECT id, name FROM raw_listings_transformado ORDER BY id') == \
+        [(1, 'e'), (2, 'd'), (3, 'c')]
+    assert consultar(carga, "SELECT COUNT(*) FROM etl_checksums WHERE tabla = 'raw_listings_transformado'") == [(0,)]
+
+
+def test_fallo_en_la_carga_revierte_a_la_tabla_anterior(carga, monkeypatch):
+    carga.cargar_a_sqlite({'reviews': reviews(0, 40)})
+    convertir = carga.valores_sqlite
+    llamadas = []
+
+    def falla_en_el_tercer_lote(serie, formato_fecha=None):
+        llamadas.append(1)
+        if len(llamadas) > 2 * 3:
+            raise ValueError('valor no convertible')
+        return convertir(serie, formato_fecha)
+
+    monkeypatch.setattr(carga, 'valores_sqlite', falla_en_el_tercer_lote)
+    with pytest.raises(ValueError):
+        carga.cargar_a_sqlite({'reviews': reviews(1000, 500)[['id', 'comments']]})
+
+    # El DROP/CREATE y los dos primeros lotes se revierten junto con el tercero
+    assert consultar(carga, f'SELECT COUNT(*), MAX(id) FROM "{TABLA}"') == [(40, 39)]
+    assert [fila[1] for fila in consultar(carga, f'PRAGMA table_info("{TABLA}")')] == ['id', 'listing_id', 'comments']
+    assert carga.verificar_carga()[TABLA]['estado'] == 'OK'
+
+
+@pytest.mark.parametrize('configurado, esperado', [('OFF', 'memory'), ('off', 'memory'), ('MEMORY', 'memory'),
+                                                   ('WAL', 'wal'), (None, 'memory')])
+def test_journal_mode_de_carga(tmp_path, configurado, esperado):
+    config = {'modelo_dimensional': False, 'indice_espacial': False}
+    if configurado is not None:
+        config['sqlite_journal_mode'] = configurado
+    carga = Carga(str(tmp_path / 'dw.db'), str(tmp_path / 'output') + '/', config)
+
+    assert carga.journal_mode_carga().lower() == esperado
+    conn = carga.abrir_carga_streaming()
+    try:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == esperado
+    finally:
+        carga.revertir_carga_streaming(conn)
+        conn.close()
+
+
+def filas_hoja(hoja):
+    return [list(fila) for fila in hoja.iter_rows(values_only=True)]
+
+
+def datos_excel(filas):
+    return pd.DataFrame({
+        'id': range(filas),
+        'precio': [None if i % 4 == 0 else i * 2.5 for i in range(filas)],
+        'superhost': [i % 2 == 0 for i in range(filas)],
+        'comentario': [f'texto\x0b{i}' for i in range(filas)]
+    })
+
+
+def esperado_excel(df):
+    return [[i, None if i % 4 == 0 else i * 2.5, int(i % 2 == 0), f'texto{i}'] for i in df['id']]
+
+
+@pytest.mark.parametrize('filas, hojas', [(25, [10, 10, 5]), (20, [10, 10]), (10, [10]), (0, [0])])
+def test_excel_se_divide_en_hojas_al_llegar_al_limite(tmp_path, filas, hojas):
+    df = datos_excel(filas)
+    archivos = escribir_excel_streaming('reviews', df, str(tmp_path), '20240101_0000',
+                                        {'excel_filas_por_hoja': 10, 'tamano_lote_excel': 3})
+
+    assert archivos == [os.path.join(str(tmp_path), 'reviews_transformado_20240101_0000.xlsx')]
+    libro = openpyxl.load_workbook(archivos[0], read_only=True)
+    titulos = ['Datos'] + [f'Datos_{i}' for i in range(2, len(hojas) + 1)]
+    assert libro.sheetnames == titulos + ['Resumen']
+
+    leidas = []
+    for titulo, cantidad in zip(titulos, hojas):
+        contenido = filas_hoja(libro[titulo])
+        assert contenido[0] == list(df.columns)
+        assert len(contenido) - 1 == cantidad
+        leidas += contenido[1:]
+    assert leidas == esperado_excel(df)
+    assert dict(filas_hoja(libro['Resumen'])[1:5]) == {'Total de registros': filas, 'Registros en este archivo': filas,
+                                                        'Total de columnas': 4, 'Hojas de datos': len(hojas)}
+
+
+def test_excel_se_divide_en_archivos_al_llegar_al_limite(tmp_path):
+    df = datos_excel(25)
+    archivos = escribir_excel_streaming('reviews', df, str(tmp_path), '20240101_0000',
+                                        {'excel_filas_por_hoja': 10, 'excel_division': 'archivos'})
+
+    assert [os.path.basename(archivo) for archivo in archivos] == \
+        [f'reviews_transformado_20240101_0000_parte{i}.xlsx' for i in (1, 2, 3)]
+    leidas = []
+    for archivo, cantidad in zip(archivos, [10, 10, 5]):
+        libro = openpyxl.load_workbook(archivo, read_only=True)
+        assert libro.sheetnames == ['Datos', 'Resumen']
+        contenido = filas_hoja(libro['Datos'])
+        assert contenido[0] == list(df.columns) and len(contenido) - 1 == cantidad
+        leidas += contenido[1:]
+        resumen = dict(filas_hoja(libro['Resumen'])[1:])
+        assert (resumen['Total de registros'], resumen['Registros en este archivo']) == (25, cantidad)
+    assert leidas == esperado_excel(df)
+
+
+def test_limite_de_filas_por_hoja_no_supera_el_de_excel(tmp_path, monkeypatch):
+    # Un límite configurado mayor que el de Excel se acota a MAX_FILAS_EXCEL (reducido aquí para la prueba)
+    monkeypatch.setattr(carga_modulo, 'MAX_FILAS_EXCEL', 3)
+    archivos = escribir_excel_streaming('reviews', datos_excel(5), str(tmp_path), '20240101_0000',
+                                        {'excel_filas_por_hoja': 10 ** 7, 'excel_division': 'archivos'})
+
+    assert [len(filas_hoja(openpyxl.load_workbook(archivo, read_only=True)['Datos'])) - 1
+            for archivo in archivos] == [3, 2]
@@ -0,0 +1,111 @@
+import sqlite3
+import pandas as pd
+import pytest
+
+from carga import Carga
+from checksums_carga import ChecksumsCarga
+
+TAMANO_LOTE = 100
+TOTAL_FILAS = 1000
+TABLA = 'raw_reviews_transformado'
+
+
+def reviews(inicio=0, filas=TOTAL_FILAS):
+    ids = range(inicio, inicio + filas)
+    return pd.DataFrame({
+        'id': list(ids),
+        'listing_id': [i % 37 for i in ids],
+        'comments': [f'comentario {i}' for i in ids],
+        'precio': [i * 1.5 for i in ids]
+    })
+
+
+@pytest.fixture
+def carga(tmp_path):
+    carga = Carga(str(tmp_path / 'dw.db'), str(tmp_path / 'output') + '/',
+                  {'tamano_lote_sqlite': TAMANO_LOTE, 'modelo_dimensional': False, 'indice_espacial': False})
+    carga.cargar_a_sqlite({'reviews': reviews()})
+    return carga
+
+
+def verificar(carga, **opciones):
+    conn = sqlite3.connect(carga.ruta_sqlite)
+    checksums = ChecksumsCarga(conn, carga.logs)
+    try:
+        return checksums.verificar(TABLA, **opciones)
+    finally:
+        checksums.cerrar()
+        conn.close()
+
+
+def modificar(carga, sql, parametros=()):
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        conn.execute(sql, parametros)
+
+
+def test_carga_intacta_verifica_ok(carga):
+    resultado = verificar(carga)
+
+    assert resultado['estado'] == 'OK'
+    assert resultado['chunks'] == TOTAL_FILAS // TAMANO_LOTE
+    assert resultado['registros'] == TOTAL_FILAS
+
+
+@pytest.mark.parametrize('sql', [
+    f'UPDATE "{TABLA}" SET comments = \'alterado\' WHERE id = 437',
+    f'UPDATE "{TABLA}" SET precio = NULL WHERE id = 437',
+    f'DELETE FROM "{TABLA}" WHERE id = 437'
+])
+def test_fila_alterada_marca_su_chunk(carga, sql):
+    modificar(carga, sql)
+    resultado = verificar(carga)
+
+    assert resultado['estado'] == 'ERROR'
+    assert [error['chunk'] for error in resultado['chunks_con_error']] == [437 // TAMANO_LOTE]
+    error = resultado['chunks_con_error'][0]
+    assert error['rowid_inicio'] <= 438 <= error['rowid_fin']
+
+
+def test_filas_fuera_de_los_chunks(carga):
+    modificar(carga, f'INSERT INTO "{TABLA}" (id) VALUES (?)', (TOTAL_FILAS,))
+
+    resultado = verificar(carga)
+    assert resultado['estado'] == 'ERROR'
+    assert resultado['filas_sin_checksum'] == 1
+    assert resultado['chunks_con_error'] == []
+
+
+def test_muestra_determinista_por_semilla(carga):
+    def elegidos(semilla):
+        # Cada chunk alterado que la muestra recalcula aparece en chunks_con_error
+        return [error['chunk'] for error in verificar(carga, muestra=0.3, semilla=semilla)['chunks_con_error']]
+
+    modificar(carga, f'UPDATE "{TABLA}" SET comments = NULL')
+
+    assert len(elegidos(0)) == 3
+    assert elegidos(0) == elegidos(0)
+    assert elegidos(7) == elegidos(7)
+
+
+def test_recargar_chunk_corrige_solo_ese_chunk(carga):
+    modificar(carga, f'UPDATE "{TABLA}" SET comments = \'alterado\' WHERE id BETWEEN 210 AND 230')
+    modificar(carga, f'UPDATE "{TABLA}" SET precio = -1 WHERE id = 905')
+    errores = verificar(carga)['chunks_con_error']
+    assert [error['chunk'] for error in errores] == [2, 9]
+
+    # La recarga reescribe las filas originales del chunk en su rango de rowid y lo vuelve a verificar
+    resultado = carga.recargar_chunk(TABLA, 2, reviews(200, TAMANO_LOTE))
+
+    assert resultado['estado'] == 'OK'
+    assert resultado['chunks_verificados'] == 1
+    assert [error['chunk'] for error in verificar(carga)['chunks_con_error']] == [9]
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        assert conn.execute(f'SELECT COUNT(*) FROM "{TABLA}"').fetchone()[0] == TOTAL_FILAS
+        assert conn.execute(f'SELECT comments FROM "{TABLA}" WHERE id = 215').fetchone()[0] == 'comentario 215'
+
+
+def test_recargar_chunk_con_filas_de_otro_tamano(carga):
+    with pytest.raises(ValueError):
+        carga.recargar_chunk(TABLA, 2, reviews(200, TAMANO_LOTE - 1))
+
+    assert verificar(carga)['estado'] == 'OK'
@@ -0,0 +1,144 @@
+import gc
+import weakref
+from datetime import datetime
+import mongomock
+import pandas as pd
+import pytest
+
+from carga import Carga
+from extraccion import Extraccion, CAMPOS_WATERMARK_MONGODB
+from transformacion import Transformacion
+
+TOTAL_DOCUMENTOS = 1000
+
+
+@pytest.fixture
+def extractor():
+    extractor = Extraccion(campos_watermark={'reviews': 'id'})
+    extractor.db = mongomock.MongoClient()['local']
+    extractor.db['reviews'].insert_many([{'id': i, 'listing_id': i % 37} for i in range(TOTAL_DOCUMENTOS)])
+    return extractor
+
+
+def en_rango(valor, rango):
+    inferior, superior = rango
+    return (inferior is None or valor >= inferior) and (superior is None or valor < superior)
+
+
+@pytest.mark.parametrize('particiones', [1, 2, 4, 7, 16, TOTAL_DOCUMENTOS + 5])
+def test_rangos_id_cubren_cada_documento_una_vez(extractor, particiones):
+    rangos = extractor.calcular_rangos_id('reviews', particiones)
+
+    assert 1 <= len(rangos) <= particiones
+    for documento in extractor.db['reviews'].find({}, {'_id': 1}):
+        assert sum(en_rango(documento['_id'], rango) for rango in rangos) == 1
+
+
+def test_rangos_id_respetan_el_watermark(extractor):
+    # Modo incremental: los rangos se calculan solo sobre los documentos posteriores al watermark
+    extractor.watermarks['reviews'] = 899
+    rangos = extractor.calcular_rangos_id('reviews', 4)
+
+    partes = [extractor.extraer_rango('reviews', rango) for rango in rangos]
+    ids = pd.concat(partes, ignore_index=True)['id'].tolist()
+    assert sorted(ids) == list(range(900, TOTAL_DOCUMENTOS))
+
+
+def test_rangos_id_coleccion_vacia(extractor):
+    extractor.db['reviews'].delete_many({})
+    assert extractor.calcular_rangos_id('reviews', 4) == [(None, None)]
+
+
+def test_iterar_coleccion_lee_el_cursor_por_lotes(extractor):
+    leidos = []
+    abrir_cursor = extractor.abrir_cursor
+
+    def cursor_contado(*args, **kwargs):
+        for documento in abrir_cursor(*args, **kwargs):
+            leidos.append(documento['id'])
+            yield documento
+
+    extractor.abrir_cursor = cursor_contado
+    lotes = extractor.iterar_coleccion('reviews', batch_size=100)
+    assert leidos == []
+
+    primero = next(lotes)
+    assert len(primero) == 100
+    assert len(leidos) == 100
+
+
+def test_leer_coleccion_por_lotes_no_retiene_los_lotes(extractor):
+    # Cuando se pide un lote, el anterior ya fue liberado: los lotes no se acumulan en una lista
+    iterar_coleccion = extractor.iterar_coleccion
+    vivos = []
+
+    def lotes_observados(*args, **kwargs):
+        for lote in iterar_coleccion(*args, **kwargs):
+            gc.collect()
+            vivos.append(sum(referencia() is not None for referencia in referencias))
+            referencias.append(weakref.ref(lote))
+            yield lote
+            del lote
+
+    referencias = []
+    extractor.iterar_coleccion = lotes_observados
+    df = extractor.leer_coleccion('reviews', batch_size=100)
+
+    assert len(df) == TOTAL_DOCUMENTOS
+    assert len(vivos) == TOTAL_DOCUMENTOS // 100
+    assert max(vivos) == 0
+
+
+def test_leer_coleccion_por_lotes_igual_a_lectura_completa(extractor):
+    extractor.db['reviews'].insert_many([{'id': -i, 'listing_id': 1, 'comments': 'nuevo'} for i in range(1, 30)])
+    completo = extractor.leer_coleccion('reviews')
+    por_lotes = extractor.leer_coleccion('reviews', batch_size=128)
+
+    pd.testing.assert_frame_equal(completo, por_lotes)
+
+
+def test_aplicar_tipos_conserva_fechas_con_formatos_mezclados():
+    # La primera fecha fija el formato que deduciría pd.to_datetime: las de otro formato no deben quedar en NaT
+    fechas = ['2019-03-01', '02/15/2020', '2021-07-04 18:30:00', datetime(2018, 5, 6, 7, 8),
+              '2017-12-31T23:00:00+02:00', {'$date': '2016-01-02T00:00:00Z'}, None, 'sin fecha']
+    extractor = Extraccion(usar_proyeccion=True)
+    extractor.db = mongomock.MongoClient()['local']
+    extractor.db['reviews'].insert_many([{'id': i, 'listing_id': 1, 'date': fecha} for i, fecha in enumerate(fechas)])
+
+    df = extractor.leer_coleccion('reviews')
+
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert df['date'].tolist()[:6] == [pd.Timestamp('2019-03-01'), pd.Timestamp('2020-02-15'),
+                                       pd.Timestamp('2021-07-04 18:30'), pd.Timestamp('2018-05-06 07:08'),
+                                       pd.Timestamp('2017-12-31 23:00'), pd.Timestamp('2016-01-02')]
+    assert df['date'].iloc[6:].isna().all()
+
+    # Truncadas al día dan lo mismo que la transformación sobre los valores crudos
+    crudas = pd.Series(fechas, dtype=object)
+    assert Transformacion({}).normalizar_fechas(df['date']).tolist() == \
+        Transformacion({}).normalizar_fechas(crudas).tolist()
+
+
+@pytest.mark.parametrize('batch_size, workers', [(None, 1), (7, 1), (None, 3)])
+def test_extraccion_incremental_por_watermark_entre_corridas(tmp_path, batch_size, workers):
+    # Watermark por _id (ObjectId) guardado en etl_estado y leído en la corrida siguiente
+    bd = mongomock.MongoClient()['local']
+    bd['reviews'].insert_many([{'id': i, 'listing_id': i % 37} for i in range(300)])
+    carga = Carga(str(tmp_path / 'dw.db'), str(tmp_path / 'output') + '/')
+
+    def corrida(limite=None):
+        extractor = Extraccion(campos_watermark=CAMPOS_WATERMARK_MONGODB)
+        extractor.db = bd
+        df = extractor.extraer_todas_colecciones(limite, batch_size, carga.leer_watermarks(), workers)['reviews']
+        carga.guardar_watermarks(extractor.watermarks_serializados())
+        return sorted(df['id']) if not df.empty else []
+
+    assert corrida() == list(range(300))
+    assert carga.leer_watermarks()['reviews']['tipo'] == 'objectid'
+    assert corrida() == []
+
+    bd['reviews'].insert_many([{'id': i, 'listing_id': i % 37} for i in range(300, 350)])
+    # Con límite el watermark avanza solo hasta el último documento extraído: la corrida siguiente sigue desde ahí
+    assert corrida(limite=20) == list(range(300, 320))
+    assert corrida() == list(range(320, 350))
+    assert corrida() == []
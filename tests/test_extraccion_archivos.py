@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from extraccion_archivos import ExtraccionArchivos, CAMPOS_WATERMARK_ARCHIVOS
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    pd.DataFrame({
+        'id': [1, 2, 3],
+        'last_scraped': ['2024-06-01', '2024-06-02', '2024-06-03'],
+        'price': ['$100.00', '$200.00', '$300.00']
+    }).to_csv(tmp_path / 'listings.csv', index=False)
+    # La fila 3 no tiene fecha: el CSV la deja vacía y pandas la lee como NaN
+    pd.DataFrame({
+        'id': [10, 11, 12, 13],
+        'listing_id': [1, 1, 2, 3],
+        'date': ['2024-05-01', '2024-05-20', None, '2024-06-10']
+    }).to_csv(tmp_path / 'reviews.csv', index=False)
+    return tmp_path
+
+
+def extraer(directorio, watermarks):
+    extractor = ExtraccionArchivos(directorio=str(directorio))
+    dataframes = extractor.extraer_todas_colecciones(watermarks=watermarks)
+    return extractor, dataframes
+
+
+def test_watermark_por_defecto_de_archivos(directorio):
+    extractor, dataframes = extraer(directorio, {})
+    assert extractor.campos_watermark == CAMPOS_WATERMARK_ARCHIVOS
+    assert len(dataframes['listings']) == 3
+
+    # Segunda corrida incremental con el watermark guardado: solo lo posterior (>= para fechas en texto)
+    estado = extractor.watermarks_serializados()
+    assert estado['listings'] == {'campo': 'last_scraped', 'tipo': 'texto', 'valor': '2024-06-03'}
+    _, dataframes = extraer(directorio, estado)
+    assert dataframes['listings']['id'].tolist() == [3]
+
+
+def test_watermark_con_nulos_filtra_sin_error(directorio):
+    estado = {'reviews': {'campo': 'date', 'tipo': 'texto', 'valor': '2024-05-15'}}
+    extractor, dataframes = extraer(directorio, estado)
+
+    # El nulo queda fuera del filtro en lugar de desactivarlo
+    assert dataframes['reviews']['id'].tolist() == [11, 13]
+    assert extractor.watermarks_serializados()['reviews']['valor'] == '2024-06-10'
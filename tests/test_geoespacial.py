@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geoespacial import geohash_vectorizado, celda_grid, distancia_km
+
+ALFABETO = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_referencia(latitud, longitud, precision):
+    # Algoritmo clásico por bisección, un bit a la vez, alternando longitud y latitud
+    rangos = [[-180.0, 180.0], [-90.0, 90.0]]
+    bits = []
+    for i in range(5 * precision):
+        rango, valor = (rangos[0], longitud) if i % 2 == 0 else (rangos[1], latitud)
+        medio = (rango[0] + rango[1]) / 2
+        bits.append(int(valor >= medio))
+        rango[bits[-1] == 0] = medio
+    return ''.join(ALFABETO[int(''.join(map(str, bits[i:i + 5])), 2)] for i in range(0, len(bits), 5))
+
+
+@pytest.mark.parametrize('latitud, longitud, precision, esperado', [
+    (57.64911, 10.40744, 11, 'u4pruydqqvj'),
+    (42.6, -5.6, 5, 'ezs42'),
+    (19.4326, -99.1332, 7, '9g3w81t'),
+    (19.4326, -99.1332, 12, '9g3w81t7j50q'),
+    (-90, -180, 4, '0000'),
+    (90, 180, 4, 'zzzz')
+])
+def test_geohash_de_coordenadas_conocidas(latitud, longitud, precision, esperado):
+    assert geohash_vectorizado(pd.Series([latitud]), pd.Series([longitud]), precision).tolist() == [esperado]
+
+
+def test_geohash_igual_a_la_biseccion():
+    rng = np.random.default_rng(0)
+    latitudes, longitudes = rng.uniform(-89.9, 89.9, 500), rng.uniform(-179.9, 179.9, 500)
+    for precision in (1, 5, 7, 9, 12):
+        esperado = [geohash_referencia(lat, lon, precision) for lat, lon in zip(latitudes, longitudes)]
+        assert geohash_vectorizado(pd.Series(latitudes), pd.Series(longitudes), precision).tolist() == esperado
+
+
+def test_geohash_coordenadas_invalidas_y_precision_fuera_de_rango():
+    geohashes = geohash_vectorizado(pd.Series([95.0, None, 'x', 19.4326]), pd.Series([0.0, 1.0, 1.0, -99.1332]))
+    assert geohashes.tolist() == [None, None, None, '9g3w81t']
+
+    # La precisión se acota a 1..12 caracteres
+    assert geohash_vectorizado(pd.Series([19.4326]), pd.Series([-99.1332]), 20).tolist() == ['9g3w81t7j50q']
+    assert geohash_vectorizado(pd.Series([19.4326]), pd.Series([-99.1332]), 0).tolist() == ['9']
+
+
+def test_celda_grid_de_coordenadas_conocidas():
+    # Cuadrícula de 0.01°: 36000 columnas; clave = fila * 36000 + columna
+    celdas = celda_grid(pd.Series([19.4326, 19.4399, 19.4326, -90, 90, 0, 95, None]),
+                        pd.Series([-99.1332, -99.1301, -99.1432, -180, 180, 0, 0, 0]))
+
+    assert celdas.tolist()[:6] == [10943 * 36000 + 8086, 10943 * 36000 + 8086, 10943 * 36000 + 8085,
+                                   0, 18000 * 36000 + 35999, 9000 * 36000 + 18000]
+    assert celdas[6:].isna().all()
+
+    # Con celdas de 0.1° la misma coordenada cae en la celda que contiene a las de 0.01°
+    assert celda_grid(pd.Series([19.4326]), pd.Series([-99.1332]), 0.1).tolist() == [1094 * 3600 + 808]
+
+
+def test_distancia_km_conocida():
+    # Zócalo a Ángel de la Independencia (CDMX): 0.0056° de latitud y 0.0345° de longitud, ~3.67 km
+    distancia = distancia_km(19.4326, -99.1332, [19.4270], [-99.1677])
+    assert distancia[0] == pytest.approx(3.67, abs=0.05)
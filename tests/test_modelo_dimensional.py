@@ -0,0 +1,95 @@
+import sqlite3
+import pandas as pd
+import pytest
+
+from carga import Carga
+from datos_sinteticos import GeneradorDatosSinteticos
+from geoespacial import IndiceEspacial, distancia_km, TABLA_RTREE
+from transformacion import Transformacion, METODOS_TRANSFORMACION
+
+
+@pytest.fixture(scope='module')
+def transformados():
+    transformador = Transformacion({})
+    transformados = {nombre: getattr(transformador, METODOS_TRANSFORMACION[nombre])(df)
+                     for nombre, df in GeneradorDatosSinteticos(semilla=3).generar(3000).items()}
+
+    # Casos que los datos sintéticos no traen: reviews de listings inexistentes, filas de calendar
+    # repetidas y listings con coordenadas fuera de rango
+    transformados['reviews'].loc[:24, 'listing_id'] = range(10 ** 9, 10 ** 9 + 25)
+    transformados['calendar'] = pd.concat([transformados['calendar'], transformados['calendar'].iloc[:20]],
+                                          ignore_index=True)
+    transformados['listings'].loc[:2, 'latitude'] = 200.0
+    return transformados
+
+
+@pytest.fixture
+def carga(tmp_path, transformados):
+    carga = Carga(str(tmp_path / 'dw.db'), str(tmp_path / 'output') + '/', {})
+    carga.cargar_a_sqlite(transformados)
+    return carga
+
+
+def contar(conn, tabla, condicion='1'):
+    return conn.execute(f'SELECT COUNT(*) FROM "{tabla}" WHERE {condicion}').fetchone()[0]
+
+
+def test_conteos_de_dimensiones_y_hechos(carga, transformados):
+    listings, reviews, calendar = transformados['listings'], transformados['reviews'], transformados['calendar']
+    fechas = pd.concat([reviews['date_clean'], calendar['date_clean']]).dropna()
+    sin_listing = ~reviews['listing_id'].isin(listings['id'])
+
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        assert contar(conn, 'dim_listing') == listings['id'].nunique()
+        assert contar(conn, 'dim_host') == listings['host_id'].dropna().nunique()
+        assert contar(conn, 'dim_neighbourhood') == listings['neighbourhood_cleansed_clean'].dropna().nunique()
+        assert contar(conn, 'dim_date') == fechas.dt.normalize().nunique()
+
+        assert contar(conn, 'fact_reviews') == reviews.dropna(subset=['listing_id'])['id'].nunique()
+        assert contar(conn, 'fact_reviews', 'listing_key IS NULL') == reviews.loc[sin_listing, 'id'].nunique() == 25
+        assert contar(conn, 'fact_calendar') == len(
+            calendar.dropna(subset=['listing_id', 'date_clean']).drop_duplicates(['listing_id', 'date_clean']))
+
+        # Cada hecho con fecha apunta a una fila de dim_date y el agregado mensual suma todos los hechos con fecha
+        assert contar(conn, 'fact_reviews', 'date_key NOT IN (SELECT date_key FROM dim_date)') == 0
+        assert conn.execute('SELECT SUM(reviews) FROM agg_reviews_mes').fetchone()[0] == \
+            contar(conn, 'fact_reviews', 'date_key IS NOT NULL')
+
+
+def test_carga_incremental_sin_cambios_no_reconstruye_el_modelo(carga, transformados):
+    # Una fila que ningún rebuild produciría: sobrevive solo si el modelo no se reconstruye
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        conn.execute("INSERT INTO dim_neighbourhood (neighbourhood) VALUES ('centinela')")
+
+    carga.cargar_incremental_sqlite({nombre: df.iloc[:0] for nombre, df in transformados.items()})
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        assert contar(conn, 'dim_neighbourhood', "neighbourhood = 'centinela'") == 1
+
+    carga.cargar_incremental_sqlite({'reviews': transformados['reviews'].iloc[:10]})
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        assert contar(conn, 'dim_neighbourhood', "neighbourhood = 'centinela'") == 0
+        assert contar(conn, 'dim_listing') == transformados['listings']['id'].nunique()
+
+
+def test_indice_espacial_igual_a_filtrar_la_tabla(carga, transformados):
+    listings = transformados['listings'].drop_duplicates('id')
+    validas = listings['latitude'].between(-90, 90) & listings['longitude'].between(-180, 180)
+    centro_lat, centro_lon = listings.loc[validas, 'latitude'].median(), listings.loc[validas, 'longitude'].median()
+
+    with sqlite3.connect(carga.ruta_sqlite) as conn:
+        indice = IndiceEspacial(conn)
+        assert contar(conn, TABLA_RTREE) == validas.sum() == len(listings) - 3
+
+        caja = (centro_lat - 0.05, centro_lat + 0.05, centro_lon - 0.08, centro_lon + 0.08)
+        esperado = listings[listings['latitude'].between(caja[0], caja[1]) &
+                            listings['longitude'].between(caja[2], caja[3])]
+        encontrado = indice.buscar_bbox(*caja, columnas=['id'])
+        assert 0 < len(encontrado) < len(listings)
+        assert sorted(encontrado['id']) == sorted(esperado['id'])
+
+        distancias = distancia_km(centro_lat, centro_lon, listings['latitude'], listings['longitude'])
+        esperado = listings[distancias <= 4.0]
+        encontrado = indice.buscar_radio(centro_lat, centro_lon, 4.0, columnas=['id'])
+        assert 0 < len(encontrado) < len(listings)
+        assert sorted(encontrado['id']) == sorted(esperado['id'])
+        assert encontrado['distancia_km'].is_monotonic_increasing
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from perfil_calidad import HyperLogLog, SketchCuantiles, TopK, PerfilCalidad, hashes_columna
+
+# Error típico de HLL con precisión 12: 1.04 / sqrt(4096) ~ 1.6 %; se admiten 3 desviaciones
+TOLERANCIA_HLL = 3 * 1.04 / np.sqrt(1 << 12)
+
+# KLL con k=200: error de rango bien por debajo de 2 %
+TOLERANCIA_RANGO = 0.02
+
+
+def hll(valores):
+    sketch = HyperLogLog(12)
+    sketch.agregar(hashes_columna(pd.Series(valores)))
+    return sketch
+
+
+@pytest.mark.parametrize('distintos', [50, 3000, 20000, 300000])
+def test_hll_estima_distintos_dentro_del_error(distintos):
+    rng = np.random.default_rng(distintos)
+    valores = rng.choice(rng.choice(10 ** 9, distintos, replace=False), size=2 * distintos)
+    exacto = len(np.unique(valores))
+
+    assert abs(hll(valores).estimar() - exacto) <= TOLERANCIA_HLL * exacto
+
+
+def test_hll_combinado_igual_al_de_la_union():
+    rng = np.random.default_rng(1)
+    a, b = rng.integers(0, 50000, 40000), rng.integers(25000, 90000, 40000)
+    combinado = hll(a)
+    combinado.combinar(hll(b))
+
+    assert combinado.estimar() == hll(np.concatenate([a, b])).estimar()
+    exacto = len(np.union1d(a, b))
+    assert abs(combinado.estimar() - exacto) <= TOLERANCIA_HLL * exacto
+
+
+def error_de_rango(datos_ordenados, probabilidades, estimados):
+    rangos = np.searchsorted(datos_ordenados, estimados, side='right') / len(datos_ordenados)
+    return np.max(np.abs(rangos - np.asarray(probabilidades)))
+
+
+@pytest.mark.parametrize('distribucion', ['normal', 'lognormal', 'enteros'])
+def test_kll_cuantiles_dentro_del_error_de_rango(distribucion):
+    rng = np.random.default_rng(7)
+    datos = {'normal': lambda: rng.normal(1000, 250, 200000),
+             'lognormal': lambda: rng.lognormal(6, 1.2, 200000),
+             'enteros': lambda: rng.integers(0, 365, 200000).astype(np.float64)}[distribucion]()
+    probabilidades = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+    # Por chunks y combinando sketches, como en el modo pipeline
+    sketch = SketchCuantiles(200, semilla=0)
+    for inicio in range(0, len(datos), 30000):
+        parcial = SketchCuantiles(200, semilla=inicio)
+        parcial.agregar(datos[inicio:inicio + 30000])
+        sketch.combinar(parcial)
+
+    assert sketch.total == len(datos)
+    assert sum(len(nivel) for nivel in sketch.niveles) < 2000
+    assert error_de_rango(np.sort(datos), probabilidades, sketch.cuantiles(probabilidades)) <= TOLERANCIA_RANGO
+
+
+def test_misra_gries_acota_los_conteos_y_encuentra_los_frecuentes():
+    # Zipf con muchos más valores distintos que la capacidad del resumen
+    rng = np.random.default_rng(3)
+    valores = pd.Series(rng.zipf(1.3, 300000) % 20000)
+    exactos = valores.value_counts()
+
+    topk = TopK(k=5, capacidad=50)
+    for inicio in range(0, len(valores), 40000):
+        parcial = TopK(k=5, capacidad=50)
+        parcial.agregar(valores.iloc[inicio:inicio + 40000])
+        topk.combinar(parcial)
+
+    # Cota de Misra-Gries: lo descontado a cada valor no supera n / (capacidad + 1)
+    assert 0 < topk.error <= len(valores) / 51
+    for fila in topk.resultado():
+        assert exactos[fila['valor']] - topk.error <= fila['conteo'] <= exactos[fila['valor']]
+    assert [fila['valor'] for fila in topk.resultado()] == exactos.index[:5].tolist()
+
+
+def test_misra_gries_exacto_bajo_la_capacidad():
+    rng = np.random.default_rng(4)
+    valores = pd.Series(rng.choice(['a', 'b', 'c', 'd', 'e', 'f'], 10000, p=[.4, .25, .15, .1, .06, .04]))
+    topk = TopK(k=3)
+    topk.agregar(valores)
+
+    assert topk.error == 0
+    assert topk.resultado() == [{'valor': valor, 'conteo': int(conteo)}
+                                for valor, conteo in valores.value_counts().head(3).items()]
+
+
+def test_top_k_de_categoricas_sin_categorias_con_conteo_cero():
+    # value_counts de una categórica incluye sus categorías sin uso con conteo 0
+    categorias = [f'barrio_{i}' for i in range(40)]
+    primer_chunk = pd.Series(pd.Categorical(['barrio_3'] * 5 + ['barrio_7'] * 2, categories=categorias))
+    segundo_chunk = pd.Series(pd.Categorical(['barrio_7'] * 4 + [None], categories=categorias))
+
+    perfil = PerfilCalidad({'top_k': 10})
+    perfil.agregar(pd.DataFrame({'barrio': primer_chunk}))
+    perfil.agregar(pd.DataFrame({'barrio': segundo_chunk}))
+    resultado = perfil.resultado()['barrio']
+
+    assert resultado['top_k'] == [{'valor': 'barrio_7', 'conteo': 6}, {'valor': 'barrio_3', 'conteo': 5}]
+    assert resultado['top_k_error_maximo'] == 0
+    assert resultado['distintos_aprox'] == 2
+    assert resultado['nulos'] == 1
+
+    # Aunque las categorías sin uso superen la capacidad del resumen, no desplazan a las usadas
+    topk = TopK(k=3, capacidad=5)
+    topk.agregar(primer_chunk)
+    assert topk.resultado() == [{'valor': 'barrio_3', 'conteo': 5}, {'valor': 'barrio_7', 'conteo': 2}]
+    assert topk.error == 0
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from salida_parquet import escribir_parquet
+
+pq = pytest.importorskip('pyarrow.parquet')
+ds = pytest.importorskip('pyarrow.dataset')
+
+
+def reviews(filas=600, inicio='2019-11-20'):
+    fechas = pd.Timestamp(inicio) + pd.to_timedelta(np.arange(filas) % 90, unit='D')
+    return pd.DataFrame({
+        'id': np.arange(filas, dtype=np.int64),
+        'date_clean': fechas,
+        'año': fechas.year.astype('int16'),
+        'mes': fechas.month.astype('int8'),
+        'comments_clean': [f'comentario {i}' if i % 7 else None for i in range(filas)],
+        'room_type': pd.Categorical(['Entire home/apt', 'Private room'] * (filas // 2))
+    })
+
+
+def particiones(directorio):
+    return sorted(os.path.relpath(raiz, directorio) for raiz, _, archivos in os.walk(directorio)
+                  if any(archivo.endswith('.parquet') for archivo in archivos))
+
+
+def test_reviews_particionadas_por_año_y_mes(tmp_path):
+    df = reviews()
+    directorio = escribir_parquet('reviews', df, str(tmp_path), {'parquet_filas_por_grupo': 100})
+
+    esperadas = sorted(f'año={año}/mes={mes}' for año, mes in df[['año', 'mes']].drop_duplicates().itertuples(index=False))
+    assert directorio == os.path.join(str(tmp_path), 'reviews')
+    assert particiones(directorio) == esperadas == ['año=2019/mes=11', 'año=2019/mes=12', 'año=2020/mes=1',
+                                                    'año=2020/mes=2']
+
+    # Cada archivo contiene solo las filas de su partición; las columnas de partición van en la ruta
+    for particion in esperadas:
+        año, mes = (int(parte.split('=')[1]) for parte in particion.split('/'))
+        tabla = pq.read_table(os.path.join(directorio, particion))
+        assert 'año' not in tabla.column_names and 'mes' not in tabla.column_names
+        ids = sorted(tabla.column('id').to_pylist())
+        assert ids == df.loc[(df['año'] == año) & (df['mes'] == mes), 'id'].tolist()
+
+    leido = ds.dataset(directorio, format='parquet', partitioning='hive').to_table().to_pandas()
+    leido = leido.sort_values('id').reset_index(drop=True)
+    assert len(leido) == len(df)
+    assert leido['date_clean'].tolist() == df['date_clean'].tolist()
+    assert leido['comments_clean'].tolist() == df['comments_clean'].tolist()
+    assert leido['room_type'].astype(str).tolist() == df['room_type'].astype(str).tolist()
+    assert leido['año'].astype(int).tolist() == df['año'].astype(int).tolist()
+
+
+def test_listings_sin_particiones(tmp_path):
+    df = reviews(50).drop(columns=['año', 'mes'])
+    directorio = escribir_parquet('listings', df, str(tmp_path), {})
+
+    assert particiones(directorio) == ['.']
+    assert pq.read_table(directorio).num_rows == 50
+
+
+def test_incremental_agrega_archivos_y_la_carga_completa_reemplaza(tmp_path):
+    escribir_parquet('reviews', reviews(300), str(tmp_path), {})
+    directorio = escribir_parquet('reviews', reviews(40, inicio='2020-02-01'), str(tmp_path), {}, sufijo='20200301')
+
+    archivos = [archivo for _, _, nombres in os.walk(directorio) for archivo in nombres]
+    assert any('20200301' in archivo for archivo in archivos)
+    assert ds.dataset(directorio, format='parquet', partitioning='hive').count_rows() == 340
+
+    escribir_parquet('reviews', reviews(30), str(tmp_path), {})
+    assert ds.dataset(directorio, format='parquet', partitioning='hive').count_rows() == 30
+    assert particiones(directorio) == ['año=2019/mes=11', 'año=2019/mes=12']
+
+
+def test_compresion_no_soportada(tmp_path):
+    with pytest.raises(ValueError):
+        escribir_parquet('reviews', reviews(10), str(tmp_path), {'parquet_compresion': 'lzma'})
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datos_sinteticos import GeneradorDatosSinteticos
+from transformacion import Transformacion, METODOS_TRANSFORMACION, LIMITES_PRECIO, ETIQUETAS_PRECIO
+
+CONFIGURACIONES = {
+    'defecto': {},
+    'sin_columnas_crudas': {'eliminar_columnas_crudas': True}
+}
+
+
+@pytest.fixture(scope='module')
+def dataframes():
+    return GeneradorDatosSinteticos(semilla=3).generar('10k')
+
+
+def copias(dataframes):
+    return {nombre: df.copy(deep=True) for nombre, df in dataframes.items()}
+
+
+@pytest.mark.parametrize('config', list(CONFIGURACIONES.values()), ids=list(CONFIGURACIONES))
+@pytest.mark.parametrize('nombre', list(METODOS_TRANSFORMACION))
+def test_transformar_no_modifica_la_entrada(dataframes, nombre, config):
+    entrada = dataframes[nombre].copy(deep=True)
+    resultado = getattr(Transformacion(dict(config)), METODOS_TRANSFORMACION[nombre])(entrada)
+
+    assert len(resultado) > 0
+    pd.testing.assert_frame_equal(entrada, dataframes[nombre])
+
+
+@pytest.mark.parametrize('config', list(CONFIGURACIONES.values()), ids=list(CONFIGURACIONES))
+def test_transformacion_completa_no_modifica_la_entrada(dataframes, config):
+    entrada = copias(dataframes)
+    resultado = Transformacion(dict(config)).ejecutar_transformacion_completa(entrada)
+
+    assert set(resultado) == set(dataframes)
+    for nombre, df in dataframes.items():
+        pd.testing.assert_frame_equal(entrada[nombre], df)
+
+
+def test_categorizar_precios_igual_a_regla_escalar():
+    transformador = Transformacion({})
+    precios = [-np.inf, -1, 0, None, 500, 500.01, 1000, 1e9, np.inf, 'abc', '-inf']
+    df = pd.DataFrame({'price_clean': pd.Series(precios, dtype=object)})
+
+    # -inf y los textos no numéricos pasan por la regla escalar original
+    esperado = [transformador.categorizar_precio_individual(precio, LIMITES_PRECIO, ETIQUETAS_PRECIO)
+                for precio in precios]
+    assert transformador.categorizar_precios(df)['categoria_precio'].tolist() == esperado
+
+
+def regla_booleano_original(valor):
+    # Regla fila a fila del Paso 8 original
+    if valor is None or pd.isna(valor):
+        return 0
+    if isinstance(valor, bool):
+        return 1 if valor else 0
+    if isinstance(valor, str):
+        return 1 if valor.lower().strip() in ['t', 'true', '1', 'yes', 'si'] else 0
+    return 0
+
+
+@pytest.mark.parametrize('valores', [
+    [1, True, 0, False, 't'],
+    [True, 1, False, 0, 'f'],
+    [1.0, True],
+    [True, 1.0],
+    [np.bool_(True), True, None, np.nan, ' YES ', 1, '1', 1.0],
+    [False, 0.0, 'true', 0, np.bool_(False), True]
+])
+def test_normalizar_booleano_igual_a_regla_original(valores):
+    serie = pd.Series(valores, dtype=object)
+    resultado = Transformacion({}).normalizar_booleano(serie)
+
+    assert resultado.tolist() == [regla_booleano_original(valor) for valor in valores]
+    assert resultado.tolist() == Transformacion({}).normalizar_booleano(serie[::-1]).tolist()[::-1]